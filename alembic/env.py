@@ -15,7 +15,7 @@ from sqlalchemy import pool
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 from rag_service.settings import settings
-from rag_service.models import embeddings
+from rag_service.models import cache, embeddings, jobs
 
 
 config = context.config
@@ -26,12 +26,16 @@ if config.config_file_name is not None:
 
 target_metadata = SQLModel.metadata
 IGNORED_TABLES = {"spatial_ref_sys", "_typmod_cache"}
+# Per-source chunk partitions are created at runtime (rag_service.pipeline.partitions)
+IGNORED_TABLE_PREFIXES = ("chunks_p_",)
 
 
 def include_object(object, name, type_, reflected, compare_to):
     # Ignore ParadeDB/PostGIS system tables during autogenerate so they aren't treated as drops.
     if type_ == "table" and name in IGNORED_TABLES:
         return False
+    if type_ == "table" and reflected and name.startswith(IGNORED_TABLE_PREFIXES):
+        return False
     return True
 
 
@@ -0,0 +1,186 @@
+"""partition chunks by source
+
+Revision ID: 7c1f4e2a9b30
+Revises: e548028b4ff2
+Create Date: 2026-10-19 09:15:12.000000
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7c1f4e2a9b30"
+down_revision = "e548028b4ff2"
+branch_labels = None
+depends_on = None
+
+
+"""
+Rebuild `chunks` as `PARTITION BY LIST (source)`.
+
+- Adds `chunks.source` (denormalized from documents.source, '' when NULL)
+- Primary key becomes (id, source); unique constraints gain `source`
+- One partition per existing source plus a DEFAULT partition
+- HNSW + BM25 indexes are created per partition, after the data is copied
+
+Partition naming must stay in sync with rag_service.pipeline.partitions.partition_name.
+"""
+
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+
+def _partition_name(source: str) -> str:
+    slug = re.sub(r"[^a-z0-9_]", "_", source.lower())[:24]
+    if slug != source or slug == "default":
+        slug = f"{slug}_{hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]}"
+    return f"chunks_p_{slug}"
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _create_search_indexes(table: str) -> None:
+    op.execute(
+        f"CREATE INDEX idx_{table}_hnsw ON {table} "
+        f"USING hnsw (embedding vector_cosine_ops) "
+        f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+    )
+    op.execute(
+        f"CREATE INDEX idx_{table}_bm25 ON {table} "
+        f"USING bm25 (id, content) WITH (key_field = 'id')"
+    )
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # 1) Move the old table out of the way (its index/constraint names are reused)
+    op.execute("DROP INDEX IF EXISTS idx_chunks_bm25")
+    op.execute("DROP INDEX IF EXISTS idx_chunks_embedding_hnsw")
+    op.execute("DROP INDEX IF EXISTS idx_chunks_document_id")
+    op.execute("ALTER TABLE chunks DROP CONSTRAINT uq_chunks_document_chunk_index")
+    op.execute("ALTER TABLE chunks DROP CONSTRAINT uq_chunks_document_content_hash")
+    op.execute("ALTER TABLE chunks DROP CONSTRAINT chunks_document_id_fkey")
+    op.execute("ALTER TABLE chunks RENAME CONSTRAINT chunks_pkey TO chunks_unpartitioned_pkey")
+    op.execute("ALTER TABLE chunks RENAME TO chunks_unpartitioned")
+
+    # 2) Partitioned parent
+    op.execute(
+        """
+        CREATE TABLE chunks (
+            id uuid NOT NULL DEFAULT gen_random_uuid(),
+            source varchar NOT NULL,
+            document_id uuid NOT NULL,
+            chunk_index integer NOT NULL,
+            content varchar NOT NULL,
+            content_hash varchar NOT NULL,
+            embedding vector(1536) NOT NULL,
+            chunk_metadata jsonb NOT NULL DEFAULT '{}'::jsonb,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT chunks_pkey PRIMARY KEY (id, source),
+            CONSTRAINT uq_chunks_document_chunk_index UNIQUE (source, document_id, chunk_index),
+            CONSTRAINT uq_chunks_document_content_hash UNIQUE (source, document_id, content_hash),
+            CONSTRAINT chunks_document_id_fkey FOREIGN KEY (document_id)
+                REFERENCES documents (id) ON DELETE CASCADE
+        ) PARTITION BY LIST (source)
+        """
+    )
+    op.create_index("idx_chunks_document_id", "chunks", ["document_id"], unique=False)
+
+    # 3) One partition per existing source + default
+    sources = (
+        conn.execute(sa.text("SELECT DISTINCT coalesce(source, '') FROM documents")).scalars().all()
+    )
+    tables = ["chunks_p_default"]
+    op.execute("CREATE TABLE chunks_p_default PARTITION OF chunks DEFAULT")
+    for source in sources:
+        if not source:
+            continue
+        table = _partition_name(source)
+        op.execute(f"CREATE TABLE {table} PARTITION OF chunks FOR VALUES IN ({_literal(source)})")
+        tables.append(table)
+
+    # 4) Copy rows, then build search indexes once per partition
+    op.execute(
+        """
+        INSERT INTO chunks (
+            id, source, document_id, chunk_index, content, content_hash,
+            embedding, chunk_metadata, created_at
+        )
+        SELECT c.id, coalesce(d.source, ''), c.document_id, c.chunk_index, c.content,
+               c.content_hash, c.embedding, c.chunk_metadata, c.created_at
+        FROM chunks_unpartitioned AS c
+        JOIN documents AS d ON d.id = c.document_id
+        """
+    )
+    op.execute("DROP TABLE chunks_unpartitioned")
+
+    for table in tables:
+        _create_search_indexes(table)
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE chunks RENAME TO chunks_partitioned")
+    op.execute("ALTER INDEX idx_chunks_document_id RENAME TO idx_chunks_partitioned_document_id")
+    op.execute(
+        "ALTER TABLE chunks_partitioned "
+        "RENAME CONSTRAINT uq_chunks_document_chunk_index TO uq_chunks_partitioned_chunk_index"
+    )
+    op.execute(
+        "ALTER TABLE chunks_partitioned "
+        "RENAME CONSTRAINT uq_chunks_document_content_hash TO uq_chunks_partitioned_content_hash"
+    )
+    op.execute(
+        "ALTER TABLE chunks_partitioned RENAME CONSTRAINT chunks_pkey TO chunks_partitioned_pkey"
+    )
+
+    op.execute(
+        """
+        CREATE TABLE chunks (
+            id uuid NOT NULL DEFAULT gen_random_uuid(),
+            document_id uuid NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+            chunk_index integer NOT NULL,
+            content varchar NOT NULL,
+            content_hash varchar NOT NULL,
+            embedding vector(1536) NOT NULL,
+            chunk_metadata jsonb NOT NULL DEFAULT '{}'::jsonb,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT chunks_pkey PRIMARY KEY (id),
+            CONSTRAINT uq_chunks_document_chunk_index UNIQUE (document_id, chunk_index),
+            CONSTRAINT uq_chunks_document_content_hash UNIQUE (document_id, content_hash)
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO chunks (
+            id, document_id, chunk_index, content, content_hash,
+            embedding, chunk_metadata, created_at
+        )
+        SELECT id, document_id, chunk_index, content, content_hash,
+               embedding, chunk_metadata, created_at
+        FROM chunks_partitioned
+        """
+    )
+    op.execute("DROP TABLE chunks_partitioned CASCADE")
+
+    op.create_index("idx_chunks_document_id", "chunks", ["document_id"], unique=False)
+    op.execute(
+        "CREATE INDEX idx_chunks_embedding_hnsw ON chunks USING hnsw (embedding vector_cosine_ops)"
+    )
+    op.create_index(
+        "idx_chunks_bm25",
+        "chunks",
+        ["id", "content"],
+        unique=False,
+        postgresql_using="bm25",
+        postgresql_with={"key_field": "id"},
+    )
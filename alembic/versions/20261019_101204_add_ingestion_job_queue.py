@@ -0,0 +1,98 @@
+"""add ingestion job queue and checkpoints
+
+Revision ID: 3d9a61b7e5c2
+Revises: 7c1f4e2a9b30
+Create Date: 2026-10-19 10:12:04.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+from sqlalchemy.dialects import postgresql
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "3d9a61b7e5c2"
+down_revision = "7c1f4e2a9b30"
+branch_labels = None
+depends_on = None
+
+EMBEDDING_DIM = 1536
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ingestion_jobs",
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            server_default=sa.text("gen_random_uuid()"),
+            nullable=False,
+        ),
+        sa.Column("source", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("title", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("root", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column(
+            "params",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default=sa.text("'{}'::jsonb"),
+            nullable=False,
+        ),
+        sa.Column(
+            "status",
+            sqlmodel.sql.sqltypes.AutoString(),
+            server_default=sa.text("'queued'"),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("worker_id", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column(
+            "progress",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default=sa.text("'{}'::jsonb"),
+            nullable=False,
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_ingestion_jobs_source"), "ingestion_jobs", ["source"], unique=False)
+    op.create_index(
+        "idx_ingestion_jobs_status_created",
+        "ingestion_jobs",
+        ["status", "created_at"],
+        unique=False,
+    )
+
+    op.create_table(
+        "ingestion_checkpoints",
+        sa.Column("job_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("text_hash", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("embedding", Vector(EMBEDDING_DIM), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["job_id"], ["ingestion_jobs.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("job_id", "text_hash"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ingestion_checkpoints")
+    op.drop_index("idx_ingestion_jobs_status_created", table_name="ingestion_jobs")
+    op.drop_index(op.f("ix_ingestion_jobs_source"), table_name="ingestion_jobs")
+    op.drop_table("ingestion_jobs")
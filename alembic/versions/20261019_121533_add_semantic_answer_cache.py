@@ -0,0 +1,103 @@
+"""add semantic answer cache and corpus versions
+
+Revision ID: 5b8e2f0c7a14
+Revises: 3d9a61b7e5c2
+Create Date: 2026-10-19 12:15:33.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+from sqlalchemy.dialects import postgresql
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "5b8e2f0c7a14"
+down_revision = "3d9a61b7e5c2"
+branch_labels = None
+depends_on = None
+
+EMBEDDING_DIM = 1536
+
+
+def upgrade() -> None:
+    op.create_table(
+        "corpus_versions",
+        sa.Column("source", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("version", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("source"),
+    )
+
+    op.create_table(
+        "answer_cache",
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            server_default=sa.text("gen_random_uuid()"),
+            nullable=False,
+        ),
+        sa.Column("source", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("corpus_version", sa.Integer(), nullable=False),
+        sa.Column("embedding_model", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("query_text", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("query_embedding", Vector(EMBEDDING_DIM), nullable=False),
+        sa.Column("answer", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column(
+            "chunk_ids",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default=sa.text("'[]'::jsonb"),
+            nullable=False,
+        ),
+        sa.Column(
+            "context_tokens",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default=sa.text("'{}'::jsonb"),
+            nullable=False,
+        ),
+        sa.Column("hit_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "last_hit_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "idx_answer_cache_embedding_hnsw",
+        "answer_cache",
+        ["query_embedding"],
+        unique=False,
+        postgresql_using="hnsw",
+        postgresql_ops={"query_embedding": "vector_cosine_ops"},
+    )
+    op.create_index(
+        "idx_answer_cache_source_version",
+        "answer_cache",
+        ["source", "corpus_version"],
+        unique=False,
+    )
+    op.create_index("idx_answer_cache_last_hit_at", "answer_cache", ["last_hit_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("idx_answer_cache_last_hit_at", table_name="answer_cache")
+    op.drop_index("idx_answer_cache_source_version", table_name="answer_cache")
+    op.drop_index("idx_answer_cache_embedding_hnsw", table_name="answer_cache")
+    op.drop_table("answer_cache")
+    op.drop_table("corpus_versions")
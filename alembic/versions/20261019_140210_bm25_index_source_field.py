@@ -0,0 +1,61 @@
+"""add source to the per-partition bm25 indexes
+
+Revision ID: 9a4c7d21e6b8
+Revises: 5b8e2f0c7a14
+Create Date: 2026-10-19 14:02:10.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9a4c7d21e6b8"
+down_revision = "5b8e2f0c7a14"
+branch_labels = None
+depends_on = None
+
+
+"""
+Rebuild every chunks partition's BM25 index with `source` as an untokenized field, so the
+`source = :source` predicate of bm25_search is evaluated inside the ParadeDB search.
+
+Must stay in sync with rag_service.pipeline.index_maintenance.BM25_FIELDS.
+"""
+
+BM25_FIELDS = "id, content, (source::pdb.literal)"
+OLD_BM25_FIELDS = "id, content"
+
+
+def _partitions() -> list[str]:
+    rows = op.get_bind().execute(
+        sa.text(
+            """
+            SELECT c.relname
+            FROM pg_inherits AS i
+            JOIN pg_class AS c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'chunks'::regclass
+            ORDER BY c.relname
+            """
+        )
+    )
+    return list(rows.scalars())
+
+
+def _rebuild_bm25(fields: str) -> None:
+    for table in _partitions():
+        op.execute(f"DROP INDEX IF EXISTS idx_{table}_bm25")
+        op.execute(
+            f"CREATE INDEX idx_{table}_bm25 ON {table} "
+            f"USING bm25 ({fields}) WITH (key_field = 'id')"
+        )
+
+
+def upgrade() -> None:
+    _rebuild_bm25(BM25_FIELDS)
+
+
+def downgrade() -> None:
+    _rebuild_bm25(OLD_BM25_FIELDS)
@@ -0,0 +1,85 @@
+"""generated metadata columns on chunks for filtered retrieval
+
+Revision ID: c3e8b5f1d2a6
+Revises: 9a4c7d21e6b8
+Create Date: 2026-10-19 15:18:47.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c3e8b5f1d2a6"
+down_revision = "9a4c7d21e6b8"
+branch_labels = None
+depends_on = None
+
+
+"""
+Extract chunk_metadata topic / section / relative_path into STORED generated columns (on the
+partitioned parent, so every partition gets them), index them for equality and prefix
+filters, and rebuild each partition's BM25 index with them as untokenized fields.
+
+Must stay in sync with rag_service.models.FILTER_FIELDS and
+rag_service.pipeline.index_maintenance.BM25_FIELDS.
+"""
+
+FILTER_FIELDS = ("topic", "section", "relative_path")
+BM25_FIELDS = (
+    "id, content, (source::pdb.literal), (topic::pdb.literal), (section::pdb.literal), "
+    "(relative_path::pdb.literal)"
+)
+OLD_BM25_FIELDS = "id, content, (source::pdb.literal)"
+
+
+def _partitions() -> list[str]:
+    rows = op.get_bind().execute(
+        sa.text(
+            """
+            SELECT c.relname
+            FROM pg_inherits AS i
+            JOIN pg_class AS c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'chunks'::regclass
+            ORDER BY c.relname
+            """
+        )
+    )
+    return list(rows.scalars())
+
+
+def _rebuild_bm25(fields: str) -> None:
+    for table in _partitions():
+        op.execute(f"DROP INDEX IF EXISTS idx_{table}_bm25")
+        op.execute(
+            f"CREATE INDEX idx_{table}_bm25 ON {table} "
+            f"USING bm25 ({fields}) WITH (key_field = 'id')"
+        )
+
+
+def upgrade() -> None:
+    for name in FILTER_FIELDS:
+        op.execute(
+            f"ALTER TABLE chunks ADD COLUMN {name} varchar "
+            f"GENERATED ALWAYS AS (chunk_metadata ->> '{name}') STORED"
+        )
+        op.create_index(
+            f"idx_chunks_{name}",
+            "chunks",
+            [name],
+            unique=False,
+            postgresql_ops={name: "text_pattern_ops"},
+        )
+    _rebuild_bm25(BM25_FIELDS)
+
+
+def downgrade() -> None:
+    # the BM25 indexes reference the columns, so they go first
+    for table in _partitions():
+        op.execute(f"DROP INDEX IF EXISTS idx_{table}_bm25")
+    for name in FILTER_FIELDS:
+        op.drop_index(f"idx_chunks_{name}", table_name="chunks")
+        op.execute(f"ALTER TABLE chunks DROP COLUMN {name}")
+    _rebuild_bm25(OLD_BM25_FIELDS)
@@ -0,0 +1,29 @@
+"""add pg_prewarm and pg_buffercache for the startup warmup
+
+Revision ID: e71d3a9c4b52
+Revises: c3e8b5f1d2a6
+Create Date: 2026-10-19 16:30:55.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e71d3a9c4b52"
+down_revision = "c3e8b5f1d2a6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # pg_prewarm loads the search indexes into shared_buffers (rag_service.warmup);
+    # pg_buffercache reports how much of them is resident
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_prewarm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_buffercache")
+
+
+def downgrade() -> None:
+    op.execute("DROP EXTENSION IF EXISTS pg_buffercache")
+    op.execute("DROP EXTENSION IF EXISTS pg_prewarm")
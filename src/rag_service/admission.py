@@ -0,0 +1,138 @@
+"""
+Admission control and degraded modes for the API.
+
+Admission slots stand for DB connections: ADMISSION_MAX_INFLIGHT (default: the DB pool's
+size + overflow) of them. A request holds one while it runs, and a request that fans out
+(/answer with query rewriting searches each rewrite on its own connection) holds one more
+per extra connection (`AdmissionController.hold`). Up to ADMISSION_MAX_QUEUE requests wait
+for a slot; beyond that requests are rejected at once with 429. A request that waits longer than ADMISSION_MAX_WAIT_S (or than its deadline
+allows) gets 503. So under overload requests fail fast instead of queueing behind the
+connection pool.
+
+Admitted requests degrade instead of failing when time or capacity is short (`degrade`).
+They do so when less than DEGRADE_BELOW_FRACTION of their deadline is left after
+admission, or when others are queued: ef_search drops to DEGRADED_EF_SEARCH and query
+rewriting is skipped. Rewriting is also skipped when fewer slots are free than its fan-out
+needs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from rag_service import deadline, observability
+from rag_service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """The request was shed; `status_code` is 429 (queue full) or 503 (waited too long)."""
+
+    def __init__(self, reason: str, status_code: int, retry_after_s: float = 1.0) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionController:
+    def __init__(self, max_inflight: int, *, max_queue: int, max_wait_s: float) -> None:
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self._slots = asyncio.Semaphore(max_inflight)
+        self.waiting = 0
+        self.inflight = 0
+        self.extra = 0  # slots held by admitted requests for their fan-out
+
+    @property
+    def available(self) -> int:
+        """Slots free right now."""
+        return self.max_inflight - self.inflight - self.extra
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        if not self._slots.locked():
+            await self._slots.acquire()  # a free slot: returns without suspending
+        elif self.waiting >= self.max_queue:
+            observability.record_shed("queue_full")
+            raise Overloaded("admission queue full", 429)
+        else:
+            self.waiting += 1
+            try:
+                wait_s = deadline.remaining(self.max_wait_s, stage="admission")
+                await asyncio.wait_for(self._slots.acquire(), wait_s)
+            except asyncio.TimeoutError:
+                observability.record_shed("admission_wait")
+                raise Overloaded("timed out waiting for admission", 503) from None
+            finally:
+                self.waiting -= 1
+
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._slots.release()
+
+    @asynccontextmanager
+    async def hold(self, n: int) -> AsyncIterator[None]:
+        """
+        Hold `n` more slots for an admitted request's extra connections. Only call it
+        when `degrade` found them free, so it takes them without waiting.
+        """
+        for _ in range(n):
+            await self._slots.acquire()
+        self.extra += n
+        try:
+            yield
+        finally:
+            self.extra -= n
+            for _ in range(n):
+                self._slots.release()
+
+
+@dataclass
+class Degradation:
+    ef_search: int
+    rewrite: bool
+    reasons: list[str] = field(default_factory=list)  # what was degraded, for the response
+
+
+def degrade(
+    controller: AdmissionController,
+    *,
+    ef_search: int,
+    rewrite: bool = False,
+    rewrite_slots: int = 0,
+) -> Degradation:
+    """
+    Cheaper search settings when the deadline is tight or requests are queueing.
+
+    `rewrite_slots` is how many slots beyond its own the request needs to rewrite; without
+    that many free, rewriting is skipped.
+    """
+    current = deadline.current()
+    tight = current is not None and current.remaining_fraction() < settings.degrade_below_fraction
+    busy = controller.waiting > 0
+    short = rewrite and controller.available < rewrite_slots
+    if not (tight or busy or short):
+        return Degradation(ef_search=ef_search, rewrite=rewrite)
+
+    plan = Degradation(ef_search=ef_search, rewrite=rewrite)
+    if (tight or busy) and ef_search > settings.degraded_ef_search:
+        plan.ef_search = settings.degraded_ef_search
+        plan.reasons.append(f"ef_search={plan.ef_search}")
+    if rewrite:
+        plan.rewrite = False
+        plan.reasons.append("no_rewrite")
+    if plan.reasons:
+        cause = "deadline" if tight else "load"
+        observability.record_degraded(cause)
+        logger.info("Degraded request (%s): %s", cause, ", ".join(plan.reasons))
+    return plan
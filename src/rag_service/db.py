@@ -12,6 +12,7 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 
+from rag_service import observability
 from rag_service.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -22,6 +23,7 @@ class DatabaseManager:
 
     _engine: Optional[AsyncEngine] = None
     _session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+    _pool_capacity: int = 0
 
     @classmethod
     def _initialize(cls) -> None:
@@ -33,20 +35,32 @@ class DatabaseManager:
 
         pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
         max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        # Seconds a checkout may wait for a connection before sqlalchemy.exc.TimeoutError
+        pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+        # One extra round trip per checkout; the warmup opens fresh connections anyway
+        pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
 
         logger.info(
-            "Creating database engine with pool_size=%s max_overflow=%s",
+            "Creating database engine with pool_size=%s max_overflow=%s pre_ping=%s",
             pool_size,
             max_overflow,
+            pool_pre_ping,
         )
 
+        engine_kwargs = {}
+        if observability.enabled():
+            engine_kwargs["poolclass"] = observability.timed_pool_class()
+
         cls._engine = create_async_engine(
             database_url,
             pool_size=pool_size,
             max_overflow=max_overflow,
-            pool_pre_ping=True,
+            pool_pre_ping=pool_pre_ping,
+            pool_timeout=pool_timeout,
             pool_recycle=3600,
+            **engine_kwargs,
         )
+        cls._pool_capacity = pool_size + max_overflow
         cls._session_factory = async_sessionmaker(
             bind=cls._engine,
             class_=AsyncSession,
@@ -84,6 +98,14 @@ class DatabaseManager:
             "Database configuration not found. Set DATABASE_URL or POSTGRES_* environment variables."
         )
 
+    @classmethod
+    def get_engine(cls) -> AsyncEngine:
+        """Return the shared engine, initializing if needed."""
+        cls._initialize()
+        if not cls._engine:
+            raise RuntimeError("Engine could not be created.")
+        return cls._engine
+
     @classmethod
     def get_session_factory(cls) -> async_sessionmaker[AsyncSession]:
         """Return the shared session factory, initializing if needed."""
@@ -92,6 +114,12 @@ class DatabaseManager:
             raise RuntimeError("Session factory could not be created.")
         return cls._session_factory
 
+    @classmethod
+    def pool_capacity(cls) -> int:
+        """Most connections the pool hands out at once (pool_size + max_overflow)."""
+        cls._initialize()
+        return cls._pool_capacity
+
     @classmethod
     async def get_session(cls) -> AsyncSession:
         """Convenience helper to get a single session."""
@@ -0,0 +1,113 @@
+"""
+Per-request deadlines.
+
+The API installs a `Deadline` for each request (`scope`) and everything below reads it from a
+context variable (tasks created inside inherit it), so embedding calls, SQL statements and
+LLM calls bound themselves by the time the request has left without it being threaded
+through every signature. Without a deadline in scope every helper is a no-op.
+
+    with deadline.scope(2.0):
+        emb = await deadline.bounded(model.aget_query_embedding(q), "embed_query")
+        await deadline.apply_statement_timeout(session)  # before the expensive statement
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Awaitable, Iterator, TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar("T")
+
+# Postgres SQLSTATE for a statement cancelled by statement_timeout or a cancel request
+QUERY_CANCELED = "57014"
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed (raised at the stage that noticed it)."""
+
+
+@dataclass(frozen=True)
+class Deadline:
+    budget_s: float
+    expires_at: float  # time.monotonic()
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(budget_s=seconds, expires_at=time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def remaining_fraction(self) -> float:
+        return self.remaining() / self.budget_s if self.budget_s > 0 else 0.0
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+_current: ContextVar[Deadline | None] = ContextVar("rag_deadline", default=None)
+
+
+@contextmanager
+def scope(seconds: float | None) -> Iterator[Deadline | None]:
+    """Install a deadline `seconds` from now (None: no deadline) for the enclosed block."""
+    deadline = Deadline.after(seconds) if seconds is not None else None
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def current() -> Deadline | None:
+    return _current.get()
+
+
+def remaining(cap: float | None = None, *, stage: str = "") -> float | None:
+    """
+    Seconds left (at most `cap`), `cap` itself without a deadline in scope. Raises
+    DeadlineExceeded once the deadline has passed.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return cap
+    left = deadline.remaining()
+    if left <= 0:
+        raise DeadlineExceeded(f"deadline exceeded before {stage or 'next stage'}")
+    return min(left, cap) if cap is not None else left
+
+
+async def bounded(aw: Awaitable[T], stage: str) -> T:
+    """Await `aw`, cancelling it when the deadline passes."""
+    left = remaining(stage=stage)
+    if left is None:
+        return await aw
+    try:
+        return await asyncio.wait_for(aw, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"deadline exceeded in {stage}") from None
+
+
+async def apply_statement_timeout(session: AsyncSession, *, stage: str = "sql") -> None:
+    """
+    SET LOCAL statement_timeout to the time left, so Postgres itself cancels a statement the
+    request can no longer use. Local to the current transaction (autobegun if needed).
+    """
+    left = remaining(stage=stage)
+    if left is not None:
+        await session.execute(
+            text("SELECT set_config('statement_timeout', :ms, true)"),
+            {"ms": str(max(1, int(left * 1000)))},
+        )
+
+
+def is_query_canceled(exc: BaseException) -> bool:
+    return getattr(getattr(exc, "orig", None), "sqlstate", None) == QUERY_CANCELED
@@ -0,0 +1,363 @@
+"""
+Offline retrieval benchmark: quality metrics and latency/round-trips/bytes per configuration.
+
+Query embeddings are recorded once, so runs need only the local Postgres (no embedding API):
+
+    python -m rag_service.eval.benchmark record-embeddings \\
+        --queries evaluation/queries_merged.jsonl --out evaluation/query_embeddings.npz
+    python -m rag_service.eval.benchmark run --config evaluation/benchmark_config.json \\
+        --out bench/report.json
+    python -m rag_service.eval.benchmark compare bench/base.json bench/report.json
+
+The config is a JSON object with `source`, optional `k` (int or list), `warmup`, `repeats` and
+a `grid` list; every grid entry has a `method` (vector | bm25 | hybrid) and lists of values
+for its parameters (`ef_search`, `rrf_k`, `a`, `b`), expanded as a cartesian product.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import itertools
+import json
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from rag_service.eval.metrics import evaluate_runs
+from rag_service.models import QueryItem
+from rag_service.pipeline.retrieval import bm25_search, hybrid_search, vectors_search
+
+GRID_PARAMS = {
+    "vector": ("ef_search",),
+    "bm25": (),
+    "hybrid": ("ef_search", "rrf_k", "a", "b"),
+}
+
+
+def load_queries(path: str | Path) -> list[QueryItem]:
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [QueryItem.model_validate(json.loads(line)) for line in lines if line.strip()]
+
+
+class RecordedEmbedding:
+    """Serves query embeddings recorded by `record-embeddings`, keyed by query text."""
+
+    def __init__(self, path: str | Path) -> None:
+        data = np.load(path, allow_pickle=False)
+        self.model_name = str(data["model_name"])
+        self._vectors = {str(t): v for t, v in zip(data["texts"], data["vectors"])}
+
+    def get_query_embedding(self, query: str) -> list[float]:
+        try:
+            return self._vectors[query].tolist()
+        except KeyError:
+            raise KeyError(f"No recorded embedding for query: {query!r}") from None
+
+    async def aget_query_embedding(self, query: str) -> list[float]:
+        return self.get_query_embedding(query)
+
+
+def record_embeddings(
+    queries: list[QueryItem], out_path: str | Path, embedding_model: Any, model_name: str
+) -> None:
+    texts = sorted({q.text for q in queries})
+    vectors = np.asarray([embedding_model.get_query_embedding(t) for t in texts], dtype=np.float32)
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez(out_path, texts=np.asarray(texts), vectors=vectors, model_name=np.asarray(model_name))
+
+
+@dataclass
+class DbCounters:
+    """Statements, transaction round-trips and result-payload bytes seen on an engine."""
+
+    statements: int = 0
+    tx_round_trips: int = 0
+    bytes_fetched: int = 0
+    _listeners: list[tuple[str, Any]] = field(default_factory=list)
+
+    @property
+    def round_trips(self) -> int:
+        return self.statements + self.tx_round_trips
+
+    def attach(self, engine: AsyncEngine) -> None:
+        def on_execute(*_args) -> None:
+            self.statements += 1
+
+        def on_tx(*_args) -> None:
+            self.tx_round_trips += 1
+
+        for name, fn in (
+            ("before_cursor_execute", on_execute),
+            ("begin", on_tx),
+            ("commit", on_tx),
+            ("rollback", on_tx),
+        ):
+            event.listen(engine.sync_engine, name, fn)
+            self._listeners.append((name, fn))
+
+    def detach(self, engine: AsyncEngine) -> None:
+        for name, fn in self._listeners:
+            event.remove(engine.sync_engine, name, fn)
+        self._listeners.clear()
+
+    def snapshot(self) -> tuple[int, int]:
+        return self.round_trips, self.bytes_fetched
+
+
+def _payload_bytes(df: pd.DataFrame) -> int:
+    """Approximate bytes fetched from Postgres: chunk id (uuid), text and one float8 per row."""
+    if df.empty:
+        return 0
+    text_bytes = df["chunk_text"].map(lambda s: len(s.encode("utf-8"))).sum()
+    return int(text_bytes + len(df) * (16 + 8))
+
+
+def expand_grid(config: dict[str, Any]) -> list[dict[str, Any]]:
+    ks = config.get("k", 15)
+    ks = ks if isinstance(ks, list) else [ks]
+
+    configs = []
+    for entry in config["grid"]:
+        method = entry["method"]
+        if method not in GRID_PARAMS:
+            raise ValueError(f"Unknown method {method!r}; expected one of {list(GRID_PARAMS)}")
+        names = GRID_PARAMS[method]
+        values = [entry[n] if isinstance(entry.get(n), list) else [entry.get(n)] for n in names]
+        for k, combo in itertools.product(ks, itertools.product(*values)):
+            params = {"method": method, "k": k}
+            params.update({n: v for n, v in zip(names, combo) if v is not None})
+            configs.append(params)
+    return configs
+
+
+def config_name(params: dict[str, Any]) -> str:
+    return "_".join([params["method"]] + [f"{n}{v}" for n, v in params.items() if n != "method"])
+
+
+async def _run_one(
+    params: dict[str, Any], q: QueryItem, source: str, embedding_model: Any, session
+) -> pd.DataFrame:
+    method, k = params["method"], params["k"]
+    if method == "vector":
+        batch = await vectors_search(
+            queries=[q],
+            source=source,
+            embedding_model=embedding_model,
+            ef_search_values=[params.get("ef_search", 40)],
+            k=k,
+            session=session,
+        )
+    elif method == "bm25":
+        batch = await bm25_search(queries=[q], k=k, session=session, source=source)
+    else:
+        batch = await hybrid_search(
+            queries=[q],
+            source=source,
+            embedding_model=embedding_model,
+            ef_search_values=[params.get("ef_search", 40)],
+            k=k,
+            rrf_k=params.get("rrf_k", 60),
+            a=params.get("a", 0.5),
+            b=params.get("b", 0.5),
+            session=session,
+        )
+    return batch.to_frame()
+
+
+async def run_benchmark(
+    config: dict[str, Any],
+    queries: list[QueryItem],
+    truth: pd.DataFrame,
+    embedding_model: Any,
+    session_factory,
+    engine: AsyncEngine,
+) -> dict[str, Any]:
+    source = config["source"]
+    warmup = int(config.get("warmup", 1))
+    repeats = int(config.get("repeats", 1))
+    n_boot = int(config.get("n_boot", 1000))
+
+    counters = DbCounters()
+    counters.attach(engine)
+    results: list[dict[str, Any]] = []
+    ranked: list[pd.DataFrame] = []
+    try:
+        for params in expand_grid(config):
+            name = config_name(params)
+            latencies, round_trips, fetched = [], [], []
+
+            for i in range(warmup + repeats):
+                for q in queries:
+                    rt0, b0 = counters.snapshot()
+                    t0 = time.perf_counter()
+                    async with session_factory() as session:
+                        df = await _run_one(params, q, source, embedding_model, session)
+                    elapsed = time.perf_counter() - t0
+                    counters.bytes_fetched += _payload_bytes(df)
+                    if i < warmup:
+                        continue
+                    rt1, b1 = counters.snapshot()
+                    latencies.append(elapsed * 1000)
+                    round_trips.append(rt1 - rt0)
+                    fetched.append(b1 - b0)
+                    if i == warmup and not df.empty:
+                        ranked.append(df[["query_id", "chunk_id", "rank"]].assign(run_name=name))
+
+            lat = np.asarray(latencies)
+            results.append(
+                {
+                    "name": name,
+                    "params": params,
+                    "latency_ms": {
+                        "p50": float(np.percentile(lat, 50)),
+                        "p95": float(np.percentile(lat, 95)),
+                        "p99": float(np.percentile(lat, 99)),
+                        "mean": float(lat.mean()),
+                    },
+                    "round_trips_per_query": float(np.mean(round_trips)),
+                    "bytes_per_query": float(np.mean(fetched)),
+                    "n_queries": len(queries),
+                }
+            )
+    finally:
+        counters.detach(engine)
+
+    quality = _quality(ranked, results, truth, n_boot)
+    for r in results:
+        r["metrics"] = quality.get(r["name"], {})
+
+    return {
+        "created_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "source": source,
+        "embedding_model": getattr(embedding_model, "model_name", None),
+        "configs": results,
+    }
+
+
+def _quality(
+    ranked: list[pd.DataFrame],
+    results: list[dict[str, Any]],
+    truth: pd.DataFrame,
+    n_boot: int,
+) -> dict[str, dict[str, float]]:
+    if not ranked:
+        return {}
+    runs = pd.concat(ranked, ignore_index=True)
+    out: dict[str, dict[str, float]] = {}
+    # metrics are @k, so score each k separately
+    for k in sorted({r["params"]["k"] for r in results}):
+        names = [r["name"] for r in results if r["params"]["k"] == k]
+        subset = runs[runs["run_name"].isin(names)]
+        if subset.empty:
+            continue
+        summary = evaluate_runs(subset, k, truth=truth, n_boot=n_boot)
+        for row in summary.to_dict(orient="records"):
+            name = row.pop("run")
+            row.pop("n_queries", None)
+            out[name] = {m: float(v) for m, v in row.items()}
+    return out
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_reports(base: dict[str, Any], head: dict[str, Any]) -> pd.DataFrame:
+    """One row per configuration present in both reports, with head - base deltas."""
+
+    def flat(report: dict[str, Any]) -> pd.DataFrame:
+        rows = []
+        for r in report["configs"]:
+            row = {"name": r["name"]}
+            row.update({m: v for m, v in r["metrics"].items() if not m.endswith(("_lo", "_hi"))})
+            row.update({f"{p}_ms": v for p, v in r["latency_ms"].items()})
+            row["round_trips"] = r["round_trips_per_query"]
+            row["bytes"] = r["bytes_per_query"]
+            rows.append(row)
+        return pd.DataFrame(rows).set_index("name")
+
+    b, h = flat(base), flat(head)
+    common = b.index.intersection(h.index)
+    return (h.loc[common] - b.loc[common]).add_suffix("_delta")
+
+
+async def _run(args: argparse.Namespace) -> dict[str, Any]:
+    from rag_service.db import DatabaseManager
+
+    config = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    queries = load_queries(args.queries)
+    truth = pd.read_csv(args.truth)
+    embedding_model = RecordedEmbedding(args.embeddings)
+    try:
+        return await run_benchmark(
+            config,
+            queries,
+            truth,
+            embedding_model,
+            DatabaseManager.get_session_factory(),
+            DatabaseManager.get_engine(),
+        )
+    finally:
+        await DatabaseManager.close_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_rec = sub.add_parser("record-embeddings", help="Embed the query set once and save it")
+    p_rec.add_argument("--queries", default="evaluation/queries_merged.jsonl")
+    p_rec.add_argument("--out", default="evaluation/query_embeddings.npz")
+    p_rec.add_argument("--model", default="gemini-embedding-001")
+
+    p_run = sub.add_parser("run", help="Run the config grid and write a JSON report")
+    p_run.add_argument("--config", required=True)
+    p_run.add_argument("--queries", default="evaluation/queries_merged.jsonl")
+    p_run.add_argument("--truth", default="evaluation/mantine_truth_labels.csv")
+    p_run.add_argument("--embeddings", default="evaluation/query_embeddings.npz")
+    p_run.add_argument("--out", default=None, help="Report path (stdout if omitted)")
+
+    p_cmp = sub.add_parser("compare", help="Diff two reports (head - base)")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("head")
+
+    args = parser.parse_args()
+
+    if args.command == "record-embeddings":
+        from rag_service.providers.gemini import make_embedding_model
+
+        record_embeddings(
+            load_queries(args.queries), args.out, make_embedding_model(args.model), args.model
+        )
+        print(f"Wrote {args.out}")
+    elif args.command == "run":
+        report = json.dumps(asyncio.run(_run(args)), indent=2, sort_keys=True)
+        if args.out:
+            Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+            Path(args.out).write_text(report + "\n", encoding="utf-8")
+        else:
+            print(report)
+    else:
+        base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+        head = json.loads(Path(args.head).read_text(encoding="utf-8"))
+        with pd.option_context("display.max_columns", None, "display.width", 200):
+            print(compare_reports(base, head))
+
+
+if __name__ == "__main__":
+    main()
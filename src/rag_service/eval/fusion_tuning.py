@@ -0,0 +1,391 @@
+"""
+Offline tuning of hybrid-search fusion from cached rank lists.
+
+`capture` runs each retrieval leg once with a deep k and stores the rank lists compactly
+(chunk ids dictionary-encoded to int32, scores as float32) in an .npz. `sweep` then scores any
+number of fusion settings in memory: the candidates of every query are laid out once as a
+(queries x candidates) grid, and whole batches of configurations are fused, top-k'd and
+scored against the truth labels as NumPy arrays.
+
+`hybrid_search` fuses legs cut at the request's k, so `sweep` first truncates each leg to
+`leg_depth` (default: k) to tune on the candidate pool serving actually builds; pass a larger
+`--leg-depth` to evaluate fetching deeper legs.
+
+    python -m rag_service.eval.fusion_tuning capture --depth 100 --ef-search 100 \\
+        --out evaluation/rank_lists.npz
+    python -m rag_service.eval.fusion_tuning sweep --rank-lists evaluation/rank_lists.npz \\
+        --k 10 --leg-depth 10 --fusion rrf combsum combmnz --out bench/fusion_sweep.csv
+
+Fusion functions (weights a = vector leg, b = BM25 leg):
+    rrf      a / (rrf_k + rank_v) + b / (rrf_k + rank_b), as in `calculate_rrf_rank`
+    combsum  a * norm(sim_v) + b * norm(score_b), min-max normalised per query and leg
+    combmnz  combsum * number of legs that returned the chunk
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from rag_service.eval.metrics import RelevanceTensor, ideal_from_truth, per_query_metrics
+from rag_service.models import QueryItem
+
+LEGS = ("vector", "bm25")
+FUSIONS = ("rrf", "combsum", "combmnz")
+
+
+@dataclass
+class RankLists:
+    """Per-leg rank lists: codes index `chunk_ids` (-1 = padding), higher score = better."""
+
+    query_ids: np.ndarray  # (queries,)
+    chunk_ids: np.ndarray  # (chunks,)
+    codes: dict[str, np.ndarray]  # leg -> (queries, depth) int32
+    scores: dict[str, np.ndarray]  # leg -> (queries, depth) float32
+    meta: dict[str, Any]
+
+    def save(self, path: str | Path) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        arrays = {f"{leg}_codes": c for leg, c in self.codes.items()}
+        arrays |= {f"{leg}_scores": s for leg, s in self.scores.items()}
+        np.savez_compressed(
+            path,
+            query_ids=self.query_ids,
+            chunk_ids=self.chunk_ids,
+            meta=np.asarray(json.dumps(self.meta)),
+            **arrays,
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "RankLists":
+        data = np.load(path, allow_pickle=False)
+        return cls(
+            query_ids=data["query_ids"],
+            chunk_ids=data["chunk_ids"],
+            codes={leg: data[f"{leg}_codes"] for leg in LEGS},
+            scores={leg: data[f"{leg}_scores"] for leg in LEGS},
+            meta=json.loads(str(data["meta"])),
+        )
+
+    def truncated(self, depth: int) -> "RankLists":
+        """The top `depth` entries of every leg (a view; meta records the depth)."""
+        return RankLists(
+            query_ids=self.query_ids,
+            chunk_ids=self.chunk_ids,
+            codes={leg: c[:, :depth] for leg, c in self.codes.items()},
+            scores={leg: s[:, :depth] for leg, s in self.scores.items()},
+            meta={**self.meta, "leg_depth": depth},
+        )
+
+    @classmethod
+    def from_frames(
+        cls,
+        query_ids: list[str],
+        frames: dict[str, pd.DataFrame],
+        depth: int,
+        meta: dict[str, Any] | None = None,
+    ) -> "RankLists":
+        """Build from per-leg frames with query_id, chunk_id, rank and score (higher = better)."""
+        all_chunks = pd.concat([f["chunk_id"].astype(str) for f in frames.values()])
+        chunk_ids = np.asarray(sorted(all_chunks.unique()))
+        q_index = {q: i for i, q in enumerate(query_ids)}
+
+        codes, scores = {}, {}
+        for leg, df in frames.items():
+            c = np.full((len(query_ids), depth), -1, dtype=np.int32)
+            s = np.zeros((len(query_ids), depth), dtype=np.float32)
+            df = df[df["rank"] <= depth]
+            rows = df["query_id"].astype(str).map(q_index).to_numpy()
+            cols = df["rank"].to_numpy() - 1
+            c[rows, cols] = np.searchsorted(chunk_ids, df["chunk_id"].astype(str).to_numpy())
+            s[rows, cols] = df["score"].to_numpy()
+            codes[leg], scores[leg] = c, s
+
+        return cls(
+            query_ids=np.asarray(query_ids),
+            chunk_ids=chunk_ids,
+            codes=codes,
+            scores=scores,
+            meta=meta or {},
+        )
+
+
+@dataclass
+class FusionConfig:
+    fusion: str
+    a: float
+    b: float
+    rrf_k: float = float("nan")
+
+    @property
+    def name(self) -> str:
+        if self.fusion == "rrf":
+            return f"rrf_k{self.rrf_k:g}_a{self.a:g}_b{self.b:g}"
+        return f"{self.fusion}_a{self.a:g}_b{self.b:g}"
+
+
+def make_grid(fusions: list[str], rrf_ks: list[float], weights: list[float]) -> list[FusionConfig]:
+    configs = []
+    for fusion in fusions:
+        if fusion not in FUSIONS:
+            raise ValueError(f"Unknown fusion {fusion!r}; expected one of {FUSIONS}")
+        for a, b in itertools.product(weights, weights):
+            if a == 0 and b == 0:
+                continue
+            if fusion == "rrf":
+                configs.extend(FusionConfig("rrf", a, b, rrf_k) for rrf_k in rrf_ks)
+            else:
+                configs.append(FusionConfig(fusion, a, b))
+    return configs
+
+
+class CandidateGrid:
+    """
+    Every query's candidate set (union of both legs) as a padded (queries x candidates) grid,
+    with each leg's rank and normalised score per cell. Built once per rank-list file.
+    """
+
+    def __init__(self, lists: RankLists) -> None:
+        n_queries = len(lists.query_ids)
+        per_query = [
+            np.unique(np.concatenate([lists.codes[leg][q] for leg in LEGS]))
+            for q in range(n_queries)
+        ]
+        per_query = [c[c >= 0] for c in per_query]
+        width = max((len(c) for c in per_query), default=0)
+
+        self.candidates = np.full((n_queries, width), -1, dtype=np.int32)
+        for q, c in enumerate(per_query):
+            self.candidates[q, : len(c)] = c
+        self.valid = self.candidates >= 0
+
+        self.ranks: dict[str, np.ndarray] = {}
+        self.norm_scores: dict[str, np.ndarray] = {}
+        for leg in LEGS:
+            rank = np.full((n_queries, width), np.inf)
+            norm = np.zeros((n_queries, width))
+            codes, scores = lists.codes[leg], lists.scores[leg].astype(float)
+            present = codes >= 0
+            lo = np.where(present, scores, np.inf).min(axis=1, keepdims=True)
+            hi = np.where(present, scores, -np.inf).max(axis=1, keepdims=True)
+            span = np.where(hi > lo, hi - lo, 1.0)
+            normed = np.where(present, (scores - lo) / span, 0.0)
+            for q in range(n_queries):
+                cols = np.searchsorted(per_query[q], codes[q][present[q]])
+                rank[q, cols] = np.flatnonzero(present[q]) + 1
+                norm[q, cols] = normed[q][present[q]]
+            self.ranks[leg] = rank
+            self.norm_scores[leg] = norm
+
+    def relevance(self, lists: RankLists, truth: pd.DataFrame) -> np.ndarray:
+        """Graded truth relevance per candidate cell (0 for unlabelled / padding)."""
+        lookup = {
+            (str(q), str(c)): float(r)
+            for q, c, r in truth[["query_id", "chunk_id", "relevance"]].itertuples(index=False)
+        }
+        rel = np.zeros(self.candidates.shape)
+        for q, qid in enumerate(lists.query_ids):
+            for j, code in enumerate(self.candidates[q][self.valid[q]]):
+                rel[q, j] = lookup.get((str(qid), str(lists.chunk_ids[code])), 0.0)
+        return rel
+
+    def fuse(self, fusion: str, a: np.ndarray, b: np.ndarray, rrf_k: np.ndarray) -> np.ndarray:
+        """Fused scores (configs x queries x candidates) for one fusion function."""
+        a, b = a[:, None, None], b[:, None, None]
+        rv, rb = self.ranks["vector"][None], self.ranks["bm25"][None]
+        if fusion == "rrf":
+            kk = rrf_k[:, None, None]
+            return a / (kk + rv) + b / (kk + rb)  # absent leg: rank inf -> 0
+        sv, sb = self.norm_scores["vector"][None], self.norm_scores["bm25"][None]
+        scores = a * sv + b * sb
+        if fusion == "combmnz":
+            scores = scores * (np.isfinite(rv).astype(float) + np.isfinite(rb))
+        return scores
+
+
+def sweep(
+    lists: RankLists,
+    truth: pd.DataFrame,
+    configs: list[FusionConfig],
+    k: int = 10,
+    min_relevance: int = 2,
+    batch_size: int = 512,
+    leg_depth: int | None = None,
+) -> pd.DataFrame:
+    """
+    Score every fusion config at cutoff k; one row per config, sorted by nDCG@k. Each leg
+    is first cut to `leg_depth` (default k, as `hybrid_search` does).
+    """
+    leg_depth = leg_depth or k
+    lists = lists.truncated(leg_depth)
+    grid = CandidateGrid(lists)
+    rel = grid.relevance(lists, truth)
+    query_ids = [str(q) for q in lists.query_ids]
+    labels = truth[["query_id", "chunk_id", "relevance"]].astype({"chunk_id": str})
+    labels = labels.groupby(["query_id", "chunk_id"], as_index=False)["relevance"].max()
+    ideal, n_relevant = ideal_from_truth(labels, query_ids, k, min_relevance)
+
+    frames = []
+    by_fusion: dict[str, list[FusionConfig]] = {}
+    for c in configs:
+        by_fusion.setdefault(c.fusion, []).append(c)
+
+    for fusion, group in by_fusion.items():
+        for start in range(0, len(group), batch_size):
+            batch = group[start : start + batch_size]
+            scores = grid.fuse(
+                fusion,
+                np.array([c.a for c in batch]),
+                np.array([c.b for c in batch]),
+                np.array([c.rrf_k for c in batch]),
+            )
+            scores = np.where(grid.valid[None], scores, -np.inf)
+            top = np.argsort(-scores, axis=-1, kind="stable")[..., :k]
+            rels = np.take_along_axis(np.broadcast_to(rel, scores.shape), top, axis=-1)
+            rels = np.where(np.take_along_axis(scores, top, axis=-1) > -np.inf, rels, 0.0)
+            if rels.shape[-1] < k:
+                rels = np.pad(rels, [(0, 0), (0, 0), (0, k - rels.shape[-1])])
+
+            t = RelevanceTensor(
+                runs=[c.name for c in batch],
+                query_ids=query_ids,
+                rels=rels,
+                ideal=ideal,
+                n_relevant=n_relevant,
+                min_relevance=min_relevance,
+            )
+            out = pd.DataFrame(
+                {
+                    "name": t.runs,
+                    "fusion": fusion,
+                    "leg_depth": leg_depth,
+                    "rrf_k": [c.rrf_k for c in batch],
+                    "a": [c.a for c in batch],
+                    "b": [c.b for c in batch],
+                }
+            )
+            for metric, values in per_query_metrics(t).items():
+                out[metric] = values.mean(axis=-1)
+            frames.append(out)
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True).sort_values(
+        f"nDCG@{k}", ascending=False, ignore_index=True
+    )
+
+
+async def capture(
+    queries: list[QueryItem],
+    *,
+    source: str,
+    embedding_model: Any,
+    depth: int,
+    ef_search: int,
+    session_factory,
+) -> RankLists:
+    """Run both legs once at `depth` and keep their rank lists."""
+    from rag_service.pipeline.retrieval import bm25_search, vectors_search
+
+    async with session_factory() as session:
+        vector_hits = await vectors_search(
+            queries=queries,
+            source=source,
+            embedding_model=embedding_model,
+            ef_search_values=[max(ef_search, depth)],
+            k=depth,
+            session=session,
+        )
+    async with session_factory() as session:
+        keyword_hits = await bm25_search(queries=queries, k=depth, session=session, source=source)
+
+    vector_df = vector_hits.to_frame(include_text=False).assign(score=vector_hits.similarity())
+    keyword_df = keyword_hits.to_frame(include_text=False)
+    return RankLists.from_frames(
+        [q.id for q in queries],
+        {"vector": vector_df, "bm25": keyword_df},
+        depth,
+        meta={
+            "source": source,
+            "depth": depth,
+            "ef_search": max(ef_search, depth),
+            "embedding_model": getattr(embedding_model, "model_name", None),
+        },
+    )
+
+
+async def _capture(args: argparse.Namespace) -> RankLists:
+    from rag_service.db import DatabaseManager
+    from rag_service.eval.benchmark import RecordedEmbedding, load_queries
+
+    try:
+        return await capture(
+            load_queries(args.queries),
+            source=args.source,
+            embedding_model=RecordedEmbedding(args.embeddings),
+            depth=args.depth,
+            ef_search=args.ef_search,
+            session_factory=DatabaseManager.get_session_factory(),
+        )
+    finally:
+        await DatabaseManager.close_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline fusion-parameter tuning")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_cap = sub.add_parser("capture", help="Run both legs once and store deep rank lists")
+    p_cap.add_argument("--source", default="mantine_docs")
+    p_cap.add_argument("--queries", default="evaluation/queries_merged.jsonl")
+    p_cap.add_argument("--embeddings", default="evaluation/query_embeddings.npz")
+    p_cap.add_argument("--depth", type=int, default=100)
+    p_cap.add_argument("--ef-search", type=int, default=100)
+    p_cap.add_argument("--out", default="evaluation/rank_lists.npz")
+
+    p_sweep = sub.add_parser("sweep", help="Score a fusion grid against the truth labels")
+    p_sweep.add_argument("--rank-lists", default="evaluation/rank_lists.npz")
+    p_sweep.add_argument("--truth", default="evaluation/mantine_truth_labels.csv")
+    p_sweep.add_argument("--k", type=int, default=10)
+    p_sweep.add_argument(
+        "--leg-depth", type=int, default=None, help="Cut each leg to this depth (default: k)"
+    )
+    p_sweep.add_argument("--fusion", nargs="+", default=list(FUSIONS), choices=FUSIONS)
+    p_sweep.add_argument(
+        "--rrf-k", nargs="+", type=float, default=[1, 5, 10, 20, 30, 40, 60, 80, 100, 200]
+    )
+    p_sweep.add_argument(
+        "--weights", nargs="+", type=float, default=[round(w, 1) for w in np.arange(0, 1.05, 0.1)]
+    )
+    p_sweep.add_argument("--top", type=int, default=20)
+    p_sweep.add_argument("--out", default=None, help="Write all results as CSV")
+
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        lists = asyncio.run(_capture(args))
+        lists.save(args.out)
+        print(f"Wrote {args.out} ({len(lists.query_ids)} queries, {len(lists.chunk_ids)} chunks)")
+        return
+
+    lists = RankLists.load(args.rank_lists)
+    configs = make_grid(args.fusion, args.rrf_k, args.weights)
+    results = sweep(lists, pd.read_csv(args.truth), configs, k=args.k, leg_depth=args.leg_depth)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        results.to_csv(args.out, index=False)
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(f"{len(configs)} configurations, legs cut at {args.leg_depth or args.k}")
+        print(results.head(args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Cold-start import budget for the API process.
+
+Imports the API modules (the app and the lazily imported search path) in fresh interpreters
+under `python -X importtime` and fails when
+
+  - the cumulative import time (best of `--repeat` runs) exceeds the budget, or
+  - a module that only ingestion / notebooks need (pandas, llama_index, google.genai,
+    langchain, ...) ends up on the import path.
+
+The second check is deterministic and catches most regressions: a module-level
+`import pandas` in something the API imports shows up with the chain that pulled it in.
+
+Import times depend on the machine, so by default the budget is relative: `--budget-ratio`
+(IMPORT_BUDGET_RATIO, default 1.6) times the import time of the framework modules the API
+cannot avoid (FastAPI, SQLModel, ...), measured the same way. `--budget-ms`
+(IMPORT_BUDGET_MS) sets an absolute budget instead.
+
+    python -m rag_service.eval.import_budget
+    python -m rag_service.eval.import_budget --budget-ms 600 --top 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+
+# Heavy dependencies that the serving path must only load on first use
+SERVING_FORBIDDEN = (
+    "pandas",
+    "pyarrow",
+    "llama_index",
+    "google.genai",
+    "langchain_text_splitters",
+    "prometheus_client",  # imported only when METRICS_ENABLED=true
+)
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    chain: tuple[str, ...]  # importers, outermost first
+
+
+SERVING_MODULES = ("rag_service.main", "rag_service.pipeline.retrieval")
+
+# Third-party modules every API process imports; their import time is the yardstick for a
+# machine-independent budget
+FRAMEWORK_MODULES = (
+    "fastapi",
+    "sqlmodel",
+    "sqlalchemy.ext.asyncio",
+    "pydantic_settings",
+    "pgvector.sqlalchemy",
+)
+
+DEFAULT_BUDGET_RATIO = 1.6
+
+
+@dataclass
+class ImportProfile:
+    targets: tuple[str, ...]
+    records: dict[str, ImportRecord] = field(default_factory=dict)
+    budget_ms: float | None = None  # set by check()
+
+    @property
+    def total_ms(self) -> float:
+        # imported in order, so each target's cumulative time excludes what came before
+        return sum(self.records[t].cumulative_us for t in self.targets if t in self.records) / 1000
+
+    def imported(self, name: str) -> ImportRecord | None:
+        """The first-imported record for `name` or any of its submodules."""
+        hits = [r for m, r in self.records.items() if m == name or m.startswith(name + ".")]
+        return min(hits, key=lambda r: len(r.chain)) if hits else None
+
+    def slowest(self, n: int = 10) -> list[ImportRecord]:
+        return sorted(self.records.values(), key=lambda r: r.self_us, reverse=True)[:n]
+
+
+def parse_importtime(stderr: str, targets: tuple[str, ...]) -> ImportProfile:
+    """
+    Parse `-X importtime` output. Lines are printed when an import finishes, so children
+    come before their parent; indentation (2 spaces per level) gives the nesting.
+    """
+    parsed = []
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            parsed.append((int(m[1]), int(m[2]), len(m[3]) // 2, m[4]))
+
+    profile = ImportProfile(targets=targets)
+    # Walk backwards so every parent is seen before its children
+    stack: list[tuple[int, str]] = []
+    for self_us, cum_us, depth, name in reversed(parsed):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        chain = tuple(n for _, n in stack)
+        profile.records.setdefault(name, ImportRecord(name, self_us, cum_us, chain))
+        stack.append((depth, name))
+    return profile
+
+
+def measure(
+    targets: tuple[str, ...] = SERVING_MODULES, python: str = sys.executable
+) -> ImportProfile:
+    env = dict(os.environ)
+    # bytecode has to be cached for the warm runs to measure imports, not compilation
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", "import " + ", ".join(targets)],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    if proc.returncode != 0:
+        tail = [ln for ln in proc.stderr.splitlines() if not ln.startswith("import time:")]
+        raise RuntimeError(f"import {', '.join(targets)} failed:\n" + "\n".join(tail[-20:]))
+    return parse_importtime(proc.stderr, targets)
+
+
+def _best(targets: tuple[str, ...], repeat: int) -> ImportProfile:
+    """Best-of-`repeat` profile, after one warm-up run for the bytecode cache."""
+    measure(targets)
+    return min((measure(targets) for _ in range(repeat)), key=lambda p: p.total_ms)
+
+
+def check(
+    targets: tuple[str, ...] = SERVING_MODULES,
+    *,
+    budget_ms: float | None = None,
+    budget_ratio: float = DEFAULT_BUDGET_RATIO,
+    forbidden: tuple[str, ...] = SERVING_FORBIDDEN,
+    repeat: int = 5,
+) -> tuple[ImportProfile, list[str]]:
+    """
+    Best-of-`repeat` profile and failures. Without `budget_ms` the budget is `budget_ratio`
+    times the import time of FRAMEWORK_MODULES on this machine.
+    """
+    profile = _best(targets, repeat)
+    if budget_ms is None:
+        budget_ms = budget_ratio * _best(FRAMEWORK_MODULES, repeat).total_ms
+    profile.budget_ms = budget_ms
+
+    failures = []
+    for name in forbidden:
+        rec = profile.imported(name)
+        if rec is not None:
+            via = " <- ".join(reversed(rec.chain)) or "(top level)"
+            failures.append(f"{name} imported via {via}")
+    if profile.total_ms > budget_ms:
+        failures.append(f"imports took {profile.total_ms:.0f} ms > {budget_ms:.0f} ms")
+    return profile, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fail when cold-start imports regress")
+    parser.add_argument(
+        "--module", action="append", default=None, help=f"Default: {' '.join(SERVING_MODULES)}"
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.environ["IMPORT_BUDGET_MS"]) if "IMPORT_BUDGET_MS" in os.environ else None,
+        help="Absolute budget (default: relative, see --budget-ratio)",
+    )
+    parser.add_argument(
+        "--budget-ratio",
+        type=float,
+        default=float(os.environ.get("IMPORT_BUDGET_RATIO", DEFAULT_BUDGET_RATIO)),
+        help="Budget as a multiple of the framework modules' import time",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest modules")
+    parser.add_argument(
+        "--allow", action="append", default=[], help="Drop a module from the forbidden list"
+    )
+    args = parser.parse_args()
+
+    targets = tuple(args.module or SERVING_MODULES)
+    forbidden = tuple(m for m in SERVING_FORBIDDEN if m not in args.allow)
+    profile, failures = check(
+        targets,
+        budget_ms=args.budget_ms,
+        budget_ratio=args.budget_ratio,
+        forbidden=forbidden,
+        repeat=args.repeat,
+    )
+
+    print(
+        f"import {', '.join(targets)}: {profile.total_ms:.0f} ms "
+        f"(budget {profile.budget_ms:.0f} ms)"
+    )
+    for rec in profile.slowest(args.top):
+        print(f"  {rec.self_us / 1000:8.1f} ms  {rec.module}")
+    if failures:
+        print("FAIL")
+        for f in failures:
+            print(f"  {f}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
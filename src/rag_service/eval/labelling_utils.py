@@ -1,14 +1,19 @@
-from ..models import RetrievalHit
+from ..models import HitBatch, RetrievalHit
 from pathlib import Path
 from typing import Any
 import csv
 import pandas as pd
 
 
-def export_hits_to_csv(hits: list[Any], out_path: str) -> str:
+def export_hits_to_csv(hits: HitBatch | list[Any], out_path: str) -> str:
     path = Path(out_path)
     path.parent.mkdir(parents=True, exist_ok=True)
 
+    if isinstance(hits, HitBatch):
+        df = hits.to_frame().assign(relevance="")
+        df.to_csv(path, index=False, encoding="utf-8")
+        return str(path)
+
     rows = []
     for h in hits:
         d = h.model_dump()
@@ -0,0 +1,263 @@
+"""
+Open-loop load generator for the `/search` endpoint.
+
+Requests are fired on a fixed arrival schedule (Poisson or uniform) regardless of how fast
+earlier ones complete, so latency is measured from each request's *scheduled* start and a
+saturated server shows up as growing latency rather than silently lower offered load.
+
+Start the API with the deterministic embedder so runs are reproducible without network:
+
+    EMBEDDING_PROVIDER=fake make api
+    python -m rag_service.eval.loadgen run --qps 50 --duration 30 --source mantine_docs
+    python -m rag_service.eval.loadgen sweep --start-qps 10 --max-qps 400 --p99-slo-ms 250
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass
+from itertools import cycle
+from pathlib import Path
+from typing import Any
+
+import httpx
+import numpy as np
+
+
+@dataclass
+class LoadResult:
+    target_qps: float
+    duration_s: float
+    n_sent: int
+    n_ok: int
+    n_errors: int
+    n_timeouts: int
+    offered_qps: float
+    throughput_qps: float
+    latency_ms: dict[str, float]
+    pool_wait_ms: dict[str, float]
+    n_shed: int = 0  # 429 / 503 / 504 from admission control and deadlines
+
+    @property
+    def error_rate(self) -> float:
+        failed = self.n_errors + self.n_timeouts + self.n_shed
+        return failed / self.n_sent if self.n_sent else 0.0
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {"p50": float("nan"), "p95": float("nan"), "p99": float("nan"), "max": float("nan")}
+    arr = np.asarray(values)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(arr.max())}
+
+
+def arrival_offsets(qps: float, duration_s: float, poisson: bool, seed: int) -> np.ndarray:
+    """Send times (seconds from start) for an open-loop schedule at `qps`."""
+    n = int(qps * duration_s)
+    if not poisson:
+        return np.arange(n) / qps
+    gaps = np.random.default_rng(seed).exponential(1.0 / qps, size=n)
+    return np.cumsum(gaps)
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    queries: list[str],
+    *,
+    source: str,
+    qps: float,
+    duration_s: float,
+    mode: str = "hybrid",
+    k: int = 10,
+    timeout_s: float = 5.0,
+    poisson: bool = True,
+    seed: int = 0,
+) -> LoadResult:
+    offsets = arrival_offsets(qps, duration_s, poisson, seed)
+    latencies: list[float] = []
+    pool_waits: list[float] = []
+    counts = {"ok": 0, "error": 0, "timeout": 0, "shed": 0}
+
+    async def one(scheduled: float, query: str) -> None:
+        try:
+            resp = await client.post(
+                "/search",
+                json={"query": query, "source": source, "k": k, "mode": mode},
+                timeout=timeout_s,
+            )
+        except httpx.TimeoutException:
+            counts["timeout"] += 1
+            return
+        except httpx.HTTPError:
+            counts["error"] += 1
+            return
+        if resp.status_code in (429, 503, 504):
+            counts["shed"] += 1
+            return
+        if resp.status_code != 200:
+            counts["error"] += 1
+            return
+        counts["ok"] += 1
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+        pool_waits.append(resp.json().get("timings_ms", {}).get("pool_wait", float("nan")))
+
+    start = time.perf_counter()
+    tasks = []
+    for offset, query in zip(offsets, cycle(queries)):
+        scheduled = start + offset
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(scheduled, query)))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - start
+
+    return LoadResult(
+        target_qps=qps,
+        duration_s=duration_s,
+        n_sent=len(tasks),
+        n_ok=counts["ok"],
+        n_errors=counts["error"],
+        n_timeouts=counts["timeout"],
+        offered_qps=len(tasks) / duration_s if duration_s else 0.0,
+        throughput_qps=counts["ok"] / wall if wall else 0.0,
+        latency_ms=_percentiles(latencies),
+        pool_wait_ms=_percentiles([w for w in pool_waits if w == w]),
+        n_shed=counts["shed"],
+    )
+
+
+def is_sustainable(result: LoadResult, p99_slo_ms: float, max_error_rate: float) -> bool:
+    # In an open loop an overloaded server cannot lower the offered rate, so saturation
+    # shows up as queueing (p99 from the scheduled send time) and timeouts.
+    return result.latency_ms["p99"] <= p99_slo_ms and result.error_rate <= max_error_rate
+
+
+async def saturation_sweep(
+    client: httpx.AsyncClient,
+    queries: list[str],
+    *,
+    start_qps: float,
+    max_qps: float,
+    step_factor: float = 1.5,
+    p99_slo_ms: float = 250.0,
+    max_error_rate: float = 0.01,
+    cooldown_s: float = 2.0,
+    **load_kwargs: Any,
+) -> tuple[float | None, list[LoadResult]]:
+    """
+    Raise the arrival rate geometrically until a step breaks the SLO, then bisect between
+    the last good and first bad rate. Returns (max sustainable QPS or None, all steps).
+    """
+    results: list[LoadResult] = []
+
+    async def step(qps: float) -> bool:
+        result = await run_load(client, queries, qps=qps, **load_kwargs)
+        results.append(result)
+        await asyncio.sleep(cooldown_s)
+        return is_sustainable(result, p99_slo_ms, max_error_rate)
+
+    good: float | None = None
+    bad: float | None = None
+    qps = start_qps
+    while qps <= max_qps:
+        if await step(qps):
+            good = qps
+            qps *= step_factor
+        else:
+            bad = qps
+            break
+
+    if good is not None and bad is not None:
+        for _ in range(3):
+            mid = (good + bad) / 2
+            if await step(mid):
+                good = mid
+            else:
+                bad = mid
+
+    return good, results
+
+
+def load_query_texts(path: str | Path) -> list[str]:
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [json.loads(line)["text"] for line in lines if line.strip()]
+
+
+async def _main(args: argparse.Namespace) -> dict[str, Any]:
+    queries = load_query_texts(args.queries)
+    load_kwargs = {
+        "source": args.source,
+        "duration_s": args.duration,
+        "mode": args.mode,
+        "k": args.k,
+        "timeout_s": args.timeout,
+        "poisson": not args.uniform,
+        "seed": args.seed,
+    }
+    limits = httpx.Limits(max_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        if args.command == "run":
+            result = await run_load(client, queries, qps=args.qps, **load_kwargs)
+            return {"result": asdict(result), "error_rate": result.error_rate}
+
+        best, steps = await saturation_sweep(
+            client,
+            queries,
+            start_qps=args.start_qps,
+            max_qps=args.max_qps,
+            step_factor=args.step_factor,
+            p99_slo_ms=args.p99_slo_ms,
+            max_error_rate=args.max_error_rate,
+            **load_kwargs,
+        )
+        return {
+            "max_sustainable_qps": best,
+            "p99_slo_ms": args.p99_slo_ms,
+            "steps": [asdict(s) | {"error_rate": s.error_rate} for s in steps],
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Open-loop load generator for /search")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--url", default="http://localhost:8000")
+        p.add_argument("--queries", default="evaluation/queries_merged.jsonl")
+        p.add_argument("--source", default="mantine_docs")
+        p.add_argument("--mode", choices=["vector", "bm25", "hybrid"], default="hybrid")
+        p.add_argument("--k", type=int, default=10)
+        p.add_argument("--duration", type=float, default=30.0, help="Seconds per load step")
+        p.add_argument("--timeout", type=float, default=5.0, help="Per-request timeout (s)")
+        p.add_argument("--uniform", action="store_true", help="Fixed gaps instead of Poisson")
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--max-connections", type=int, default=1000)
+        p.add_argument("--out", default=None, help="Write the JSON report here")
+
+    p_run = sub.add_parser("run", help="One load step at a fixed arrival rate")
+    common(p_run)
+    p_run.add_argument("--qps", type=float, required=True)
+
+    p_sweep = sub.add_parser("sweep", help="Find the max QPS that meets the p99/error SLO")
+    common(p_sweep)
+    p_sweep.add_argument("--start-qps", type=float, default=10.0)
+    p_sweep.add_argument("--max-qps", type=float, default=1000.0)
+    p_sweep.add_argument("--step-factor", type=float, default=1.5)
+    p_sweep.add_argument("--p99-slo-ms", type=float, default=250.0)
+    p_sweep.add_argument("--max-error-rate", type=float, default=0.01)
+
+    args = parser.parse_args()
+    report = json.dumps(asyncio.run(_main(args)), indent=2)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(report + "\n", encoding="utf-8")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class RelevanceTensor:
+    """
+    Graded relevance of the top-k results for every (run, query), padded with zeros.
+
+    `ideal` holds the best achievable top-k gains (for IDCG) and `n_relevant` the number of
+    relevant chunks per query (for recall). With truth labels the ideal is per query; without
+    them it is each run's own retrieved list sorted by relevance, as in `calculate_ndcg`.
+    """
+
+    runs: list[str]
+    query_ids: list[str]
+    rels: np.ndarray  # (runs, queries, k)
+    ideal: np.ndarray  # (queries, k) or (runs, queries, k)
+    n_relevant: Optional[np.ndarray]  # (queries,) or None without truth labels
+    min_relevance: int = 2
+
+    @property
+    def k(self) -> int:
+        return self.rels.shape[-1]
+
+
+def build_relevance_tensor(
+    df: pd.DataFrame,
+    k: int,
+    truth: Optional[pd.DataFrame] = None,
+    run_col: str = "run_name",
+    min_relevance: int = 2,
+) -> RelevanceTensor:
+    """
+    Build the (runs x queries x k) relevance array from a ranked-results table.
+
+    `df` needs query_id, chunk_id and rank, plus relevance unless `truth`
+    (query_id, chunk_id, relevance) is given, in which case labels are looked up there.
+    Rows are sorted and deduplicated per (run, query) once, as `prepare_ranked_list` does
+    for a single run.
+    """
+    df = df.copy()
+    if run_col not in df.columns:
+        df[run_col] = "run"
+    df["chunk_id"] = df["chunk_id"].astype(str)
+
+    if truth is not None:
+        labels = truth[["query_id", "chunk_id", "relevance"]].copy()
+        labels["chunk_id"] = labels["chunk_id"].astype(str)
+        labels = labels.groupby(["query_id", "chunk_id"], as_index=False)["relevance"].max()
+        df = df.drop(columns=["relevance"], errors="ignore").merge(
+            labels, on=["query_id", "chunk_id"], how="left"
+        )
+    df["relevance"] = pd.to_numeric(df["relevance"], errors="coerce").fillna(0)
+
+    df = df.sort_values([run_col, "query_id", "rank"], kind="stable")
+    df = df.drop_duplicates(subset=[run_col, "query_id", "chunk_id"], keep="first")
+    pos = df.groupby([run_col, "query_id"]).cumcount().to_numpy()
+
+    query_ids = sorted(df["query_id"].unique())
+    if truth is not None:
+        query_ids = sorted(set(query_ids) | set(truth["query_id"].unique()))
+    run_codes, runs = pd.factorize(df[run_col], sort=True)
+    query_codes = pd.Categorical(df["query_id"], categories=query_ids).codes
+
+    depth = max(k, int(pos.max()) + 1 if len(pos) else 0)
+    full = np.zeros((len(runs), len(query_ids), depth))
+    full[run_codes, query_codes, pos] = df["relevance"].to_numpy()
+    rels = full[..., :k]
+
+    if truth is not None:
+        ideal, n_relevant = ideal_from_truth(labels, query_ids, k, min_relevance)
+    else:
+        ideal = -np.sort(-full, axis=-1)[..., :k]
+        n_relevant = None
+
+    return RelevanceTensor(
+        runs=[str(r) for r in runs],
+        query_ids=list(query_ids),
+        rels=rels,
+        ideal=ideal,
+        n_relevant=n_relevant,
+        min_relevance=min_relevance,
+    )
+
+
+def ideal_from_truth(
+    labels: pd.DataFrame, query_ids: list[str], k: int, min_relevance: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Ideal top-k gains (queries x k) and relevant-chunk counts per query from truth labels."""
+    labels = labels[labels["query_id"].isin(query_ids)]
+    labels = labels.sort_values(["query_id", "relevance"], ascending=[True, False])
+    pos = labels.groupby("query_id").cumcount().to_numpy()
+    q = pd.Categorical(labels["query_id"], categories=query_ids).codes
+    rel = labels["relevance"].to_numpy(dtype=float)
+
+    keep = pos < k
+    ideal = np.zeros((len(query_ids), k))
+    ideal[q[keep], pos[keep]] = rel[keep]
+    n_relevant = np.bincount(q[rel >= min_relevance], minlength=len(query_ids))
+    return ideal, n_relevant
+
+
+def _dcg(rels: np.ndarray) -> np.ndarray:
+    discounts = np.log2(np.arange(2, rels.shape[-1] + 2))
+    return ((2**rels - 1) / discounts).sum(axis=-1)
+
+
+def per_query_metrics(t: RelevanceTensor) -> dict[str, np.ndarray]:
+    """Per-query scores, each (runs x queries)."""
+    k = t.k
+    hits = t.rels >= t.min_relevance
+    n_hits = hits.sum(axis=-1)
+    ranks = np.arange(1, k + 1)
+
+    precision_at_i = np.cumsum(hits, axis=-1) / ranks
+    # same convention as calculate_average_precision: normalised by relevant found in top-k
+    ap = np.divide(
+        (precision_at_i * hits).sum(axis=-1),
+        n_hits,
+        out=np.zeros(n_hits.shape),
+        where=n_hits > 0,
+    )
+
+    dcg = _dcg(t.rels)
+    idcg = _dcg(t.ideal)
+    ndcg = np.divide(dcg, idcg, out=np.zeros(dcg.shape), where=idcg > 0)
+
+    first = hits.argmax(axis=-1)
+    mrr = np.where(n_hits > 0, 1.0 / (first + 1), 0.0)
+
+    if t.n_relevant is not None:
+        denom = t.n_relevant[None, :]
+        recall = np.divide(n_hits, denom, out=np.zeros(n_hits.shape), where=denom > 0)
+    else:
+        recall = np.full(n_hits.shape, np.nan)
+
+    return {
+        f"P@{k}": n_hits / k,
+        f"MAP@{k}": ap,
+        f"nDCG@{k}": ndcg,
+        f"DCG@{k}": dcg,
+        f"Recall@{k}": recall,
+        f"MRR@{k}": mrr,
+    }
+
+
+def bootstrap_ci(
+    scores: np.ndarray,
+    n_boot: int = 1000,
+    alpha: float = 0.05,
+    seed: int = 0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Percentile bootstrap CI of the mean over queries for each run (`scores` is runs x queries).
+
+    The same query resamples are used for every run, so intervals are paired across runs.
+    """
+    n_queries = scores.shape[-1]
+    if n_queries == 0:
+        nan = np.full(scores.shape[0], np.nan)
+        return nan, nan
+    idx = np.random.default_rng(seed).integers(0, n_queries, size=(n_boot, n_queries))
+    means = scores[:, idx].mean(axis=-1)  # (runs, n_boot)
+    lo, hi = np.percentile(means, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=-1)
+    return lo, hi
+
+
+def evaluate_runs(
+    df: pd.DataFrame,
+    k: int,
+    truth: Optional[pd.DataFrame] = None,
+    run_col: str = "run_name",
+    min_relevance: int = 2,
+    n_boot: int = 1000,
+    alpha: float = 0.05,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Score every run in `df` at once: one row per run with the mean of each metric and,
+    when `n_boot` > 0, `<metric>_lo` / `<metric>_hi` bootstrap confidence bounds.
+    """
+    t = build_relevance_tensor(df, k, truth=truth, run_col=run_col, min_relevance=min_relevance)
+    scores = per_query_metrics(t)
+
+    out = pd.DataFrame({"run": t.runs, "n_queries": len(t.query_ids)})
+    for name, values in scores.items():
+        out[name] = values.mean(axis=-1)
+        if n_boot and not np.isnan(values).all():
+            out[f"{name}_lo"], out[f"{name}_hi"] = bootstrap_ci(
+                values, n_boot=n_boot, alpha=alpha, seed=seed
+            )
+    return out
+
+
+def per_query_frame(t: RelevanceTensor) -> pd.DataFrame:
+    """Long-format per-query scores (run, query_id, metric columns)."""
+    scores = per_query_metrics(t)
+    n_runs, n_queries = len(t.runs), len(t.query_ids)
+    out = pd.DataFrame(
+        {
+            "run": np.repeat(t.runs, n_queries),
+            "query_id": np.tile(t.query_ids, n_runs),
+        }
+    )
+    for name, values in scores.items():
+        out[name] = values.reshape(-1)
+    return out
@@ -35,12 +35,8 @@ def calculate_average_precision(relevance: np.ndarray, k: int) -> float:
     rels = np.asarray(relevance, dtype=float)[:k]
     if rels.size == 0:
         return 0.0
-    total_rel = 0
-    sum_precisions = 0.0
-    for i in range(len(rels)):
-        if rels[i] > 1:
-            total_rel += 1
-            precision_at_i = total_rel / (i + 1)
-            sum_precisions += precision_at_i
-    average_precision = sum_precisions / total_rel if total_rel > 0 else 0.0
-    return average_precision
+    hits = rels > 1
+    if not hits.any():
+        return 0.0
+    precision_at_i = np.cumsum(hits) / np.arange(1, rels.size + 1)
+    return float(precision_at_i[hits].mean())
@@ -0,0 +1,296 @@
+"""
+Columnar store for retrieval runs and relevance labels (Parquet via pyarrow).
+
+Layout under the store root:
+
+    hits/<run>-<id>.parquet     run_name, param_value, query_id, rank, chunk_id, dist, score
+    chunks/<id>.parquet         chunk_id, chunk_text   (each chunk's text stored once)
+    queries/<id>.parquet        query_id, query_text
+    labels/<id>.parquet         query_id, chunk_id, relevance
+
+String key columns are dictionary-encoded, so a hits file holds little more than the ranks
+and scores. Writers stream: every `append` writes one row group, and chunk / query texts
+already in the store (from any earlier run) are skipped. Reads go through `pyarrow.dataset` with memory mapping and
+only the requested runs/columns are materialised.
+
+    python -m rag_service.eval.run_store import evaluation/*_label*.csv --store evaluation/runs
+    python -m rag_service.eval.run_store ls --store evaluation/runs
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as fs
+import pyarrow.parquet as pq
+
+from rag_service.models.hits import HitBatch
+
+HITS_SCHEMA = pa.schema(
+    [
+        ("run_name", pa.dictionary(pa.int32(), pa.string())),
+        ("param_value", pa.int32()),
+        ("query_id", pa.dictionary(pa.int32(), pa.string())),
+        ("rank", pa.int16()),
+        ("chunk_id", pa.dictionary(pa.int32(), pa.string())),
+        ("dist", pa.float32()),
+        ("score", pa.float32()),
+    ]
+)
+CHUNKS_SCHEMA = pa.schema([("chunk_id", pa.string()), ("chunk_text", pa.large_string())])
+QUERIES_SCHEMA = pa.schema([("query_id", pa.string()), ("query_text", pa.string())])
+LABELS_SCHEMA = pa.schema(
+    [("query_id", pa.string()), ("chunk_id", pa.string()), ("relevance", pa.int8())]
+)
+
+
+def hits_frame(hits: HitBatch | Iterable[Any]) -> pd.DataFrame:
+    """A HitBatch, or RetrievalHit / KeywordSearchHit objects (or dicts), as a flat frame."""
+    if isinstance(hits, HitBatch):
+        return hits.to_frame()
+    return pd.DataFrame([h if isinstance(h, dict) else h.model_dump() for h in hits])
+
+
+def _column(df: pd.DataFrame, name: str, default: Any = None) -> pd.Series:
+    return df[name] if name in df.columns else pd.Series(default, index=df.index)
+
+
+def _safe_name(run_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", run_name)[:64] or "run"
+
+
+class RunWriter:
+    """Streams one run's hits into the store; use as a context manager."""
+
+    def __init__(
+        self,
+        root: Path,
+        run_name: str,
+        compression: str = "zstd",
+        *,
+        seen_chunks: set[str] | None = None,
+        seen_queries: set[str] | None = None,
+    ) -> None:
+        self.run_name = run_name
+        part = uuid.uuid4().hex[:12]
+        self._paths = {
+            "hits": root / "hits" / f"{_safe_name(run_name)}-{part}.parquet",
+            "chunks": root / "chunks" / f"{part}.parquet",
+            "queries": root / "queries" / f"{part}.parquet",
+        }
+        schemas = {"hits": HITS_SCHEMA, "chunks": CHUNKS_SCHEMA, "queries": QUERIES_SCHEMA}
+        self._writers: dict[str, pq.ParquetWriter] = {}
+        for name, path in self._paths.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._writers[name] = pq.ParquetWriter(path, schemas[name], compression=compression)
+        # ids whose text is already stored; shared with (and updated for) the RunStore
+        self._seen_chunks = seen_chunks if seen_chunks is not None else set()
+        self._seen_queries = seen_queries if seen_queries is not None else set()
+        self.n_rows = 0
+
+    def append(self, hits: pd.DataFrame | Iterable[Any]) -> None:
+        df = hits if isinstance(hits, pd.DataFrame) else hits_frame(hits)
+        if df.empty:
+            return
+        chunk_ids = df["chunk_id"].astype(str)
+        query_ids = df["query_id"].astype(str)
+
+        frame = pd.DataFrame(
+            {
+                "run_name": pd.Categorical(_column(df, "run_name", self.run_name).astype(str)),
+                "param_value": _column(df, "param_value").astype("Int32"),
+                "query_id": pd.Categorical(query_ids),
+                "rank": df["rank"].astype("int16"),
+                "chunk_id": pd.Categorical(chunk_ids),
+                "dist": _column(df, "dist").astype("Float32"),
+                "score": _column(df, "score").astype("Float32"),
+            }
+        )
+        self._write("hits", frame)
+        self.n_rows += len(df)
+
+        if "chunk_text" in df.columns:
+            new = ~chunk_ids.isin(self._seen_chunks) & ~chunk_ids.duplicated()
+            if new.any():
+                self._write(
+                    "chunks",
+                    pd.DataFrame({"chunk_id": chunk_ids[new], "chunk_text": df["chunk_text"][new]}),
+                )
+                self._seen_chunks.update(chunk_ids[new])
+        if "query_text" in df.columns:
+            new = ~query_ids.isin(self._seen_queries) & ~query_ids.duplicated()
+            if new.any():
+                self._write(
+                    "queries",
+                    pd.DataFrame({"query_id": query_ids[new], "query_text": df["query_text"][new]}),
+                )
+                self._seen_queries.update(query_ids[new])
+
+    def _write(self, name: str, frame: pd.DataFrame) -> None:
+        writer = self._writers[name]
+        writer.write_table(pa.Table.from_pandas(frame, schema=writer.schema, preserve_index=False))
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        # don't leave empty side-table files behind
+        for name in ("chunks", "queries"):
+            if pq.read_metadata(self._paths[name]).num_rows == 0:
+                self._paths[name].unlink()
+
+    def __enter__(self) -> "RunWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class RunStore:
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self._stored_ids: dict[str, set[str]] = {}
+
+    def _ids(self, name: str, key: str) -> set[str]:
+        """Ids already in the `name` side table, read once per store instance."""
+        if name not in self._stored_ids:
+            dataset = self._dataset(name)
+            ids = dataset.to_table(columns=[key]).column(key).to_pylist() if dataset else []
+            self._stored_ids[name] = set(ids)
+        return self._stored_ids[name]
+
+    def writer(self, run_name: str) -> RunWriter:
+        return RunWriter(
+            self.root,
+            run_name,
+            seen_chunks=self._ids("chunks", "chunk_id"),
+            seen_queries=self._ids("queries", "query_id"),
+        )
+
+    def write_run(self, run_name: str, hits: pd.DataFrame | Iterable[Any]) -> int:
+        with self.writer(run_name) as w:
+            w.append(hits)
+        return w.n_rows
+
+    def write_labels(self, labels: pd.DataFrame) -> None:
+        """Store (query_id, chunk_id, relevance) labels; duplicates resolve to the max on read."""
+        path = self.root / "labels" / f"{uuid.uuid4().hex[:12]}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df = labels[["query_id", "chunk_id", "relevance"]].copy()
+        df["chunk_id"] = df["chunk_id"].astype(str)
+        df["relevance"] = pd.to_numeric(df["relevance"], errors="coerce").fillna(0).astype("int8")
+        pq.write_table(pa.Table.from_pandas(df, schema=LABELS_SCHEMA, preserve_index=False), path)
+
+    def _dataset(self, name: str) -> Optional[ds.Dataset]:
+        path = self.root / name
+        if not path.exists() or not any(path.glob("*.parquet")):
+            return None
+        return ds.dataset(path, format="parquet", filesystem=fs.LocalFileSystem(use_mmap=True))
+
+    def hits(
+        self, runs: Optional[list[str]] = None, columns: Optional[list[str]] = None
+    ) -> pa.Table:
+        """Hits of the given runs (all if None) as an Arrow table; nothing else is read."""
+        dataset = self._dataset("hits")
+        if dataset is None:
+            return HITS_SCHEMA.empty_table()
+        flt = ds.field("run_name").isin(runs) if runs is not None else None
+        return dataset.to_table(columns=columns, filter=flt)
+
+    def runs(self) -> pd.DataFrame:
+        """Run names with row and query counts."""
+        table = self.hits(columns=["run_name", "query_id"])
+        df = table.to_pandas()
+        if df.empty:
+            return pd.DataFrame(columns=["run_name", "n_hits", "n_queries"])
+        return (
+            df.groupby("run_name", observed=True)
+            .agg(n_hits=("query_id", "size"), n_queries=("query_id", "nunique"))
+            .reset_index()
+        )
+
+    def chunk_texts(self, chunk_ids: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        dataset = self._dataset("chunks")
+        if dataset is None:
+            return CHUNKS_SCHEMA.empty_table().to_pandas()
+        flt = ds.field("chunk_id").isin(list(chunk_ids)) if chunk_ids is not None else None
+        return dataset.to_table(filter=flt).to_pandas().drop_duplicates("chunk_id")
+
+    def labels(self) -> pd.DataFrame:
+        dataset = self._dataset("labels")
+        if dataset is None:
+            return LABELS_SCHEMA.empty_table().to_pandas()
+        df = dataset.to_table().to_pandas()
+        # same policy as make_truth_label_df for inconsistent duplicates
+        return df.groupby(["query_id", "chunk_id"], as_index=False)["relevance"].max()
+
+    def metrics_frame(self, runs: Optional[list[str]] = None) -> pd.DataFrame:
+        """The columns `eval.metrics.evaluate_runs` needs, with keys kept categorical."""
+        table = self.hits(runs, columns=["run_name", "query_id", "chunk_id", "rank"])
+        return table.to_pandas()
+
+    def import_csv(self, path: str | Path, prefix: Optional[str] = None) -> int:
+        """
+        Import a labelled CSV export (export_hits_to_csv output). Rows with a relevance
+        value are also stored as labels; a file without ranks is imported as labels only.
+
+        Runs are named after `prefix` (default: the file stem), as `<prefix>:<run_name>`
+        when the CSV has a run_name column, so exports of the same retriever from different
+        files stay apart. Raises ValueError, before writing anything, if a run name is
+        already in the store. Returns the number of hits written.
+        """
+        df = pd.read_csv(path)
+        if "rank" not in df.columns:  # a truth-label file
+            self.write_labels(df)
+            return 0
+        prefix = prefix or Path(path).stem
+        if "run_name" in df.columns:
+            df["run_name"] = prefix + ":" + df["run_name"].astype(str)
+        else:
+            df["run_name"] = prefix
+        names = [str(name) for name in df["run_name"].unique()]
+        existing = set(self.runs()["run_name"].astype(str))
+        clashes = sorted(existing.intersection(names))
+        if clashes:
+            raise ValueError(f"{path}: runs already in {self.root}: {', '.join(clashes)}")
+        n = 0
+        for name, group in df.groupby("run_name", sort=False):
+            n += self.write_run(str(name), group)
+        if "relevance" in df.columns:
+            labelled = df[pd.to_numeric(df["relevance"], errors="coerce").notna()]
+            if not labelled.empty:
+                self.write_labels(labelled)
+        return n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Columnar store for retrieval runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="Import labelled CSV exports")
+    p_import.add_argument("paths", nargs="+")
+    p_import.add_argument("--store", default="evaluation/runs")
+    p_import.add_argument("--prefix", help="Run name prefix (default: each file's stem)")
+
+    p_ls = sub.add_parser("ls", help="List stored runs")
+    p_ls.add_argument("--store", default="evaluation/runs")
+
+    args = parser.parse_args()
+    store = RunStore(args.store)
+    if args.command == "import":
+        if args.prefix and len(args.paths) > 1:
+            parser.error("--prefix takes a single CSV")
+        for path in args.paths:
+            print(f"{path}: {store.import_csv(path, prefix=args.prefix)} hits")
+    else:
+        print(store.runs().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
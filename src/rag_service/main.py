@@ -1,9 +1,370 @@
-from fastapi import FastAPI
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, Awaitable, Literal, TypeVar
 
-app = FastAPI(title="RAG Service", version="0.1.0")
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from rag_service import admission, deadline, observability, warmup
+from rag_service.db import DatabaseManager, get_db
+from rag_service.models import MetadataFilter, QueryItem
+from rag_service.models.jobs import IngestionJob
+from rag_service.settings import settings
+
+
+T = TypeVar("T")
+
+# How often a running request checks whether its client is still there
+DISCONNECT_POLL_S = 0.1
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /health answers meanwhile; /ready waits for it
+    task = None
+    if settings.warmup_enabled:
+        task = asyncio.create_task(
+            warmup.run_warmup(
+                DatabaseManager.get_engine(),
+                DatabaseManager.get_session_factory(),
+                embedding_model_factory=get_query_embedder,
+            )
+        )
+    yield
+    if task is not None and not task.done():
+        task.cancel()
+    await DatabaseManager.close_engine()
+
+
+app = FastAPI(title="RAG Service", version="0.1.0", lifespan=lifespan)
+
+if observability.enabled():
+
+    @app.middleware("http")
+    async def record_request_latency(request: Request, call_next):
+        t0 = time.perf_counter()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        observability.record_http(
+            request.method,
+            getattr(route, "path", "unmatched"),
+            response.status_code,
+            time.perf_counter() - t0,
+        )
+        return response
+
+
+class IngestionJobRequest(BaseModel):
+    source: str
+    root: str
+    title: str
+    params: dict[str, Any] = Field(default_factory=dict)
+
+
+class SearchRequest(BaseModel):
+    query: str
+    source: str
+    k: int = Field(default=10, ge=1, le=100)
+    mode: Literal["vector", "bm25", "hybrid"] = "hybrid"
+    ef_search: int = Field(default=40, ge=1, le=1000)
+    # ANDed, e.g. [{"field": "topic", "value": "Button"}]
+    filters: list[MetadataFilter] = Field(default_factory=list, max_length=8)
+    # Default: SEARCH_DEADLINE_S
+    deadline_ms: int | None = Field(default=None, ge=10, le=60_000)
+
+
+class SearchHit(BaseModel):
+    rank: int
+    chunk_id: str
+    chunk_text: str
+    score: float  # higher is better: cosine similarity (vector) or BM25 / RRF score
+
+
+class SearchResponse(BaseModel):
+    hits: list[SearchHit]
+    timings_ms: dict[str, float]
+    degraded: list[str] = Field(default_factory=list)  # e.g. ["ef_search=20"]
+
+
+class AnswerRequest(BaseModel):
+    query: str
+    source: str
+    k: int = Field(default=10, ge=1, le=50)
+    ef_search: int = Field(default=40, ge=1, le=1000)
+    token_budget: int | None = Field(default=None, ge=100, le=100_000)
+    # Fan retrieval out over LLM rewrites of the question (default: QUERY_REWRITE_ENABLED)
+    rewrite: bool | None = None
+    # Default: ANSWER_DEADLINE_S
+    deadline_ms: int | None = Field(default=None, ge=100, le=300_000)
+
+
+class AnswerResponse(BaseModel):
+    answer: str
+    chunk_ids: list[str]  # cited context, in citation order
+    context_tokens: dict[str, int]  # retrieved / merged / packed / saved (estimated)
+    cached: bool  # served from the semantic answer cache
+    rewrites: list[str]  # rewrites searched alongside the question
+    timings_ms: dict[str, float]
+    degraded: list[str] = Field(default_factory=list)  # e.g. ["ef_search=20", "no_rewrite"]
+
+
+@lru_cache(maxsize=1)
+def get_query_embedder():
+    if settings.embedding_provider == "fake":
+        from rag_service.providers.fake import FakeQueryEmbedding
+
+        return FakeQueryEmbedding(
+            dim=settings.embedding_dim, latency_s=settings.fake_embedding_latency_s
+        )
+
+    from rag_service.providers.gemini import make_embedding_model
+
+    return make_embedding_model(settings.embedding_model_name, dim=settings.embedding_dim)
+
+
+@lru_cache(maxsize=1)
+def get_llm():
+    from rag_service.providers.gemini import GeminiTextLLM
+
+    client = None
+    if settings.llm_provider == "fake":
+        from rag_service.providers.fake import FakeGenAIClient
+
+        client = FakeGenAIClient(
+            latency_s=settings.fake_llm_latency_s,
+            latency_sigma=0.5,
+            throttle_rate=settings.fake_llm_throttle_rate,
+        )
+    return GeminiTextLLM(
+        model=settings.llm_model_name,
+        requests_per_minute=settings.llm_requests_per_minute,
+        tokens_per_minute=settings.llm_tokens_per_minute,
+        max_concurrency=settings.llm_max_concurrency,
+        timeout_s=settings.llm_timeout_s,
+        hedge=settings.llm_hedge,
+        client=client,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_query_rewriter():
+    from rag_service.pipeline.query_rewrite import QueryRewriter
+
+    return QueryRewriter(
+        get_llm(),
+        max_rewrites=settings.query_rewrite_max,
+        timeout_s=settings.query_rewrite_timeout_s,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_admission() -> admission.AdmissionController:
+    return admission.AdmissionController(
+        settings.admission_max_inflight or DatabaseManager.pool_capacity(),
+        max_queue=settings.admission_max_queue,
+        max_wait_s=settings.admission_max_wait_s,
+    )
 
 
 @app.get("/health")
 async def health() -> dict[str, str]:
     return {"status": "ok"}
 
+
+@app.get("/ready")
+async def ready(response: Response) -> dict[str, Any]:
+    status = warmup.status()
+    if not status["ready"]:
+        response.status_code = 503
+    return status
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    rendered = observability.render_metrics()
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED)")
+    body, content_type = rendered
+    return Response(content=body, media_type=content_type)
+
+
+@app.post("/ingestion/jobs", status_code=202)
+async def create_ingestion_job(
+    req: IngestionJobRequest, session: AsyncSession = Depends(get_db)
+) -> IngestionJob:
+    # Imported lazily: the jobs module pulls in the ingestion stack (llama_index)
+    from rag_service.pipeline.jobs import enqueue_job
+
+    async with session.begin():
+        job = await enqueue_job(
+            session, source=req.source, root=req.root, title=req.title, params=req.params
+        )
+    return job
+
+
+@app.get("/ingestion/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: uuid.UUID, session: AsyncSession = Depends(get_db)
+) -> IngestionJob:
+    from rag_service.pipeline.jobs import get_job
+
+    job = await get_job(session, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+async def _guarded(request: Request, aw: Awaitable[T]) -> T:
+    """
+    Await a request's work, translating timeouts into DeadlineExceeded / Overloaded and
+    cancelling it if the client disconnects (asyncpg then cancels the running statement).
+    """
+    task = asyncio.ensure_future(aw)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_S)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                observability.record_shed("client_disconnected")
+                raise HTTPException(status_code=499, detail="Client closed request")
+    except PoolTimeoutError:
+        observability.record_shed("pool_timeout")
+        raise admission.Overloaded("timed out waiting for a database connection", 503) from None
+    except DBAPIError as exc:
+        if not deadline.is_query_canceled(exc):
+            raise
+        raise deadline.DeadlineExceeded("statement cancelled at the deadline") from exc
+    except TimeoutError as exc:  # DeadlineExceeded, or an LLM call cut at the deadline
+        if isinstance(exc, deadline.DeadlineExceeded):
+            raise
+        raise deadline.DeadlineExceeded(str(exc) or "deadline exceeded") from exc
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+@app.exception_handler(admission.Overloaded)
+async def overloaded_handler(request: Request, exc: admission.Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.reason},
+        headers={"Retry-After": str(max(1, round(exc.retry_after_s)))},
+    )
+
+
+@app.exception_handler(deadline.DeadlineExceeded)
+async def deadline_handler(request: Request, exc: deadline.DeadlineExceeded) -> JSONResponse:
+    observability.record_shed("deadline")
+    return JSONResponse(status_code=504, content={"detail": str(exc) or "deadline exceeded"})
+
+
+@app.post("/search")
+async def search(
+    req: SearchRequest, request: Request, session: AsyncSession = Depends(get_db)
+) -> SearchResponse:
+    from rag_service.pipeline.retrieval import bm25_search, hybrid_search, vectors_search
+
+    controller = get_admission()
+    t0 = time.perf_counter()
+    with deadline.scope(req.deadline_ms / 1000 if req.deadline_ms else settings.search_deadline_s):
+        async with controller.admit():
+            plan = admission.degrade(controller, ef_search=req.ef_search)
+            # Check out the pooled connection up front so pool waits are reported on their own
+            await _guarded(request, deadline.bounded(session.connection(), "pool_wait"))
+            t_conn = time.perf_counter()
+
+            query = QueryItem(id="q", category="", difficulty=0, text=req.query)
+            if req.mode == "vector":
+                work = vectors_search(
+                    queries=[query],
+                    source=req.source,
+                    embedding_model=get_query_embedder(),
+                    ef_search_values=[plan.ef_search],
+                    k=req.k,
+                    session=session,
+                    filters=req.filters,
+                )
+            elif req.mode == "bm25":
+                work = bm25_search(
+                    queries=[query],
+                    k=req.k,
+                    session=session,
+                    source=req.source,
+                    filters=req.filters,
+                )
+            else:
+                work = hybrid_search(
+                    queries=[query],
+                    source=req.source,
+                    embedding_model=get_query_embedder(),
+                    ef_search_values=[plan.ef_search],
+                    k=req.k,
+                    session=session,
+                    filters=req.filters,
+                )
+            batch = await _guarded(request, work)
+    hits = [SearchHit(**r) for r in batch.records(0, limit=req.k)]
+
+    t_end = time.perf_counter()
+    return SearchResponse(
+        hits=hits,
+        timings_ms={
+            "pool_wait": (t_conn - t0) * 1000,
+            "search": (t_end - t_conn) * 1000,
+            "total": (t_end - t0) * 1000,
+        },
+        degraded=plan.reasons,
+    )
+
+
+@app.post("/answer")
+async def answer(
+    req: AnswerRequest, request: Request, session: AsyncSession = Depends(get_db)
+) -> AnswerResponse:
+    from rag_service.pipeline.answer import answer_query
+
+    controller = get_admission()
+    rewrite = settings.query_rewrite_enabled if req.rewrite is None else req.rewrite
+    t0 = time.perf_counter()
+    with deadline.scope(req.deadline_ms / 1000 if req.deadline_ms else settings.answer_deadline_s):
+        async with controller.admit():
+            # Rewriting searches the original and each rewrite on connections of their own
+            rewrite_slots = 1 + settings.query_rewrite_max
+            plan = admission.degrade(
+                controller, ef_search=req.ef_search, rewrite=rewrite, rewrite_slots=rewrite_slots
+            )
+            async with controller.hold(rewrite_slots if plan.rewrite else 0):
+                result = await _guarded(
+                    request,
+                    answer_query(
+                        query=req.query,
+                        source=req.source,
+                        session=session,
+                        embedding_model=get_query_embedder(),
+                        llm=get_llm(),
+                        k=req.k,
+                        ef_search=plan.ef_search,
+                        token_budget=req.token_budget,
+                        rewriter=get_query_rewriter() if plan.rewrite else None,
+                        session_factory=DatabaseManager.get_session_factory(),
+                        degraded=bool(plan.reasons),
+                    ),
+                )
+    return AnswerResponse(
+        answer=result.text,
+        chunk_ids=result.chunk_ids,
+        context_tokens=result.context_tokens,
+        cached=result.cached,
+        rewrites=result.rewrites,
+        timings_ms={**result.timings_ms, "total": (time.perf_counter() - t0) * 1000},
+        degraded=plan.reasons,
+    )
@@ -1,5 +1,9 @@
 from .evaluations import QueryItem, RetrievalHit, KeywordSearchHit
 from .embeddings import Document, Chunk
+from .jobs import IngestionJob, IngestionCheckpoint
+from .hits import HitBatch, HitBatchBuilder
+from .cache import AnswerCacheEntry, CorpusVersion
+from .filters import FILTER_FIELDS, FilterField, MetadataFilter
 
 __all__ = [
     "QueryItem",
@@ -7,4 +11,13 @@ __all__ = [
     "KeywordSearchHit",
     "Document",
     "Chunk",
+    "IngestionJob",
+    "IngestionCheckpoint",
+    "HitBatch",
+    "HitBatchBuilder",
+    "AnswerCacheEntry",
+    "CorpusVersion",
+    "FILTER_FIELDS",
+    "FilterField",
+    "MetadataFilter",
 ]
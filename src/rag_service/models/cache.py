@@ -0,0 +1,78 @@
+import uuid
+from datetime import datetime
+from typing import Any
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from sqlmodel import Field, SQLModel
+
+from .embeddings import EMBEDDING_DIM
+
+
+class CorpusVersion(SQLModel, table=True):
+    """Per-source counter bumped by every ingestion that changes the source's chunks."""
+
+    __tablename__ = "corpus_versions"
+
+    source: str = Field(primary_key=True)
+    version: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    updated_at: datetime = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
+    )
+
+
+class AnswerCacheEntry(SQLModel, table=True):
+    """A generated answer, looked up by cosine distance to new queries' embeddings."""
+
+    __tablename__ = "answer_cache"
+
+    __table_args__ = (
+        Index(
+            "idx_answer_cache_embedding_hnsw",
+            "query_embedding",
+            postgresql_using="hnsw",
+            postgresql_ops={"query_embedding": "vector_cosine_ops"},
+        ),
+        Index("idx_answer_cache_source_version", "source", "corpus_version"),
+        # LRU eviction order
+        Index("idx_answer_cache_last_hit_at", "last_hit_at"),
+    )
+
+    id: uuid.UUID | None = Field(
+        default=None,
+        primary_key=True,
+        sa_column_kwargs={"server_default": text("gen_random_uuid()")},
+    )
+
+    source: str
+    corpus_version: int
+    # Embeddings from different models are not comparable
+    embedding_model: str
+
+    query_text: str
+    query_embedding: list[float] = Field(
+        sa_column=Column(Vector(EMBEDDING_DIM), nullable=False),
+    )
+
+    answer: str
+    chunk_ids: list[str] = Field(
+        default_factory=list,
+        sa_column=Column(JSONB, nullable=False, server_default=text("'[]'::jsonb")),
+    )
+    context_tokens: dict[str, Any] = Field(
+        default_factory=dict,
+        sa_column=Column(JSONB, nullable=False, server_default=text("'{}'::jsonb")),
+    )
+
+    hit_count: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    created_at: datetime = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
+    )
+    last_hit_at: datetime = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
+    )
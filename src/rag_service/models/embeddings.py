@@ -3,11 +3,12 @@ from datetime import datetime
 from typing import Any, Optional
 
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import Column, DateTime, ForeignKey, Index, UniqueConstraint, text
+from sqlalchemy import Column, Computed, DateTime, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
-from sqlmodel import Field, Relationship, SQLModel
+from sqlmodel import AutoString, Field, Relationship, SQLModel
 
+from .filters import FILTER_FIELDS
 
 EMBEDDING_DIM = 1536
 
@@ -42,25 +43,24 @@ class Document(SQLModel, table=True):
 class Chunk(SQLModel, table=True):
     __tablename__ = "chunks"
 
+    # List-partitioned by source: one partition per source (chunks_p_<source>), each with
+    # its own HNSW + BM25 index. Partitions and their search indexes are managed in
+    # rag_service.pipeline.partitions, not here.
     __table_args__ = (
-        UniqueConstraint("document_id", "chunk_index", name="uq_chunks_document_chunk_index"),
-        UniqueConstraint("document_id", "content_hash", name="uq_chunks_document_content_hash"),
+        UniqueConstraint(
+            "source", "document_id", "chunk_index", name="uq_chunks_document_chunk_index"
+        ),
+        UniqueConstraint(
+            "source", "document_id", "content_hash", name="uq_chunks_document_content_hash"
+        ),
         # Fast filter by document
         Index("idx_chunks_document_id", "document_id"),
-        Index(
-            "idx_chunks_embedding_hnsw",
-            "embedding",
-            postgresql_using="hnsw",
-            postgresql_ops={"embedding": "vector_cosine_ops"},
-        ),
-        # BM25 index for keyword search
-        Index(
-            "idx_chunks_bm25",
-            "id",  # First column
-            "content",  # Text to index
-            postgresql_using="bm25",
-            postgresql_with={"key_field": "id"},
+        # Metadata filters (equality and LIKE 'prefix%'); see MetadataFilter
+        *(
+            Index(f"idx_chunks_{name}", name, postgresql_ops={name: "text_pattern_ops"})
+            for name in FILTER_FIELDS
         ),
+        {"postgresql_partition_by": "LIST (source)"},
     )
 
     id: uuid.UUID | None = Field(
@@ -69,6 +69,9 @@ class Chunk(SQLModel, table=True):
         sa_column_kwargs={"server_default": text("gen_random_uuid()")},
     )
 
+    # Partition key (denormalized from documents.source); part of the primary key
+    source: str = Field(sa_column=Column(AutoString, primary_key=True, nullable=False))
+
     document_id: uuid.UUID = Field(
         sa_column=Column(
             ForeignKey("documents.id", ondelete="CASCADE"),
@@ -89,6 +92,22 @@ class Chunk(SQLModel, table=True):
         sa_column=Column(JSONB, nullable=False, server_default=text("'{}'::jsonb")),
     )
 
+    # Generated from chunk_metadata, never written directly
+    topic: Optional[str] = Field(
+        default=None,
+        sa_column=Column(AutoString, Computed("chunk_metadata ->> 'topic'", persisted=True)),
+    )
+    section: Optional[str] = Field(
+        default=None,
+        sa_column=Column(AutoString, Computed("chunk_metadata ->> 'section'", persisted=True)),
+    )
+    relative_path: Optional[str] = Field(
+        default=None,
+        sa_column=Column(
+            AutoString, Computed("chunk_metadata ->> 'relative_path'", persisted=True)
+        ),
+    )
+
     created_at: datetime = Field(
         default=None,
         sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
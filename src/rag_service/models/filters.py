@@ -0,0 +1,22 @@
+from typing import Literal, get_args
+
+from pydantic import BaseModel, model_validator
+
+# chunk_metadata keys extracted into generated columns on `chunks` (indexed, and untokenized
+# fields of the BM25 indexes), so filters on them run inside the index scans.
+FilterField = Literal["topic", "section", "relative_path"]
+FILTER_FIELDS: tuple[FilterField, ...] = get_args(FilterField)
+
+
+class MetadataFilter(BaseModel):
+    """`field` equals `value` (eq), is one of `value` (in) or starts with `value` (prefix)."""
+
+    field: FilterField
+    op: Literal["eq", "in", "prefix"] = "eq"
+    value: str | list[str]
+
+    @model_validator(mode="after")
+    def _check_value(self) -> "MetadataFilter":
+        if (self.op == "in") != isinstance(self.value, list):
+            raise ValueError(f"op={self.op!r} needs a {'list' if self.op == 'in' else 'string'}")
+        return self
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Iterable, Sequence
+
+import numpy as np
+
+from .evaluations import KeywordSearchHit, QueryItem, RetrievalHit
+
+if TYPE_CHECKING:  # pandas is only needed for to_frame(); keep it off the API import path
+    import pandas as pd
+
+
+@dataclass
+class HitBatch:
+    """
+    Columnar retrieval results: one entry per hit in parallel arrays, with query text, run
+    names and chunk text kept once in lookup tables instead of being repeated per hit.
+
+    `score_name` is "dist" for vector hits (lower is better) and "score" otherwise.
+    """
+
+    query_ids: list[str]
+    query_texts: list[str]
+    runs: list[tuple[str, int]]  # (run_name, param_value)
+    chunk_ids: list[str]
+    chunk_texts: list[str]
+    query_idx: np.ndarray  # int32, into query_ids
+    run_idx: np.ndarray  # int32, into runs
+    chunk_idx: np.ndarray  # int32, into chunk_ids / chunk_texts
+    rank: np.ndarray  # int32, 1-based within (run, query)
+    score: np.ndarray  # float64
+    score_name: str = "score"
+
+    def __len__(self) -> int:
+        return len(self.rank)
+
+    @classmethod
+    def empty(cls, queries: Sequence[QueryItem] = (), score_name: str = "score") -> "HitBatch":
+        return HitBatchBuilder(queries, score_name).build()
+
+    def to_frame(self, include_text: bool = True) -> pd.DataFrame:
+        """
+        Flat frame with the same columns as the per-hit models. Id/name columns are
+        categoricals over the lookup tables, so no per-row strings are created for them.
+        """
+        import pandas as pd
+
+        run_names = [r[0] for r in self.runs]
+        params = np.asarray([r[1] for r in self.runs], dtype=np.int64)
+        cols: dict[str, Any] = {
+            "query_id": pd.Categorical.from_codes(self.query_idx, categories=self.query_ids),
+        }
+        if include_text:
+            cols["query_text"] = np.asarray(self.query_texts, dtype=object)[self.query_idx]
+        cols |= {
+            "run_name": pd.Categorical.from_codes(self.run_idx, categories=run_names),
+            "param_value": params[self.run_idx] if len(params) else params,
+            "rank": self.rank,
+            self.score_name: self.score,
+            "chunk_id": pd.Categorical.from_codes(self.chunk_idx, categories=self.chunk_ids),
+        }
+        if include_text:
+            cols["chunk_text"] = np.asarray(self.chunk_texts, dtype=object)[self.chunk_idx]
+        return pd.DataFrame(cols)
+
+    def to_hits(self) -> list[RetrievalHit] | list[KeywordSearchHit]:
+        """Per-hit pydantic models, for code that still expects them."""
+        model = RetrievalHit if self.score_name == "dist" else KeywordSearchHit
+        return [
+            model(
+                query_id=self.query_ids[q],
+                query_text=self.query_texts[q],
+                run_name=self.runs[r][0],
+                param_value=self.runs[r][1],
+                rank=int(rank),
+                chunk_id=self.chunk_ids[c],
+                chunk_text=self.chunk_texts[c],
+                **{self.score_name: float(s)},
+            )
+            for q, r, c, rank, s in zip(
+                self.query_idx, self.run_idx, self.chunk_idx, self.rank, self.score
+            )
+        ]
+
+    def similarity(self) -> np.ndarray:
+        """Higher-is-better scores (cosine similarity for vector hits)."""
+        return 1.0 - self.score if self.score_name == "dist" else self.score
+
+    def records(self, query_index: int = 0, limit: int | None = None) -> list[dict[str, Any]]:
+        """One query's hits in rank order as plain dicts (for API responses)."""
+        rows = np.flatnonzero(self.query_idx == query_index)
+        rows = rows[np.argsort(self.rank[rows], kind="stable")][:limit]
+        sims = self.similarity()
+        return [
+            {
+                "rank": int(self.rank[i]),
+                "chunk_id": self.chunk_ids[self.chunk_idx[i]],
+                "chunk_text": self.chunk_texts[self.chunk_idx[i]],
+                "score": float(sims[i]),
+            }
+            for i in rows
+        ]
+
+
+@dataclass
+class HitBatchBuilder:
+    """Accumulates hits row by row and freezes them into a HitBatch."""
+
+    queries: Sequence[QueryItem]
+    score_name: str = "score"
+    _runs: dict[tuple[str, int], int] = field(default_factory=dict)
+    _chunks: dict[str, int] = field(default_factory=dict)
+    _chunk_texts: list[str] = field(default_factory=list)
+    _rows: list[tuple[int, int, int, int, float]] = field(default_factory=list)
+
+    def run(self, run_name: str, param_value: int) -> int:
+        return self._runs.setdefault((run_name, param_value), len(self._runs))
+
+    def add(
+        self, query_index: int, run: int, rank: int, chunk_id: Any, chunk_text: str, score: float
+    ) -> None:
+        key = str(chunk_id)
+        c = self._chunks.get(key)
+        if c is None:
+            c = self._chunks[key] = len(self._chunk_texts)
+            self._chunk_texts.append(chunk_text)
+        self._rows.append((query_index, run, c, rank, score))
+
+    def extend(self, query_index: int, run: int, rows: Iterable[Any], score_key: str) -> None:
+        """Add DB result mappings (chunk_id, chunk_text, <score_key>) ranked in order."""
+        for rank, r in enumerate(rows, start=1):
+            self.add(query_index, run, rank, r["chunk_id"], r["chunk_text"], float(r[score_key]))
+
+    def build(self) -> HitBatch:
+        rows = np.asarray(self._rows, dtype=np.float64).reshape(-1, 5)
+        return HitBatch(
+            query_ids=[q.id for q in self.queries],
+            query_texts=[q.text for q in self.queries],
+            runs=list(self._runs),
+            chunk_ids=list(self._chunks),
+            chunk_texts=self._chunk_texts,
+            query_idx=rows[:, 0].astype(np.int32),
+            run_idx=rows[:, 1].astype(np.int32),
+            chunk_idx=rows[:, 2].astype(np.int32),
+            rank=rows[:, 3].astype(np.int32),
+            score=rows[:, 4],
+            score_name=self.score_name,
+        )
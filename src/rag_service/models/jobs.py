@@ -0,0 +1,91 @@
+import uuid
+from datetime import datetime
+from typing import Any, Optional
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, ForeignKey, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from sqlmodel import Field, SQLModel
+
+from .embeddings import EMBEDDING_DIM
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class IngestionJob(SQLModel, table=True):
+    __tablename__ = "ingestion_jobs"
+
+    __table_args__ = (
+        # Claim query: oldest queued job first
+        Index("idx_ingestion_jobs_status_created", "status", "created_at"),
+    )
+
+    id: uuid.UUID | None = Field(
+        default=None,
+        primary_key=True,
+        sa_column_kwargs={"server_default": text("gen_random_uuid()")},
+    )
+
+    source: str = Field(index=True)
+    title: str
+    root: str  # docs tree to load, readable by the worker
+
+    params: dict[str, Any] = Field(
+        default_factory=dict,
+        sa_column=Column(JSONB, nullable=False, server_default=text("'{}'::jsonb")),
+    )
+
+    status: str = Field(
+        default=JOB_QUEUED, sa_column_kwargs={"server_default": text(f"'{JOB_QUEUED}'")}
+    )
+    attempts: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    worker_id: Optional[str] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+
+    progress: dict[str, Any] = Field(
+        default_factory=dict,
+        sa_column=Column(JSONB, nullable=False, server_default=text("'{}'::jsonb")),
+    )
+
+    created_at: datetime = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
+    )
+    started_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    heartbeat_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    finished_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+
+
+class IngestionCheckpoint(SQLModel, table=True):
+    """Embeddings already computed by a job, keyed by the hash of the embedded text."""
+
+    __tablename__ = "ingestion_checkpoints"
+
+    job_id: uuid.UUID = Field(
+        sa_column=Column(
+            ForeignKey("ingestion_jobs.id", ondelete="CASCADE"),
+            primary_key=True,
+            nullable=False,
+        )
+    )
+    text_hash: str = Field(primary_key=True)
+
+    embedding: list[float] = Field(
+        sa_column=Column(Vector(EMBEDDING_DIM), nullable=False),
+    )
+
+    created_at: datetime = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
+    )
@@ -0,0 +1,241 @@
+"""
+Stage timings and counters exported in the Prometheus text format.
+
+Enabled with METRICS_ENABLED=true. When disabled, `stage()` hands back a shared no-op context
+manager and the record helpers return immediately, so instrumented code pays one attribute
+lookup and a call; prometheus_client is not even imported.
+
+    with stage("vector_query"):
+        rows = await session.execute(stmt)
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import AbstractContextManager
+from typing import Any
+
+from rag_service.settings import settings
+
+_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)  # fmt: skip
+_BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class _NoopStage(AbstractContextManager):
+    __slots__ = ()
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NOOP = _NoopStage()
+
+
+class _Metrics:
+    def __init__(self) -> None:
+        import prometheus_client as prom
+
+        self.registry = prom.CollectorRegistry()
+        self.stage_seconds = prom.Histogram(
+            "rag_stage_seconds",
+            "Time spent per pipeline stage",
+            ["stage"],
+            buckets=_LATENCY_BUCKETS,
+            registry=self.registry,
+        )
+        self.stage_errors = prom.Counter(
+            "rag_stage_errors_total", "Stages that raised", ["stage"], registry=self.registry
+        )
+        self.http_seconds = prom.Histogram(
+            "rag_http_request_seconds",
+            "HTTP request latency",
+            ["method", "route", "status"],
+            buckets=_LATENCY_BUCKETS,
+            registry=self.registry,
+        )
+        self.pool_wait_seconds = prom.Histogram(
+            "rag_db_pool_wait_seconds",
+            "Time to check a connection out of the DB pool",
+            buckets=_LATENCY_BUCKETS,
+            registry=self.registry,
+        )
+        self.embed_batch_size = prom.Histogram(
+            "rag_embedding_batch_size",
+            "Texts per embedding request",
+            ["kind"],
+            buckets=_BATCH_BUCKETS,
+            registry=self.registry,
+        )
+        self.embed_batch_tokens = prom.Histogram(
+            "rag_embedding_batch_tokens",
+            "Estimated tokens per embedding request",
+            ["kind"],
+            buckets=(100, 500, 1_000, 2_500, 5_000, 10_000, 20_000, 50_000),
+            registry=self.registry,
+        )
+        self.cache_requests = prom.Counter(
+            "rag_cache_requests_total",
+            "Cache lookups by cache and result (hit / miss)",
+            ["cache", "result"],
+            registry=self.registry,
+        )
+        self.context_tokens = prom.Histogram(
+            "rag_context_tokens",
+            "Estimated context tokens per answer: retrieved top-k as-is vs packed",
+            ["kind"],
+            buckets=(250, 500, 1_000, 2_000, 4_000, 8_000, 16_000, 32_000),
+            registry=self.registry,
+        )
+        self.llm_events = prom.Counter(
+            "rag_llm_events_total",
+            "LLM client events (hedged, deadline_exceeded)",
+            ["event"],
+            registry=self.registry,
+        )
+        self.plan_checks = prom.Counter(
+            "rag_plan_checks_total",
+            "Sampled EXPLAIN ANALYZE checks by query kind and flag ('ok' when healthy)",
+            ["kind", "flag"],
+            registry=self.registry,
+        )
+        self.shed_requests = prom.Counter(
+            "rag_shed_requests_total",
+            "Requests rejected or cut short (queue_full, admission_wait, pool_timeout, deadline)",
+            ["reason"],
+            registry=self.registry,
+        )
+        self.degraded_requests = prom.Counter(
+            "rag_degraded_requests_total",
+            "Requests served with cheaper settings, by cause (deadline, load)",
+            ["cause"],
+            registry=self.registry,
+        )
+        self.warmup_seconds = prom.Gauge(
+            "rag_warmup_seconds", "Duration of the startup warmup", registry=self.registry
+        )
+        self.buffer_residency = prom.Gauge(
+            "rag_buffer_residency_ratio",
+            "Share of a chunks partition / search index in shared_buffers after warmup",
+            ["relation"],
+            registry=self.registry,
+        )
+        self._prom = prom
+
+    def render(self) -> tuple[bytes, str]:
+        return self._prom.generate_latest(self.registry), self._prom.CONTENT_TYPE_LATEST
+
+
+_metrics: _Metrics | None = _Metrics() if settings.metrics_enabled else None
+
+
+def enabled() -> bool:
+    return _metrics is not None
+
+
+class _Stage(AbstractContextManager):
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> "_Stage":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        _metrics.stage_seconds.labels(self.name).observe(time.perf_counter() - self.t0)
+        if exc_type is not None:
+            _metrics.stage_errors.labels(self.name).inc()
+
+
+def stage(name: str) -> AbstractContextManager:
+    """Time the enclosed block as pipeline stage `name` (works in sync and async code)."""
+    if _metrics is None:
+        return _NOOP
+    return _Stage(name)
+
+
+def record_pool_wait(seconds: float) -> None:
+    if _metrics is not None:
+        _metrics.pool_wait_seconds.observe(seconds)
+
+
+def record_embedding_batch(kind: str, size: int, tokens: int | None = None) -> None:
+    if _metrics is None:
+        return
+    _metrics.embed_batch_size.labels(kind).observe(size)
+    if tokens is not None:
+        _metrics.embed_batch_tokens.labels(kind).observe(tokens)
+
+
+def record_cache(cache: str, hits: int, misses: int = 0) -> None:
+    if _metrics is None:
+        return
+    if hits:
+        _metrics.cache_requests.labels(cache, "hit").inc(hits)
+    if misses:
+        _metrics.cache_requests.labels(cache, "miss").inc(misses)
+
+
+def record_context(retrieved_tokens: int, packed_tokens: int) -> None:
+    if _metrics is None:
+        return
+    _metrics.context_tokens.labels("retrieved").observe(retrieved_tokens)
+    _metrics.context_tokens.labels("packed").observe(packed_tokens)
+
+
+def record_llm_event(event: str) -> None:
+    if _metrics is not None:
+        _metrics.llm_events.labels(event).inc()
+
+
+def record_plan(kind: str, flags: list[str]) -> None:
+    if _metrics is None:
+        return
+    for flag in flags or ["ok"]:
+        _metrics.plan_checks.labels(kind, flag).inc()
+
+
+def record_shed(reason: str) -> None:
+    if _metrics is not None:
+        _metrics.shed_requests.labels(reason).inc()
+
+
+def record_degraded(cause: str) -> None:
+    if _metrics is not None:
+        _metrics.degraded_requests.labels(cause).inc()
+
+
+def record_warmup(seconds: float, residency: dict[str, float]) -> None:
+    if _metrics is None:
+        return
+    _metrics.warmup_seconds.set(seconds)
+    for relation, ratio in residency.items():
+        _metrics.buffer_residency.labels(relation).set(ratio)
+
+
+def record_http(method: str, route: str, status: int, seconds: float) -> None:
+    if _metrics is not None:
+        _metrics.http_seconds.labels(method, route, str(status)).observe(seconds)
+
+
+def render_metrics() -> tuple[bytes, str] | None:
+    """(body, content type) for /metrics, or None when metrics are disabled."""
+    return _metrics.render() if _metrics is not None else None
+
+
+def timed_pool_class() -> Any:
+    """AsyncAdaptedQueuePool that reports checkout waits (overflow connects included)."""
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            t0 = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                record_pool_wait(time.perf_counter() - t0)
+
+    return TimedAsyncQueuePool
@@ -0,0 +1,163 @@
+"""
+Retrieval-augmented answers:
+[answer cache] -> hybrid search [+ rewrite legs] -> context packing -> LLM.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from rag_service import deadline
+from rag_service.models import QueryItem
+from rag_service.observability import stage
+from rag_service.pipeline import answer_cache
+from rag_service.pipeline.context import PackedContext, load_context_chunks, pack_context
+from rag_service.pipeline.query_rewrite import QueryRewriter, multi_query_search
+from rag_service.pipeline.retrieval import embed_query, hybrid_search
+from rag_service.settings import settings
+
+ANSWER_SYSTEM_PROMPT = (
+    "You answer questions about the Mantine React library using only the provided "
+    "documentation excerpts. Cite the excerpts you use as [n]. If the excerpts do not "
+    "contain the answer, say so instead of guessing."
+)
+
+ANSWER_PROMPT = """Documentation excerpts:
+
+{context}
+
+Question: {question}
+"""
+
+NO_CONTEXT_ANSWER = "I couldn't find anything about that in the documentation."
+
+
+@dataclass
+class Answer:
+    text: str
+    chunk_ids: list[str]
+    context_tokens: dict[str, int]
+    cached: bool = False
+    rewrites: list[str] = field(default_factory=list)
+    context: PackedContext | None = None  # None for cached answers
+    timings_ms: dict[str, float] = field(default_factory=dict)
+
+
+async def answer_query(
+    *,
+    query: str,
+    source: str,
+    session: AsyncSession,
+    embedding_model: Any,
+    llm: Any,
+    k: int = 10,
+    ef_search: int = 40,
+    token_budget: int | None = None,
+    max_tokens: int = 800,
+    use_cache: bool | None = None,
+    rewriter: QueryRewriter | None = None,
+    session_factory: Callable[[], AsyncSession] | None = None,
+    degraded: bool = False,
+) -> Answer:
+    """
+    With a `rewriter` (and a `session_factory` for the concurrent legs) retrieval fans out
+    over LLM rewrites of the question; otherwise it is a single hybrid search on `session`.
+    A `degraded` request (cheaper search settings under load) may read the answer cache
+    but never fills it, so a lower-quality answer is not served to later requests.
+    """
+    use_cache = settings.answer_cache_enabled if use_cache is None else use_cache
+    timings: dict[str, float] = {}
+    t0 = time.perf_counter()
+
+    # Embedded once: the cache lookup and the vector leg share it
+    embedding = await embed_query(embedding_model, query)
+    timings["embed"] = (time.perf_counter() - t0) * 1000
+    if use_cache:
+        with stage("answer_cache_lookup"):
+            version = await answer_cache.corpus_version(session, source)
+            cached = await answer_cache.lookup(
+                session, source=source, version=version, embedding=embedding
+            )
+            await session.commit()
+        if cached is not None:
+            timings["cache"] = (time.perf_counter() - t0) * 1000 - timings["embed"]
+            return Answer(
+                text=cached.answer,
+                chunk_ids=cached.chunk_ids,
+                context_tokens=cached.context_tokens,
+                cached=True,
+                timings_ms=timings,
+            )
+
+    t_search0 = time.perf_counter()
+    rewrites: list[str] = []
+    if rewriter is not None and session_factory is not None:
+        multi = await multi_query_search(
+            query=query,
+            source=source,
+            embedding_model=embedding_model,
+            rewriter=rewriter,
+            session_factory=session_factory,
+            k=k,
+            ef_search=ef_search,
+            embedding=embedding,
+        )
+        batch, rewrites = multi.hits, multi.rewrites
+        timings["rewrite"] = multi.timings_ms["rewrite"]
+    else:
+        batch = await hybrid_search(
+            queries=[QueryItem(id="q", category="", difficulty=0, text=query)],
+            source=source,
+            embedding_model=embedding_model,
+            ef_search_values=[ef_search],
+            k=k,
+            session=session,
+            query_embeddings={"q": embedding},
+        )
+    t_search = time.perf_counter()
+    timings["search"] = (t_search - t_search0) * 1000
+
+    with stage("context_pack"):
+        chunks = await load_context_chunks(session, batch, source=source, limit=k)
+        # End the read transaction here so no connection is held through generation
+        await session.commit()
+        packed = pack_context(chunks, token_budget or settings.context_token_budget)
+    t_context = time.perf_counter()
+    timings["context"] = (t_context - t_search) * 1000
+
+    if not packed.spans:
+        text = NO_CONTEXT_ANSWER
+    else:
+        text = await llm.generate_text(
+            prompt=ANSWER_PROMPT.format(context=packed.text, question=query),
+            system_prompt=ANSWER_SYSTEM_PROMPT,
+            max_tokens=max_tokens,
+            deadline_s=deadline.remaining(stage="generate"),
+        )
+    timings["generate"] = (time.perf_counter() - t_context) * 1000
+
+    result = Answer(
+        text=text,
+        chunk_ids=packed.chunk_ids,
+        context_tokens=packed.stats(),
+        rewrites=rewrites,
+        context=packed,
+        timings_ms=timings,
+    )
+    if use_cache and packed.spans and not degraded:
+        async with session.begin():
+            await answer_cache.store(
+                session,
+                source=source,
+                version=version,
+                query_text=query,
+                embedding=embedding,
+                answer=text,
+                chunk_ids=result.chunk_ids,
+                context_tokens=result.context_tokens,
+            )
+    return result
@@ -0,0 +1,255 @@
+"""
+Semantic answer cache backed by pgvector.
+
+Answers are stored with the embedding of the question that produced them. A new question
+whose embedding is within ANSWER_CACHE_MAX_DISTANCE (cosine distance) of a cached entry for
+the same source, corpus version and embedding model gets that answer back without retrieval
+or generation.
+
+Invalidation: every ingestion of a source bumps its row in `corpus_versions` and deletes the
+source's entries in the same transaction (`bump_corpus_version`). Lookups only match the
+current version, so an answer generated from the old corpus while an ingestion commits is
+never served. Entries also expire after ANSWER_CACHE_TTL_S and the table is trimmed to
+ANSWER_CACHE_MAX_ENTRIES, least recently hit first (`evict`, run every EVICT_EVERY stores).
+
+    python -m rag_service.pipeline.answer_cache stats
+    python -m rag_service.pipeline.answer_cache evict
+    python -m rag_service.pipeline.answer_cache clear --source mantine_docs
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Sequence
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from rag_service.models.cache import AnswerCacheEntry, CorpusVersion
+from rag_service.observability import record_cache
+from rag_service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+EVICT_EVERY = 100
+
+_stores_since_evict = 0
+
+
+@dataclass
+class CachedAnswer:
+    id: uuid.UUID
+    query_text: str
+    answer: str
+    chunk_ids: list[str]
+    context_tokens: dict[str, Any]
+    distance: float
+
+
+async def corpus_version(session: AsyncSession, source: str) -> int:
+    version = await session.scalar(
+        select(CorpusVersion.version).where(CorpusVersion.source == source)
+    )
+    return version or 0
+
+
+async def bump_corpus_version(session: AsyncSession, source: str) -> int:
+    """
+    Start a new corpus version for `source` and drop its cached answers. Call it in the
+    transaction that changes the source's chunks, so both commit together.
+    """
+    table = CorpusVersion.__table__
+    stmt = (
+        pg_insert(table)
+        .values(source=source, version=1)
+        .on_conflict_do_update(
+            index_elements=["source"],
+            set_={"version": table.c.version + 1, "updated_at": func.now()},
+        )
+        .returning(table.c.version)
+    )
+    version = (await session.execute(stmt)).scalar_one()
+    res = await session.execute(delete(AnswerCacheEntry).where(AnswerCacheEntry.source == source))
+    logger.info(
+        "Corpus %s is now version %d; dropped %d cached answers", source, version, res.rowcount
+    )
+    return version
+
+
+async def lookup(
+    session: AsyncSession,
+    *,
+    source: str,
+    version: int,
+    embedding: Sequence[float],
+    max_distance: float | None = None,
+    ttl_s: float | None = None,
+) -> CachedAnswer | None:
+    """The nearest live entry if it is within `max_distance`; records the hit."""
+    max_distance = settings.answer_cache_max_distance if max_distance is None else max_distance
+    ttl_s = settings.answer_cache_ttl_s if ttl_s is None else ttl_s
+
+    dist = AnswerCacheEntry.query_embedding.cosine_distance(embedding).label("dist")
+    stmt = (
+        select(
+            AnswerCacheEntry.id,
+            AnswerCacheEntry.query_text,
+            AnswerCacheEntry.answer,
+            AnswerCacheEntry.chunk_ids,
+            AnswerCacheEntry.context_tokens,
+            dist,
+        )
+        .where(
+            AnswerCacheEntry.source == source,
+            AnswerCacheEntry.corpus_version == version,
+            AnswerCacheEntry.embedding_model == settings.embedding_model_name,
+            AnswerCacheEntry.created_at > func.now() - timedelta(seconds=ttl_s),
+        )
+        .order_by(dist)
+        .limit(1)
+    )
+    # Keep walking the HNSW graph until an entry passes the source/version/TTL filters,
+    # instead of filtering only the ef_search nearest (as retrieval does)
+    await session.execute(
+        text("SELECT set_config('hnsw.iterative_scan', :mode, true)"),
+        {"mode": settings.hnsw_iterative_scan},
+    )
+    row = (await session.execute(stmt)).mappings().first()
+    if row is None or row["dist"] > max_distance:
+        record_cache("answer", 0, 1)
+        return None
+
+    record_cache("answer", 1)
+    await session.execute(
+        update(AnswerCacheEntry)
+        .where(AnswerCacheEntry.id == row["id"])
+        .values(hit_count=AnswerCacheEntry.hit_count + 1, last_hit_at=func.now())
+    )
+    return CachedAnswer(
+        id=row["id"],
+        query_text=row["query_text"],
+        answer=row["answer"],
+        chunk_ids=list(row["chunk_ids"]),
+        context_tokens=dict(row["context_tokens"]),
+        distance=float(row["dist"]),
+    )
+
+
+async def store(
+    session: AsyncSession,
+    *,
+    source: str,
+    version: int,
+    query_text: str,
+    embedding: Sequence[float],
+    answer: str,
+    chunk_ids: list[str],
+    context_tokens: dict[str, Any] | None = None,
+) -> None:
+    global _stores_since_evict
+
+    session.add(
+        AnswerCacheEntry(
+            source=source,
+            corpus_version=version,
+            embedding_model=settings.embedding_model_name,
+            query_text=query_text,
+            query_embedding=list(embedding),
+            answer=answer,
+            chunk_ids=chunk_ids,
+            context_tokens=context_tokens or {},
+        )
+    )
+    await session.flush()
+
+    _stores_since_evict += 1
+    if _stores_since_evict >= EVICT_EVERY:
+        _stores_since_evict = 0
+        await evict(session)
+
+
+async def evict(
+    session: AsyncSession, *, ttl_s: float | None = None, max_entries: int | None = None
+) -> dict[str, int]:
+    """Delete stale-version and expired entries, then trim to `max_entries` (LRU)."""
+    ttl_s = settings.answer_cache_ttl_s if ttl_s is None else ttl_s
+    max_entries = settings.answer_cache_max_entries if max_entries is None else max_entries
+
+    stale = await session.execute(
+        text(
+            """
+            DELETE FROM answer_cache AS a
+            USING corpus_versions AS v
+            WHERE a.source = v.source AND a.corpus_version < v.version
+            """
+        )
+    )
+    expired = await session.execute(
+        text("DELETE FROM answer_cache WHERE created_at < now() - make_interval(secs => :ttl)"),
+        {"ttl": ttl_s},
+    )
+    trimmed = await session.execute(
+        text(
+            """
+            DELETE FROM answer_cache
+            WHERE id IN (
+                SELECT id FROM answer_cache ORDER BY last_hit_at DESC OFFSET :max_entries
+            )
+            """
+        ),
+        {"max_entries": max_entries},
+    )
+    counts = {
+        "stale": stale.rowcount,
+        "expired": expired.rowcount,
+        "trimmed": trimmed.rowcount,
+    }
+    logger.info("Answer cache eviction: %s", counts)
+    return counts
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from rag_service.db import DatabaseManager
+
+    factory = DatabaseManager.get_session_factory()
+    try:
+        async with factory() as session:
+            async with session.begin():
+                if args.command == "evict":
+                    print(await evict(session))
+                elif args.command == "clear":
+                    stmt = delete(AnswerCacheEntry)
+                    if args.source:
+                        stmt = stmt.where(AnswerCacheEntry.source == args.source)
+                    print(f"deleted {(await session.execute(stmt)).rowcount} entries")
+                else:
+                    rows = await session.execute(
+                        select(
+                            AnswerCacheEntry.source,
+                            AnswerCacheEntry.corpus_version,
+                            func.count(),
+                            func.sum(AnswerCacheEntry.hit_count),
+                        ).group_by(AnswerCacheEntry.source, AnswerCacheEntry.corpus_version)
+                    )
+                    for source, version, n, hits in rows:
+                        print(f"{source:24} v{version:<5} entries={n} hits={hits or 0}")
+    finally:
+        await DatabaseManager.close_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Semantic answer cache maintenance")
+    parser.add_argument("command", choices=["stats", "evict", "clear"])
+    parser.add_argument("--source", default=None, help="clear: only this source")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
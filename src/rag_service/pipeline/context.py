@@ -0,0 +1,278 @@
+"""
+Context assembly for generation.
+
+Retrieved chunks overlap (the size splitter repeats up to `chunk_overlap` characters) and
+each one carries the injected "Topic: ...\\nSection: ...\\n\\n" header, so concatenating the
+top-k repeats text. Here hits are
+
+  1. grouped by source file (`chunk_metadata.document_id`) and merged into spans of
+     consecutive `chunk_index` values, dropping the overlapping prefix of each following
+     chunk and repeated headers, then
+  2. packed into a token budget greedily by score density (score per token), and
+  3. rendered in rank order with numbered citations.
+
+`PackedContext` reports the tokens the plain top-k concatenation would have cost and what
+was sent instead.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from rag_service import observability
+from rag_service.models import Chunk, HitBatch
+from rag_service.providers.rate_limit import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_HEADER = re.compile(r"\ATopic: (?P<topic>[^\n]*)\nSection: (?P<section>[^\n]*)\n\n")
+
+# Shorter matches between a chunk's tail and the next chunk's head are likely coincidence
+MIN_OVERLAP_CHARS = 20
+# Upper bound on the overlap to look for (MantineMarkdownChunker uses chunk_overlap=300)
+MAX_OVERLAP_CHARS = 400
+
+
+@dataclass
+class ContextChunk:
+    chunk_id: str
+    text: str  # as stored, possibly with the Topic/Section header
+    score: float  # higher is better
+    rank: int
+    document_key: str  # source file the chunk came from; chunk id if unknown
+    chunk_index: int | None = None  # position within that file
+    label: str = ""  # citation label (relative path)
+
+
+@dataclass
+class ContextSpan:
+    document_key: str
+    label: str
+    chunk_ids: list[str]
+    text: str
+    score: float  # sum of the member chunks' scores
+    best_rank: int
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    @property
+    def density(self) -> float:
+        return self.score / self.tokens
+
+
+@dataclass
+class PackedContext:
+    spans: list[ContextSpan]  # selected, in rank order
+    dropped: list[ContextSpan] = field(default_factory=list)
+    tokens_retrieved: int = 0  # the top-k chunks concatenated as-is
+    tokens_merged: int = 0  # after merging overlaps / headers, before the budget
+    text: str = ""
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text) if self.text else 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_retrieved - self.tokens)
+
+    @property
+    def chunk_ids(self) -> list[str]:
+        return [cid for span in self.spans for cid in span.chunk_ids]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "retrieved": self.tokens_retrieved,
+            "merged": self.tokens_merged,
+            "packed": self.tokens,
+            "saved": self.tokens_saved,
+        }
+
+
+def split_header(text: str) -> tuple[str | None, str | None, str]:
+    """(topic, section, body) of a chunk; topic/section are None without the header."""
+    m = _HEADER.match(text)
+    if m is None:
+        return None, None, text
+    return m["topic"], m["section"], text[m.end() :]
+
+
+def overlap_length(
+    left: str,
+    right: str,
+    max_overlap: int = MAX_OVERLAP_CHARS,
+    min_overlap: int = MIN_OVERLAP_CHARS,
+) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    for size in range(min(len(left), len(right), max_overlap), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _start_span(chunk: ContextChunk) -> tuple[ContextSpan, tuple[str | None, str | None]]:
+    topic, section, body = split_header(chunk.text)
+    header = f"Topic: {topic}\nSection: {section}\n\n" if topic is not None else ""
+    span = ContextSpan(
+        document_key=chunk.document_key,
+        label=chunk.label,
+        chunk_ids=[chunk.chunk_id],
+        text=header + body,
+        score=chunk.score,
+        best_rank=chunk.rank,
+    )
+    return span, (topic, section)
+
+
+def _extend_span(
+    span: ContextSpan, heading: tuple[str | None, str | None], chunk: ContextChunk
+) -> tuple[str | None, str | None]:
+    topic, section, body = split_header(chunk.text)
+    if topic is not None and (topic, section) != heading:
+        # a new block or section of the same file: keep the heading, no overlap to strip
+        prefix = f"Topic: {topic}\n" if topic != heading[0] else ""
+        span.text += f"\n\n{prefix}Section: {section}\n\n{body}"
+        heading = (topic, section)
+    else:
+        span.text += body[overlap_length(span.text, body) :] if body else ""
+    span.chunk_ids.append(chunk.chunk_id)
+    span.score += chunk.score
+    span.best_rank = min(span.best_rank, chunk.rank)
+    return heading
+
+
+def merge_chunks(chunks: Sequence[ContextChunk]) -> list[ContextSpan]:
+    """Merge runs of consecutive chunks of the same file into spans (any order in)."""
+    by_doc: dict[str, list[ContextChunk]] = {}
+    seen: set[str] = set()
+    for c in chunks:
+        if c.chunk_id not in seen:
+            seen.add(c.chunk_id)
+            by_doc.setdefault(c.document_key, []).append(c)
+
+    spans: list[ContextSpan] = []
+    for doc_chunks in by_doc.values():
+        doc_chunks.sort(key=lambda c: (c.chunk_index is None, c.chunk_index or 0, c.rank))
+        prev_index: int | None = None
+        span: ContextSpan | None = None
+        heading: tuple[str | None, str | None] = (None, None)
+        for c in doc_chunks:
+            if (
+                span is not None
+                and c.chunk_index is not None
+                and prev_index is not None
+                and c.chunk_index == prev_index + 1
+            ):
+                heading = _extend_span(span, heading, c)
+            else:
+                span, heading = _start_span(c)
+                spans.append(span)
+            prev_index = c.chunk_index
+    return spans
+
+
+_SEPARATOR = "\n\n---\n\n"
+
+
+def _citation(index: int, span: ContextSpan) -> str:
+    return f"[{index}] {span.label or span.document_key}\n"
+
+
+def pack_spans(
+    spans: Sequence[ContextSpan], token_budget: int
+) -> tuple[list[ContextSpan], list[ContextSpan]]:
+    """
+    Greedy 0/1 knapsack by score density: take spans in order of score per token while they
+    fit. Each span is charged its text plus the citation line and separator it is rendered
+    with (citation numbers at their widest), so the rendered context stays within the
+    budget. If not even the best span fits, it is truncated to the budget so the answer
+    still gets its strongest evidence. Returns (selected in rank order, dropped).
+    """
+
+    def overhead(span: ContextSpan) -> int:
+        return len(_SEPARATOR) + len(_citation(len(spans), span))
+
+    def cost(span: ContextSpan) -> int:
+        # rounded up, so the per-span costs never sum to less than the rendered total
+        return -(-(overhead(span) + len(span.text)) // CHARS_PER_TOKEN)
+
+    selected, dropped = [], []
+    remaining = token_budget
+    for span in sorted(spans, key=lambda s: (-s.score / cost(s), s.best_rank)):
+        if cost(span) <= remaining:
+            selected.append(span)
+            remaining -= cost(span)
+        else:
+            dropped.append(span)
+
+    if not selected and dropped:
+        best = max(dropped, key=lambda s: (s.score, -s.best_rank))
+        dropped.remove(best)
+        best.text = best.text[: max(0, token_budget * CHARS_PER_TOKEN - overhead(best))]
+        selected.append(best)
+    selected.sort(key=lambda s: s.best_rank)
+    return selected, dropped
+
+
+def render_context(spans: Sequence[ContextSpan]) -> str:
+    return _SEPARATOR.join(_citation(i, span) + span.text for i, span in enumerate(spans, start=1))
+
+
+def pack_context(chunks: Sequence[ContextChunk], token_budget: int) -> PackedContext:
+    spans = merge_chunks(chunks)
+    selected, dropped = pack_spans(spans, token_budget)
+    packed = PackedContext(
+        spans=selected,
+        dropped=dropped,
+        tokens_retrieved=sum(estimate_tokens(c.text) for c in chunks),
+        tokens_merged=sum(s.tokens for s in spans),
+        text=render_context(selected),
+    )
+    observability.record_context(packed.tokens_retrieved, packed.tokens)
+    logger.debug("Packed %d chunks into %d spans: %s", len(chunks), len(selected), packed.stats())
+    return packed
+
+
+async def load_context_chunks(
+    session: AsyncSession,
+    batch: HitBatch,
+    *,
+    source: str,
+    query_index: int = 0,
+    limit: int | None = None,
+) -> list[ContextChunk]:
+    """One query's hits (rank order) joined with the file / position metadata of each chunk."""
+    records = batch.records(query_index, limit=limit)
+    if not records:
+        return []
+    ids = [uuid.UUID(r["chunk_id"]) for r in records]
+    rows = await session.execute(
+        select(Chunk.id, Chunk.chunk_metadata).where(Chunk.source == source, Chunk.id.in_(ids))
+    )
+    meta: dict[str, dict[str, Any]] = {str(cid): m or {} for cid, m in rows}
+
+    chunks = []
+    for r in records:
+        m = meta.get(r["chunk_id"], {})
+        index = m.get("chunk_index")
+        chunks.append(
+            ContextChunk(
+                chunk_id=r["chunk_id"],
+                text=r["chunk_text"],
+                score=r["score"],
+                rank=r["rank"],
+                document_key=str(m.get("document_id") or r["chunk_id"]),
+                chunk_index=int(index) if index is not None else None,
+                label=str(m.get("relative_path") or m.get("file_name") or ""),
+            )
+        )
+    return chunks
@@ -0,0 +1,309 @@
+"""
+Search index maintenance for the `chunks` partitions.
+
+`chunks` is list-partitioned by source and every partition carries its own HNSW and BM25
+index (see `pipeline.partitions`). Bulk loads are much faster when those indexes are
+built once over the final data instead of being updated row by row, so the loaders build
+them with `build_search_indexes()` after inserting, using tuned maintenance settings.
+
+CLI:
+    python -m rag_service.pipeline.index_maintenance report
+    python -m rag_service.pipeline.index_maintenance residency [--source S]
+    python -m rag_service.pipeline.index_maintenance reindex [--source S] [--no-concurrently]
+    python -m rag_service.pipeline.index_maintenance rebuild [--source S] [--m 16] [--ef-construction 64]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from rag_service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IndexReport:
+    name: str
+    size_bytes: int
+    build_s: float | None = None
+    cached_bytes: int | None = None  # in shared_buffers (buffer_residency)
+
+    @property
+    def cached_fraction(self) -> float:
+        return (self.cached_bytes or 0) / self.size_bytes if self.size_bytes else 0.0
+
+
+# `source` and the metadata filter columns (models.FILTER_FIELDS) are indexed untokenized,
+# so `source = :source` and metadata filters are pushed into the ParadeDB scan.
+BM25_FIELDS = (
+    "id, content, (source::pdb.literal), (topic::pdb.literal), (section::pdb.literal), "
+    "(relative_path::pdb.literal)"
+)
+
+
+def search_index_names(table: str) -> tuple[str, str]:
+    """(HNSW, BM25) index names for a chunks partition."""
+    return f"idx_{table}_hnsw", f"idx_{table}_bm25"
+
+
+def create_search_index_sql(
+    table: str,
+    *,
+    m: int | None = None,
+    ef_construction: int | None = None,
+    names: tuple[str, str] | None = None,
+) -> list[str]:
+    m = m or settings.hnsw_m
+    ef_construction = ef_construction or settings.hnsw_ef_construction
+    hnsw, bm25 = names or search_index_names(table)
+    return [
+        f"CREATE INDEX IF NOT EXISTS {hnsw} ON {table} "
+        f"USING hnsw (embedding vector_cosine_ops) "
+        f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})",
+        f"CREATE INDEX IF NOT EXISTS {bm25} ON {table} "
+        f"USING bm25 ({BM25_FIELDS}) WITH (key_field = 'id')",
+    ]
+
+
+async def apply_maintenance_settings(
+    conn: AsyncConnection | AsyncSession, *, is_local: bool
+) -> None:
+    """Give index builds more memory and parallel workers than regular queries get."""
+    await conn.execute(
+        text("SELECT set_config('maintenance_work_mem', :mem, :local)"),
+        {"mem": settings.index_maintenance_work_mem, "local": is_local},
+    )
+    await conn.execute(
+        text("SELECT set_config('max_parallel_maintenance_workers', :w, :local)"),
+        {"w": str(settings.index_parallel_workers), "local": is_local},
+    )
+
+
+async def list_chunk_partitions(conn: AsyncConnection | AsyncSession) -> list[str]:
+    rows = await conn.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits AS i
+            JOIN pg_class AS c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'chunks'::regclass
+            ORDER BY c.relname
+            """
+        )
+    )
+    return list(rows.scalars())
+
+
+async def index_sizes(
+    conn: AsyncConnection | AsyncSession, tables: list[str] | None = None
+) -> list[IndexReport]:
+    tables = tables if tables is not None else await list_chunk_partitions(conn)
+    names = [n for t in tables for n in search_index_names(t)]
+    rows = (
+        await conn.execute(
+            text(
+                """
+                SELECT c.relname AS name, pg_relation_size(c.oid) AS size_bytes
+                FROM pg_class AS c
+                WHERE c.relkind = 'i' AND c.relname = ANY(:names)
+                ORDER BY c.relname
+                """
+            ),
+            {"names": names},
+        )
+    ).mappings()
+    return [IndexReport(name=r["name"], size_bytes=int(r["size_bytes"])) for r in rows]
+
+
+async def buffer_residency(
+    conn: AsyncConnection | AsyncSession, tables: list[str] | None = None
+) -> list[IndexReport]:
+    """
+    Size and shared_buffers residency of each partition's search indexes and heap
+    (needs the pg_buffercache extension).
+    """
+    tables = tables if tables is not None else await list_chunk_partitions(conn)
+    names = [n for t in tables for n in (*search_index_names(t), t)]
+    rows = (
+        await conn.execute(
+            text(
+                """
+                SELECT
+                    c.relname AS name,
+                    pg_relation_size(c.oid) AS size_bytes,
+                    count(b.bufferid) * current_setting('block_size')::bigint AS cached_bytes
+                FROM pg_class AS c
+                LEFT JOIN pg_buffercache AS b
+                  ON b.relfilenode = pg_relation_filenode(c.oid)
+                 AND b.reldatabase = (
+                     SELECT oid FROM pg_database WHERE datname = current_database()
+                 )
+                WHERE c.relname = ANY(:names)
+                GROUP BY c.relname, c.oid
+                ORDER BY c.relname
+                """
+            ),
+            {"names": names},
+        )
+    ).mappings()
+    return [
+        IndexReport(
+            name=r["name"], size_bytes=int(r["size_bytes"]), cached_bytes=int(r["cached_bytes"])
+        )
+        for r in rows
+    ]
+
+
+async def drop_search_indexes(session: AsyncSession, table: str) -> None:
+    """Drop a partition's HNSW and BM25 indexes (caller owns the transaction)."""
+    for name in search_index_names(table):
+        await session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+async def build_search_indexes(
+    session: AsyncSession,
+    table: str,
+    *,
+    m: int | None = None,
+    ef_construction: int | None = None,
+    names: tuple[str, str] | None = None,
+) -> list[IndexReport]:
+    """Create a partition's missing search indexes inside the caller's transaction."""
+    await apply_maintenance_settings(session, is_local=True)
+
+    names = names or search_index_names(table)
+    timings: dict[str, float] = {}
+    for name, stmt in zip(
+        names, create_search_index_sql(table, m=m, ef_construction=ef_construction, names=names)
+    ):
+        t0 = time.perf_counter()
+        await session.execute(text(stmt))
+        timings[name] = time.perf_counter() - t0
+        logger.info("Built %s in %.1fs", name, timings[name])
+
+    reports = [
+        IndexReport(name=r["name"], size_bytes=int(r["size_bytes"]))
+        for r in (
+            await session.execute(
+                text(
+                    "SELECT relname AS name, pg_relation_size(oid) AS size_bytes "
+                    "FROM pg_class WHERE relname = ANY(:names)"
+                ),
+                {"names": list(names)},
+            )
+        ).mappings()
+    ]
+    for r in reports:
+        r.build_s = timings.get(r.name)
+    return reports
+
+
+async def reindex(
+    engine: AsyncEngine,
+    *,
+    tables: list[str] | None = None,
+    concurrently: bool = True,
+) -> list[IndexReport]:
+    """
+    REINDEX the search indexes of the given partitions (default: all) and report size
+    and build time for each.
+
+    With `concurrently=True` readers and writers are not blocked; this needs autocommit,
+    so it runs on a dedicated connection instead of a session.
+    """
+    timings: dict[str, float] = {}
+    conn = await engine.connect()
+    try:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await apply_maintenance_settings(conn, is_local=False)
+        tables = tables if tables is not None else await list_chunk_partitions(conn)
+        for table in tables:
+            for name in search_index_names(table):
+                stmt = f"REINDEX INDEX {'CONCURRENTLY ' if concurrently else ''}{name}"
+                t0 = time.perf_counter()
+                await conn.execute(text(stmt))
+                timings[name] = time.perf_counter() - t0
+                logger.info("Reindexed %s in %.1fs", name, timings[name])
+
+        reports = await index_sizes(conn, tables)
+    finally:
+        await conn.close()
+
+    for r in reports:
+        r.build_s = timings.get(r.name)
+    return reports
+
+
+def _print_reports(reports: list[IndexReport]) -> None:
+    for r in reports:
+        build = f"{r.build_s:.1f}s" if r.build_s is not None else "-"
+        cached = f"  cached={r.cached_fraction:.0%}" if r.cached_bytes is not None else ""
+        print(f"{r.name:<52} {r.size_bytes / 1024**2:>10.1f} MiB  build={build}{cached}")
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from rag_service.db import DatabaseManager
+    from rag_service.pipeline.partitions import partition_name
+
+    tables = [partition_name(args.source)] if getattr(args, "source", None) else None
+    try:
+        if args.command == "report":
+            async with DatabaseManager.get_engine().connect() as conn:
+                reports = await index_sizes(conn, tables)
+        elif args.command == "residency":
+            async with DatabaseManager.get_engine().connect() as conn:
+                reports = await buffer_residency(conn, tables)
+        elif args.command == "reindex":
+            reports = await reindex(
+                DatabaseManager.get_engine(), tables=tables, concurrently=args.concurrently
+            )
+        else:  # rebuild
+            factory = DatabaseManager.get_session_factory()
+            reports = []
+            async with factory() as session:
+                async with session.begin():
+                    for table in tables or await list_chunk_partitions(session):
+                        await drop_search_indexes(session, table)
+                        reports.extend(
+                            await build_search_indexes(
+                                session, table, m=args.m, ef_construction=args.ef_construction
+                            )
+                        )
+        _print_reports(reports)
+    finally:
+        await DatabaseManager.close_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain chunk search indexes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_report = sub.add_parser("report", help="Show search index sizes")
+    p_report.add_argument("--source")
+
+    p_residency = sub.add_parser("residency", help="Share of each relation in shared_buffers")
+    p_residency.add_argument("--source")
+
+    p_reindex = sub.add_parser("reindex", help="REINDEX and report size / build time")
+    p_reindex.add_argument("--source")
+    p_reindex.add_argument("--no-concurrently", dest="concurrently", action="store_false")
+
+    p_rebuild = sub.add_parser("rebuild", help="Drop and recreate with new HNSW parameters")
+    p_rebuild.add_argument("--source")
+    p_rebuild.add_argument("--m", type=int, default=None)
+    p_rebuild.add_argument("--ef-construction", type=int, default=None)
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
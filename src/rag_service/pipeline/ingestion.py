@@ -1,16 +1,21 @@
 from __future__ import annotations
 
-from typing import Any, Callable, Dict, List, Sequence
+from typing import Any, Callable, Dict, Iterable, List, Sequence
 
+from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import delete
+from sqlmodel import delete, select
 
 from llama_index.core.ingestion import IngestionPipeline
 from llama_index.core.schema import BaseNode, MetadataMode
 from llama_index.core import Document as LlamaDocument
 
 from rag_service.models.embeddings import Document, Chunk
+from rag_service.observability import stage
+from rag_service.pipeline.answer_cache import bump_corpus_version
+from rag_service.pipeline.near_dup import NearDuplicateFilter
+from rag_service.pipeline.partitions import ensure_source_partition, replace_source_partition
 import hashlib
 import re
 
@@ -25,22 +30,35 @@ class IngestPipeline:
         chunker_transform: Any,
         session_factory: SessionFactory,
         extra_doc_metadata: Dict[str, Any] | None = None,
+        near_dup_threshold: float | None = None,
     ) -> None:
         self.embedding_model = embedding_model
         self.chunker_transform = chunker_transform
         self.session_factory = session_factory
         self.extra_doc_metadata = extra_doc_metadata or {}
 
-        # LlamaIndex pipeline: chunk -> embed
+        # Optional near-duplicate collapse (MinHash Jaccard >= threshold) before embedding
+        self.near_dup_filter = (
+            NearDuplicateFilter(threshold=near_dup_threshold)
+            if near_dup_threshold is not None
+            else None
+        )
+
+        # LlamaIndex pipeline: chunk -> [dedupe] -> embed
         self._pipeline = IngestionPipeline(
             transformations=[
-                self.chunker_transform,
-                self.embedding_model,
+                t
+                for t in (self.chunker_transform, self.near_dup_filter, self.embedding_model)
+                if t is not None
             ]
         )
 
     async def ingest_documents(
-        self, documents: List[LlamaDocument], source: str, title: str
+        self,
+        documents: List[LlamaDocument],
+        source: str,
+        title: str,
+        bulk_load: bool = False,
     ) -> Dict[str, Any]:
         """
         MVP:
@@ -49,20 +67,41 @@ class IngestPipeline:
            - delete existing documents for source (chunks cascade)
            - insert fresh document
            - bulk insert chunks (no upsert needed because doc_id is new)
+
+        With `bulk_load=True` step 2 instead loads the chunks into a fresh, unindexed
+        partition, builds its HNSW/BM25 indexes once, and swaps it in for the source's
+        current partition (see `partitions.replace_source_partition`). Use it for initial
+        loads and large re-ingests.
         """
         # Transform documents into nodes with embeddings
-        nodes: Sequence[BaseNode] = await self._pipeline.arun(
-            documents=documents, show_progress=True
-        )
+        with stage("ingest_transform"):
+            nodes: Sequence[BaseNode] = await self._pipeline.arun(
+                documents=documents, show_progress=True
+            )
 
         print(f"Ingested {len(nodes)} chunks for source {source}")
 
-        # 2) Store document and chunk
+        with stage("ingest_store"):
+            result = await self.store_nodes(nodes, source=source, title=title, bulk_load=bulk_load)
+        if self.near_dup_filter is not None:
+            result["n_near_duplicates"] = len(self.near_dup_filter.last_dropped)
+            result["near_duplicates"] = self.near_dup_filter.last_dropped
+        return result
+
+    async def store_nodes(
+        self,
+        nodes: Sequence[BaseNode],
+        source: str,
+        title: str,
+        bulk_load: bool = False,
+    ) -> Dict[str, Any]:
+        """Step 2 of `ingest_documents` for nodes that already carry embeddings."""
+        rows = self._chunk_rows(nodes)
+
         async with self.session_factory() as session:
             async with session.begin():
-                # delete previous docs for this source (chunks cascade)
-                await session.execute(delete(Document).where(Document.source == source))
-
+                # cached answers were generated from the chunks being replaced
+                await bump_corpus_version(session, source)
                 doc_row = Document(
                     source=source,
                     title=title,
@@ -72,36 +111,148 @@ class IngestPipeline:
                         "n_nodes": len(nodes),
                     },
                 )
+
+                if bulk_load:
+                    index_reports = await replace_source_partition(
+                        session, source=source, document=doc_row, rows=rows
+                    )
+                    return {
+                        "document_id": doc_row.id,
+                        "doc_row": doc_row,
+                        "n_chunks": len(nodes),
+                        "index_reports": index_reports,
+                    }
+
+                await ensure_source_partition(session, source)
+
+                # delete previous docs for this source (chunks cascade, within the partition)
+                await session.execute(delete(Document).where(Document.source == source))
+
                 session.add(doc_row)
                 await session.flush()  # get doc_row.id populated
                 doc_id = doc_row.id
 
-                if nodes:
-                    rows = []
-                    for i, node in enumerate(nodes):
-                        emb = node.get_embedding()
-                        if emb is None:
-                            raise RuntimeError("Node missing embedding. Did embedding_model run?")
+                if rows:
+                    stmt = pg_insert(Chunk.__table__).on_conflict_do_nothing(
+                        index_elements=["source", "document_id", "content_hash"]
+                    )
+                    await session.execute(
+                        stmt, [{**r, "source": source, "document_id": doc_id} for r in rows]
+                    )
 
-                        content = node.get_content(metadata_mode=MetadataMode.NONE)
+        return {"document_id": doc_id, "doc_row": doc_row, "n_chunks": len(nodes)}
 
-                        rows.append(
-                            {
-                                "document_id": doc_id,
-                                "chunk_index": i,
-                                "content": content,
-                                "embedding": emb,
-                                "content_hash": self.create_content_hash(content),
-                                "chunk_metadata": dict(node.metadata or {}),
-                            }
+    async def ingest_changes(
+        self,
+        documents: Iterable[LlamaDocument],
+        deleted_paths: Sequence[str],
+        source: str,
+        title: str,
+    ) -> Dict[str, Any]:
+        """
+        Incremental update for the files reported by `IncrementalCorpusLoader.scan()`.
+
+        Only `documents` (new/changed files) are chunked and embedded. In one transaction
+        the source's chunks for those files and for `deleted_paths` (matched on
+        `chunk_metadata.relative_path`) are replaced; every other chunk is left alone.
+        """
+        documents = list(documents)
+        nodes: Sequence[BaseNode] = (
+            await self._pipeline.arun(documents=documents, show_progress=True) if documents else []
+        )
+        rows = self._chunk_rows(nodes)
+        replaced = sorted({d.metadata["relative_path"] for d in documents} | set(deleted_paths))
+
+        print(f"Ingested {len(nodes)} chunks from {len(documents)} changed files for {source}")
+
+        async with self.session_factory() as session:
+            async with session.begin():
+                await ensure_source_partition(session, source)
+                if replaced:
+                    await bump_corpus_version(session, source)
+
+                doc_row = (
+                    await session.execute(
+                        select(Document)
+                        .where(Document.source == source)
+                        .order_by(Document.created_at.desc())
+                        .limit(1)
+                    )
+                ).scalar_one_or_none()
+                if doc_row is None:
+                    doc_row = Document(
+                        source=source,
+                        title=title,
+                        embedding_model=getattr(self.embedding_model, "model_name", None),
+                        doc_metadata=dict(self.extra_doc_metadata),
+                    )
+                    session.add(doc_row)
+                    await session.flush()
+
+                in_document = (Chunk.source == source, Chunk.document_id == doc_row.id)
+                n_deleted = 0
+                if replaced:
+                    res = await session.execute(
+                        delete(Chunk).where(
+                            *in_document,
+                            Chunk.chunk_metadata["relative_path"].astext.in_(replaced),
                         )
+                    )
+                    n_deleted = res.rowcount
 
+                if rows:
+                    # Keep chunk_index unique within the document by appending after the max
+                    offset = (
+                        await session.execute(
+                            select(func.coalesce(func.max(Chunk.chunk_index) + 1, 0)).where(
+                                *in_document
+                            )
+                        )
+                    ).scalar_one()
                     stmt = pg_insert(Chunk.__table__).on_conflict_do_nothing(
-                        index_elements=["document_id", "content_hash"]
+                        index_elements=["source", "document_id", "content_hash"]
+                    )
+                    await session.execute(
+                        stmt,
+                        [
+                            {
+                                **r,
+                                "chunk_index": r["chunk_index"] + offset,
+                                "source": source,
+                                "document_id": doc_row.id,
+                            }
+                            for r in rows
+                        ],
                     )
-                    await session.execute(stmt, rows)
 
-        return {"document_id": doc_id, "doc_row": doc_row, "n_chunks": len(nodes)}
+        return {
+            "document_id": doc_row.id,
+            "doc_row": doc_row,
+            "n_chunks": len(nodes),
+            "n_deleted_chunks": n_deleted,
+            "changed_paths": replaced,
+        }
+
+    def _chunk_rows(self, nodes: Sequence[BaseNode]) -> List[Dict[str, Any]]:
+        """Chunk rows without `source` / `document_id`, which are set at insert time."""
+        rows = []
+        for i, node in enumerate(nodes):
+            emb = node.get_embedding()
+            if emb is None:
+                raise RuntimeError("Node missing embedding. Did embedding_model run?")
+
+            content = node.get_content(metadata_mode=MetadataMode.NONE)
+
+            rows.append(
+                {
+                    "chunk_index": i,
+                    "content": content,
+                    "embedding": emb,
+                    "content_hash": self.create_content_hash(content),
+                    "chunk_metadata": dict(node.metadata or {}),
+                }
+            )
+        return rows
 
     def create_content_hash(self, content: str) -> str:
         """Create a simple hash of the content for deduplication purposes."""
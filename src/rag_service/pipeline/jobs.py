@@ -0,0 +1,447 @@
+"""
+Postgres-backed ingestion job queue.
+
+Jobs live in `ingestion_jobs`. Workers claim them with `FOR UPDATE SKIP LOCKED`, take a
+per-source advisory lock for the whole run (so two ingests of one source never race on
+the delete/swap), and checkpoint every embedded batch into `ingestion_checkpoints`.
+A job that is retried after a crash or provider outage re-chunks its documents (cheap,
+deterministic) and only embeds the texts that have no checkpoint yet.
+
+CLI:
+    python -m rag_service.pipeline.jobs enqueue --source mantine_docs --root documents --title "Mantine"
+    python -m rag_service.pipeline.jobs status [JOB_ID]
+    python -m rag_service.pipeline.jobs worker [--workers 4] [--once]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+from llama_index.core.schema import MetadataMode
+from sqlalchemy import func, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlmodel import delete, select
+
+from rag_service.models.jobs import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    IngestionCheckpoint,
+    IngestionJob,
+)
+from rag_service.observability import record_cache
+from rag_service.pipeline.document_loader import load_corpus
+from rag_service.pipeline.ingestion import IngestPipeline, SessionFactory
+
+logger = logging.getLogger(__name__)
+
+# First key of the two-key advisory lock; the second is hashtext(source).
+SOURCE_LOCK_NAMESPACE = 7301
+
+PipelineFactory = Callable[[dict[str, Any]], IngestPipeline]
+
+
+async def enqueue_job(
+    session: AsyncSession,
+    *,
+    source: str,
+    root: str,
+    title: str,
+    params: dict[str, Any] | None = None,
+) -> IngestionJob:
+    job = IngestionJob(source=source, root=root, title=title, params=params or {})
+    session.add(job)
+    await session.flush()
+    await session.refresh(job)
+    return job
+
+
+async def get_job(session: AsyncSession, job_id: uuid.UUID) -> IngestionJob | None:
+    return await session.get(IngestionJob, job_id)
+
+
+async def list_jobs(session: AsyncSession, limit: int = 50) -> list[IngestionJob]:
+    rows = await session.execute(
+        select(IngestionJob).order_by(IngestionJob.created_at.desc()).limit(limit)
+    )
+    return list(rows.scalars())
+
+
+def _text_hash(text_: str) -> str:
+    return hashlib.sha256(text_.encode("utf-8")).hexdigest()
+
+
+def default_pipeline_factory(session_factory: SessionFactory) -> PipelineFactory:
+    """Build the Mantine chunker + Gemini embedding pipeline from job params."""
+
+    def build(params: dict[str, Any]) -> IngestPipeline:
+        from rag_service.pipeline.mantine_markdown_parser import MantineMarkdownChunker
+        from rag_service.providers.gemini import make_embedding_model
+
+        embedding_model = make_embedding_model(
+            params.get("embedding_model", "gemini-embedding-001"),
+            embed_batch_size=params.get("embed_batch_size", 99),
+            requests_per_minute=params.get("requests_per_minute"),
+            tokens_per_minute=params.get("tokens_per_minute"),
+            max_concurrency=params.get("max_concurrency", 4),
+        )
+        chunker = MantineMarkdownChunker(
+            chunk_size=params.get("chunk_size", 2000),
+            chunk_overlap=params.get("chunk_overlap", 300),
+        )
+        return IngestPipeline(
+            embedding_model=embedding_model,
+            chunker_transform=chunker,
+            session_factory=session_factory,
+            near_dup_threshold=params.get("near_dup_threshold"),
+        )
+
+    return build
+
+
+class IngestionWorker:
+    def __init__(
+        self,
+        *,
+        engine: AsyncEngine,
+        session_factory: SessionFactory,
+        pipeline_factory: PipelineFactory,
+        worker_id: str | None = None,
+        poll_interval_s: float = 5.0,
+        heartbeat_s: float = 15.0,
+        stale_after_s: float = 300.0,
+        checkpoint_batch_size: int = 500,
+        max_attempts: int = 3,
+    ) -> None:
+        self.engine = engine
+        self.session_factory = session_factory
+        self.pipeline_factory = pipeline_factory
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.poll_interval_s = poll_interval_s
+        self.heartbeat_s = heartbeat_s
+        self.stale_after_s = stale_after_s
+        self.checkpoint_batch_size = checkpoint_batch_size
+        self.max_attempts = max_attempts
+
+    async def claim(self, lock_conn: AsyncConnection) -> IngestionJob | None:
+        """
+        Claim the oldest runnable job whose source is not being ingested elsewhere.
+
+        Runnable = queued, or running with a stale heartbeat (its worker died). A stale job
+        that already used its last attempt is marked failed instead of being left running
+        forever. The source advisory lock is session-level on `lock_conn`, so it is held
+        until released after the run or until the worker's connection goes away.
+        """
+        async with self.session_factory() as session:
+            async with session.begin():
+                await session.execute(
+                    text(
+                        """
+                        UPDATE ingestion_jobs
+                        SET status = :failed, finished_at = now(),
+                            error = 'worker stopped heartbeating on the last attempt'
+                        WHERE status = :running
+                          AND attempts >= :max_attempts
+                          AND heartbeat_at < now() - make_interval(secs => :stale)
+                        """
+                    ),
+                    {
+                        "failed": JOB_FAILED,
+                        "running": JOB_RUNNING,
+                        "max_attempts": self.max_attempts,
+                        "stale": self.stale_after_s,
+                    },
+                )
+                candidates = (
+                    await session.execute(
+                        text(
+                            """
+                            SELECT id, source
+                            FROM ingestion_jobs
+                            WHERE attempts < :max_attempts
+                              AND (
+                                status = :queued
+                                OR (status = :running
+                                    AND heartbeat_at < now() - make_interval(secs => :stale))
+                              )
+                            ORDER BY created_at
+                            LIMIT 10
+                            FOR UPDATE SKIP LOCKED
+                            """
+                        ),
+                        {
+                            "max_attempts": self.max_attempts,
+                            "queued": JOB_QUEUED,
+                            "running": JOB_RUNNING,
+                            "stale": self.stale_after_s,
+                        },
+                    )
+                ).all()
+
+                for job_id, source in candidates:
+                    locked = (
+                        await lock_conn.execute(
+                            text("SELECT pg_try_advisory_lock(:ns, hashtext(:source))"),
+                            {"ns": SOURCE_LOCK_NAMESPACE, "source": source},
+                        )
+                    ).scalar_one()
+                    if not locked:
+                        continue
+
+                    await session.execute(
+                        text(
+                            """
+                            UPDATE ingestion_jobs
+                            SET status = :running, worker_id = :worker, attempts = attempts + 1,
+                                error = NULL, started_at = now(), heartbeat_at = now()
+                            WHERE id = :id
+                            """
+                        ),
+                        {"running": JOB_RUNNING, "worker": self.worker_id, "id": job_id},
+                    )
+                    return await session.get(IngestionJob, job_id, populate_existing=True)
+        return None
+
+    async def _release_source_lock(self, lock_conn: AsyncConnection, source: str) -> None:
+        await lock_conn.execute(
+            text("SELECT pg_advisory_unlock(:ns, hashtext(:source))"),
+            {"ns": SOURCE_LOCK_NAMESPACE, "source": source},
+        )
+
+    async def _update_job(self, job_id: uuid.UUID, **values: Any) -> None:
+        async with self.session_factory() as session:
+            async with session.begin():
+                job = await session.get(IngestionJob, job_id)
+                if job is None:
+                    return
+                for key, value in values.items():
+                    setattr(job, key, value)
+
+    async def _heartbeat(self, job_id: uuid.UUID) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_s)
+            async with self.session_factory() as session:
+                async with session.begin():
+                    await session.execute(
+                        text("UPDATE ingestion_jobs SET heartbeat_at = now() WHERE id = :id"),
+                        {"id": job_id},
+                    )
+
+    async def _load_checkpoints(self, job_id: uuid.UUID) -> dict[str, list[float]]:
+        async with self.session_factory() as session:
+            rows = await session.execute(
+                select(IngestionCheckpoint.text_hash, IngestionCheckpoint.embedding).where(
+                    IngestionCheckpoint.job_id == job_id
+                )
+            )
+            return {h: [float(x) for x in emb] for h, emb in rows.all()}
+
+    async def _save_checkpoints(
+        self, job: IngestionJob, embeddings: dict[str, list[float]], progress: dict[str, Any]
+    ) -> None:
+        async with self.session_factory() as session:
+            async with session.begin():
+                stmt = pg_insert(IngestionCheckpoint.__table__).on_conflict_do_nothing(
+                    index_elements=["job_id", "text_hash"]
+                )
+                await session.execute(
+                    stmt,
+                    [
+                        {"job_id": job.id, "text_hash": h, "embedding": emb}
+                        for h, emb in embeddings.items()
+                    ],
+                )
+                await session.execute(
+                    update(IngestionJob)
+                    .where(IngestionJob.id == job.id)
+                    .values(progress=progress, heartbeat_at=func.now())
+                )
+
+    async def run_job(self, job: IngestionJob) -> dict[str, Any]:
+        pipeline = self.pipeline_factory(job.params)
+
+        # Loading and chunking are synchronous; keep them off the loop so the heartbeat
+        # task keeps running on large corpora
+        documents = await asyncio.to_thread(load_corpus, Path(job.root), job.source)
+        nodes = await asyncio.to_thread(pipeline.chunker_transform, documents)
+        if pipeline.near_dup_filter is not None:
+            nodes = await asyncio.to_thread(pipeline.near_dup_filter, nodes)
+
+        texts = [n.get_content(metadata_mode=MetadataMode.EMBED) for n in nodes]
+        hashes = [_text_hash(t) for t in texts]
+
+        done = await self._load_checkpoints(job.id)
+        pending: dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in done:
+                pending.setdefault(h, t)
+        record_cache("ingestion_checkpoint", hits=len(texts) - len(pending), misses=len(pending))
+        logger.info(
+            "Job %s: %s chunks, %s embeddings checkpointed, %s to embed",
+            job.id,
+            len(nodes),
+            len(done),
+            len(pending),
+        )
+
+        pending_items = list(pending.items())
+        for i in range(0, len(pending_items), self.checkpoint_batch_size):
+            batch = pending_items[i : i + self.checkpoint_batch_size]
+            embeddings = await pipeline.embedding_model.aget_text_embedding_batch(
+                [t for _, t in batch]
+            )
+            new = {h: list(emb) for (h, _), emb in zip(batch, embeddings)}
+            done.update(new)
+            await self._save_checkpoints(
+                job, new, {"n_chunks": len(nodes), "n_embedded": len(done)}
+            )
+
+        for node, h in zip(nodes, hashes):
+            node.embedding = done[h]
+
+        result = await pipeline.store_nodes(
+            nodes,
+            source=job.source,
+            title=job.title,
+            bulk_load=bool(job.params.get("bulk_load", False)),
+        )
+
+        async with self.session_factory() as session:
+            async with session.begin():
+                await session.execute(
+                    delete(IngestionCheckpoint).where(IngestionCheckpoint.job_id == job.id)
+                )
+        summary: dict[str, Any] = {
+            "n_chunks": result["n_chunks"],
+            "document_id": str(result["document_id"]),
+        }
+        if pipeline.near_dup_filter is not None:
+            # Stored as the job's progress: which dropped chunk maps to which canonical one
+            summary["near_duplicates"] = pipeline.near_dup_filter.last_dropped
+        return summary
+
+    async def run_once(self, lock_conn: AsyncConnection) -> bool:
+        """Claim and run a single job. Returns False when nothing was runnable."""
+        job = await self.claim(lock_conn)
+        if job is None:
+            return False
+
+        logger.info("Worker %s claimed job %s (source=%s)", self.worker_id, job.id, job.source)
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            progress = await self.run_job(job)
+        except Exception as exc:
+            logger.exception("Job %s failed", job.id)
+            status = JOB_FAILED if job.attempts >= self.max_attempts else JOB_QUEUED
+            await self._update_job(job.id, status=status, error=repr(exc))
+        else:
+            await self._update_job(
+                job.id,
+                status=JOB_SUCCEEDED,
+                progress=progress,
+                finished_at=datetime.now(timezone.utc),
+            )
+            logger.info("Job %s succeeded", job.id)
+        finally:
+            heartbeat.cancel()
+            (outcome,) = await asyncio.gather(heartbeat, return_exceptions=True)
+            if isinstance(outcome, Exception):
+                logger.error("Heartbeat for job %s failed", job.id, exc_info=outcome)
+            await self._release_source_lock(lock_conn, job.source)
+        return True
+
+    async def run_forever(self, *, once: bool = False) -> None:
+        """Drain the queue; with `once=True` stop as soon as nothing is runnable."""
+        lock_conn = await self.engine.connect()
+        try:
+            lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+            while True:
+                ran = await self.run_once(lock_conn)
+                if not ran:
+                    if once:
+                        return
+                    await asyncio.sleep(self.poll_interval_s)
+        finally:
+            await lock_conn.close()
+
+
+def _print_job(job: IngestionJob) -> None:
+    print(
+        f"{job.id}  {job.status:<9} source={job.source} attempts={job.attempts} "
+        f"progress={job.progress} error={job.error or '-'}"
+    )
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from rag_service.db import DatabaseManager
+
+    factory = DatabaseManager.get_session_factory()
+    try:
+        if args.command == "enqueue":
+            async with factory() as session:
+                async with session.begin():
+                    job = await enqueue_job(
+                        session,
+                        source=args.source,
+                        root=str(Path(args.root).resolve()),
+                        title=args.title or args.source,
+                        params={"bulk_load": args.bulk_load},
+                    )
+            _print_job(job)
+        elif args.command == "status":
+            async with factory() as session:
+                if args.job_id:
+                    job = await get_job(session, uuid.UUID(args.job_id))
+                    jobs = [job] if job else []
+                else:
+                    jobs = await list_jobs(session)
+            for job in jobs:
+                _print_job(job)
+        else:  # worker
+            workers = [
+                IngestionWorker(
+                    engine=DatabaseManager.get_engine(),
+                    session_factory=factory,
+                    pipeline_factory=default_pipeline_factory(factory),
+                )
+                for _ in range(args.workers)
+            ]
+            await asyncio.gather(*(w.run_forever(once=args.once) for w in workers))
+    finally:
+        await DatabaseManager.close_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingestion job queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_enqueue = sub.add_parser("enqueue", help="Queue an ingest of a docs tree")
+    p_enqueue.add_argument("--source", required=True)
+    p_enqueue.add_argument("--root", required=True)
+    p_enqueue.add_argument("--title")
+    p_enqueue.add_argument("--bulk-load", action="store_true")
+
+    p_status = sub.add_parser("status", help="Show one job or the most recent jobs")
+    p_status.add_argument("job_id", nargs="?")
+
+    p_worker = sub.add_parser("worker", help="Claim and run jobs")
+    p_worker.add_argument("--workers", type=int, default=1)
+    p_worker.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
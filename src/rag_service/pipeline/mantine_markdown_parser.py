@@ -1,9 +1,6 @@
 import re
 from typing import Any, Dict, List, Optional, Pattern, Tuple
 
-from langchain_text_splitters.markdown import MarkdownHeaderTextSplitter
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-
 from llama_index.core.bridge.pydantic import ConfigDict
 from llama_index.core.schema import TransformComponent, TextNode
 from llama_index.core import Document
@@ -35,6 +32,10 @@ class MantineMarkdownChunker(TransformComponent):
         self.h3_line = h3_line or re.compile(r"^\s*###\s+(.+?)\s*$")
         self.headers_to_split_on = headers_to_split_on or [("##", "H2"), ("###", "H3")]
 
+        # langchain is only needed once a chunker is built (ingestion), not on import
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        from langchain_text_splitters.markdown import MarkdownHeaderTextSplitter
+
         self._md_splitter = MarkdownHeaderTextSplitter(
             headers_to_split_on=self.headers_to_split_on,
             strip_headers=True,
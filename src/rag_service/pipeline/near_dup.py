@@ -0,0 +1,183 @@
+import hashlib
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from llama_index.core.bridge.pydantic import ConfigDict
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_TOKEN = re.compile(r"\w+")
+
+NEAR_DUPLICATES_KEY = "near_duplicates"
+# Chunk metadata copied onto the canonical chunk so a dropped chunk stays findable by file/topic
+_PROVENANCE_KEYS = ("relative_path", "topic", "section")
+
+
+def shingles(text: str, k: int = 5) -> set[str]:
+    """Word k-shingles of the lower-cased text."""
+    tokens = _TOKEN.findall(text.lower())
+    if len(tokens) <= k:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i : i + k]) for i in range(len(tokens) - k + 1)}
+
+
+def _hash32(items: set[str]) -> np.ndarray:
+    return np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+            for s in items
+        ),
+        dtype=np.uint64,
+        count=len(items),
+    )
+
+
+class MinHasher:
+    """MinHash signatures with `num_perm` universal hash functions (a*x + b) mod p."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # a, b < 2^31 and x < 2^32 keep a*x + b below 2^63, so uint64 never overflows
+        self._a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: set[str]) -> np.ndarray:
+        x = _hash32(items)
+        return ((np.outer(x, self._a) + self._b) % _MERSENNE_PRIME).min(axis=0)
+
+
+def _lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) whose S-curve midpoint (1/b)^(1/r) is closest to the threshold."""
+    best = (num_perm, 1)
+    best_err = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+def find_near_duplicates(
+    texts: Sequence[str],
+    threshold: float = 0.85,
+    num_perm: int = 128,
+    shingle_size: int = 5,
+) -> Dict[int, Tuple[int, float]]:
+    """
+    Map each near-duplicate text index to (canonical index, estimated Jaccard).
+
+    Candidates come from MinHash LSH banding and are confirmed on the full signature.
+    Clusters are merged transitively; the canonical member is the earliest index, so
+    the first occurrence in document order is the one that is kept.
+    """
+    if not texts:
+        return {}
+    hasher = MinHasher(num_perm=num_perm)
+    sigs = np.stack([hasher.signature(shingles(t, shingle_size)) for t in texts])
+
+    bands, rows = _lsh_params(threshold, num_perm)
+    buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+    for i, sig in enumerate(sigs):
+        for b in range(bands):
+            buckets[(b, sig[b * rows : (b + 1) * rows].tobytes())].append(i)
+
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked: set[Tuple[int, int]] = set()
+    for members in buckets.values():
+        for x, a in enumerate(members):
+            for b in members[x + 1 :]:
+                if (a, b) in checked:
+                    continue
+                checked.add((a, b))
+                if np.mean(sigs[a] == sigs[b]) >= threshold:
+                    ra, rb = find(a), find(b)
+                    if ra != rb:
+                        parent[max(ra, rb)] = min(ra, rb)
+
+    out: Dict[int, Tuple[int, float]] = {}
+    for i in range(len(texts)):
+        root = find(i)
+        if root != i:
+            out[i] = (root, float(np.mean(sigs[root] == sigs[i])))
+    return out
+
+
+class NearDuplicateFilter(TransformComponent):
+    """
+    Ingestion stage (between chunker and embedder) that drops near-duplicate chunks.
+
+    Each kept canonical chunk records the dropped ones under
+    `metadata["near_duplicates"]` as {"chunk_id", "relative_path", "topic", "section",
+    "similarity"} entries, so a dropped chunk can always be traced to the chunk that
+    represents it. `last_dropped` holds the dropped -> canonical mapping of the last call
+    for the ingest result.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True, extra="allow")
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+    ) -> None:
+        super().__init__()
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.last_dropped: List[Dict[str, Any]] = []
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs) -> List[BaseNode]:
+        nodes = list(nodes)
+        texts = [n.get_content(metadata_mode=MetadataMode.NONE) for n in nodes]
+        dupes = find_near_duplicates(
+            texts,
+            threshold=self.threshold,
+            num_perm=self.num_perm,
+            shingle_size=self.shingle_size,
+        )
+
+        self.last_dropped = []
+        for i, (canonical, sim) in sorted(dupes.items()):
+            dropped_id = _chunk_id(nodes[i])
+            canonical_node = nodes[canonical]
+            provenance = {key: nodes[i].metadata.get(key) for key in _PROVENANCE_KEYS}
+            canonical_node.metadata.setdefault(NEAR_DUPLICATES_KEY, []).append(
+                {"chunk_id": dropped_id, **provenance, "similarity": round(sim, 4)}
+            )
+            for keys in (
+                canonical_node.excluded_embed_metadata_keys,
+                canonical_node.excluded_llm_metadata_keys,
+            ):
+                if NEAR_DUPLICATES_KEY not in keys:
+                    keys.append(NEAR_DUPLICATES_KEY)
+            self.last_dropped.append(
+                {
+                    "chunk_id": dropped_id,
+                    "relative_path": provenance["relative_path"],
+                    "canonical_chunk_id": _chunk_id(canonical_node),
+                    "canonical_relative_path": canonical_node.metadata.get("relative_path"),
+                    "similarity": round(sim, 4),
+                }
+            )
+
+        return [n for i, n in enumerate(nodes) if i not in dupes]
+
+
+def _chunk_id(node: BaseNode) -> Optional[str]:
+    return node.metadata.get("chunk_id") or node.node_id
@@ -0,0 +1,231 @@
+"""
+Per-source partitions of the `chunks` table.
+
+`chunks` is `PARTITION BY LIST (source)`; each source lives in its own partition with its
+own HNSW and BM25 index, so a search scoped to one source only walks that source's graph.
+Unknown sources land in `chunks_p_default`.
+
+A source can be replaced wholesale with `replace_source_partition()`: the new chunks are
+loaded into a standalone staging table, indexed once, and swapped in with
+DETACH/ATTACH PARTITION inside one transaction instead of mass-deleting rows from the
+shared indexes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+from typing import Any
+
+from sqlalchemy import column, table as table_clause, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import delete
+
+from rag_service.models.embeddings import Chunk, Document
+from rag_service.pipeline.index_maintenance import (
+    IndexReport,
+    build_search_indexes,
+    create_search_index_sql,
+    search_index_names,
+)
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "chunks_p_"
+DEFAULT_PARTITION = f"{PARTITION_PREFIX}default"
+
+
+def partition_name(source: str) -> str:
+    """
+    Stable, identifier-safe partition name for a source. Sources that are not already
+    short lowercase identifiers get a hash suffix so distinct sources never collide.
+    """
+    slug = re.sub(r"[^a-z0-9_]", "_", source.lower())[:24]
+    if slug != source or slug == "default":
+        slug = f"{slug}_{hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]}"
+    return f"{PARTITION_PREFIX}{slug}"
+
+
+def sql_literal(value: str) -> str:
+    """Quote a string literal for DDL, where bind parameters are not allowed."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+async def partition_exists(session: AsyncSession, table: str) -> bool:
+    return (
+        await session.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": table})
+    ).scalar_one()
+
+
+async def ensure_source_partition(session: AsyncSession, source: str) -> str:
+    """
+    Create the source's partition and its search indexes if missing.
+
+    Rows of the source already in the DEFAULT partition (written before the partition
+    existed) would make `CREATE TABLE ... PARTITION OF` fail, so they are moved into the new
+    partition first.
+    """
+    table = partition_name(source)
+    if await partition_exists(session, table):
+        return table
+
+    literal = sql_literal(source)
+    stranded: bool = (
+        await session.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE source = :s)"),
+            {"s": source},
+        )
+    ).scalar_one()
+    if not stranded:
+        await session.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {table} PARTITION OF chunks FOR VALUES IN ({literal})"
+            )
+        )
+    else:
+        await _move_out_of_default(session, table, source)
+
+    for stmt in create_search_index_sql(table):
+        await session.execute(text(stmt))
+    logger.info("Created partition %s for source %r", table, source)
+    return table
+
+
+async def _move_out_of_default(session: AsyncSession, table: str, source: str) -> None:
+    """Create `table` standalone, move the source's DEFAULT-partition rows in, attach it."""
+    literal = sql_literal(source)
+    await session.execute(
+        text(
+            f"CREATE TABLE {table} "
+            f"(LIKE chunks INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS)"
+        )
+    )
+    # Generated columns are recomputed on insert; every other column is copied
+    columns = ", ".join(
+        (
+            await session.execute(
+                text(
+                    """
+                    SELECT quote_ident(attname)
+                    FROM pg_attribute
+                    WHERE attrelid = 'chunks'::regclass
+                      AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+                    ORDER BY attnum
+                    """
+                )
+            )
+        ).scalars()
+    )
+    n_moved: int = (
+        await session.execute(
+            text(
+                f"WITH moved AS ("
+                f"DELETE FROM {DEFAULT_PARTITION} WHERE source = :s RETURNING {columns}), "
+                f"copied AS ("
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM moved RETURNING 1) "
+                f"SELECT count(*) FROM copied"
+            ),
+            {"s": source},
+        )
+    ).scalar_one()
+    # Lets ATTACH skip the validation scan of the new partition
+    await session.execute(
+        text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_source CHECK (source = {literal})")
+    )
+    await session.execute(
+        text(f"ALTER TABLE chunks ATTACH PARTITION {table} FOR VALUES IN ({literal})")
+    )
+    await session.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {table}_source"))
+    logger.info(
+        "Moved %s rows of source %r out of %s into %s",
+        n_moved,
+        source,
+        DEFAULT_PARTITION,
+        table,
+    )
+
+
+async def replace_source_partition(
+    session: AsyncSession,
+    *,
+    source: str,
+    document: Document,
+    rows: list[dict[str, Any]],
+) -> list[IndexReport]:
+    """
+    Replace every chunk of `source` by swapping in a freshly built partition.
+
+    Runs inside the caller's transaction: readers keep seeing the old partition until
+    commit. The staging load and index build come first and lock nothing that readers
+    need; the swap at the end takes ACCESS EXCLUSIVE on `chunks` (DETACH), and that lock
+    is held until the caller commits, so commit right after this returns. `rows` are
+    chunk rows for `document` (their `source` is set here).
+    """
+    table = partition_name(source)
+    staging = f"{table}_new"
+    literal = sql_literal(source)
+
+    # Staging table carries the parent's PK/unique indexes so ATTACH can adopt them.
+    await session.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    await session.execute(
+        text(
+            f"CREATE TABLE {staging} "
+            f"(LIKE chunks INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS "
+            f"INCLUDING INDEXES)"
+        )
+    )
+    # Lets ATTACH skip the validation scan.
+    await session.execute(
+        text(f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_source CHECK (source = {literal})")
+    )
+
+    session.add(document)
+    await session.flush()
+
+    if rows:
+        staging_table = table_clause(
+            staging,
+            *(column(c.name, c.type) for c in Chunk.__table__.columns if c.computed is None),
+        )
+        stmt = pg_insert(staging_table).on_conflict_do_nothing(
+            index_elements=["source", "document_id", "content_hash"]
+        )
+        await session.execute(
+            stmt, [{**r, "source": source, "document_id": document.id} for r in rows]
+        )
+
+    hnsw_name, bm25_name = search_index_names(table)
+    staging_index_names = (f"{hnsw_name}_new", f"{bm25_name}_new")
+    reports = await build_search_indexes(session, staging, names=staging_index_names)
+
+    # Swap: detach + drop the old partition, then attach the new one under the old name.
+    if await partition_exists(session, table):
+        await session.execute(text(f"ALTER TABLE chunks DETACH PARTITION {table}"))
+        await session.execute(text(f"DROP TABLE {table}"))
+    await session.execute(
+        delete(Document).where(Document.source == source, Document.id != document.id)
+    )
+    await session.execute(
+        text(f"ALTER TABLE chunks ATTACH PARTITION {staging} FOR VALUES IN ({literal})")
+    )
+    await session.execute(text(f"ALTER TABLE {staging} DROP CONSTRAINT {staging}_source"))
+    await session.execute(text(f"ALTER TABLE {staging} RENAME TO {table}"))
+    final_names = dict(zip(staging_index_names, search_index_names(table)))
+    for tmp, final in final_names.items():
+        await session.execute(text(f"ALTER INDEX {tmp} RENAME TO {final}"))
+
+    for r in reports:
+        r.name = final_names.get(r.name, r.name)
+    logger.info("Swapped in new partition %s for source %r (%s rows)", table, source, len(rows))
+    return reports
+
+
+async def drop_source_partition(session: AsyncSession, source: str) -> None:
+    """Remove a source entirely without touching any other source's indexes."""
+    table = partition_name(source)
+    if await partition_exists(session, table):
+        await session.execute(text(f"ALTER TABLE chunks DETACH PARTITION {table}"))
+        await session.execute(text(f"DROP TABLE {table}"))
+    await session.execute(delete(Document).where(Document.source == source))
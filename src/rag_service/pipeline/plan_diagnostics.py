@@ -0,0 +1,248 @@
+"""
+Query-plan diagnostics for the retrieval queries.
+
+A sampled fraction of `vectors_search` / `bm25_search` queries (PLAN_SAMPLE_RATE, default 0)
+is re-run under EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) in the same transaction, so the
+`hnsw.ef_search` setting applies. Each plan is summarised into a `PlanReport` (index used,
+rows scanned vs returned, buffer hits/reads) and flagged when it regressed:
+
+    no_hnsw_index          vector query did not walk an HNSW index
+    no_bm25_index          BM25 query did not use the ParadeDB index scan
+    seq_scan               a sequential scan over a chunks table
+    below_k                fewer than k rows came back (post-filtered index scan, or a
+                           filter / BM25 match set too narrow to fill k)
+    partitions_not_pruned  more than one chunks partition was scanned
+
+Flagged plans are logged as warnings and counted in `rag_plan_checks_total`; the most recent
+reports are kept in memory (`recent_reports`). To check plans on demand:
+
+    python -m rag_service.pipeline.plan_diagnostics --source mantine_docs
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from rag_service import observability
+from rag_service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_SCAN_NODES = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan", "Custom Scan"}
+
+_recent: deque["PlanReport"] = deque(maxlen=200)
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN wrapper that keeps the inner statement's bind parameters."""
+
+    inherit_cache = False
+
+    def __init__(
+        self, statement: Any, explain_options: str = "ANALYZE, BUFFERS, FORMAT JSON"
+    ) -> None:
+        self.statement = statement
+        # not `options`: that would shadow Executable.options()
+        self.explain_options = explain_options
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler, **kw) -> str:
+    return f"EXPLAIN ({element.explain_options}) " + compiler.process(element.statement, **kw)
+
+
+@dataclass
+class PlanReport:
+    kind: str  # "vector" | "bm25"
+    query_id: str
+    k: int
+    indexes: list[str]
+    node_types: list[str]
+    relations: list[str]
+    rows_scanned: int
+    rows_returned: int
+    shared_hit_blocks: int
+    shared_read_blocks: int
+    planning_ms: float
+    execution_ms: float
+    flags: list[str] = field(default_factory=list)
+
+    @property
+    def healthy(self) -> bool:
+        return not self.flags
+
+
+def _walk(node: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def analyze_plan(explain_json: Any, *, kind: str, k: int, query_id: str = "") -> PlanReport:
+    """Summarise EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output and flag regressions."""
+    if isinstance(explain_json, str):
+        explain_json = json.loads(explain_json)
+    top = explain_json[0]
+    root = top["Plan"]
+    nodes = list(_walk(root))
+
+    indexes = [n["Index Name"] for n in nodes if n.get("Index Name")]
+    relations = sorted({n["Relation Name"] for n in nodes if n.get("Relation Name")})
+    rows_scanned = 0
+    for n in nodes:
+        if n.get("Node Type") in _SCAN_NODES:
+            loops = n.get("Actual Loops", 1) or 1
+            rows_scanned += (n.get("Actual Rows", 0) + n.get("Rows Removed by Filter", 0)) * loops
+
+    report = PlanReport(
+        kind=kind,
+        query_id=query_id,
+        k=k,
+        indexes=indexes,
+        node_types=[n["Node Type"] for n in nodes],
+        relations=relations,
+        rows_scanned=int(rows_scanned),
+        rows_returned=int(root.get("Actual Rows", 0)),
+        shared_hit_blocks=int(root.get("Shared Hit Blocks", 0)),
+        shared_read_blocks=int(root.get("Shared Read Blocks", 0)),
+        planning_ms=float(top.get("Planning Time", 0.0)),
+        execution_ms=float(top.get("Execution Time", 0.0)),
+    )
+
+    chunk_scans = [n for n in nodes if str(n.get("Relation Name", "")).startswith("chunks")]
+    if kind == "vector":
+        if not any("hnsw" in i for i in indexes):
+            report.flags.append("no_hnsw_index")
+    elif kind == "bm25":
+        uses_bm25 = any("bm25" in i for i in indexes) or any(
+            "ParadeDB" in str(n.get("Custom Plan Provider", "")) for n in nodes
+        )
+        if not uses_bm25:
+            report.flags.append("no_bm25_index")
+    if report.rows_returned < k:
+        report.flags.append("below_k")
+    if any(n.get("Node Type") == "Seq Scan" for n in chunk_scans):
+        report.flags.append("seq_scan")
+    if len({n["Relation Name"] for n in chunk_scans}) > 1:
+        report.flags.append("partitions_not_pruned")
+    return report
+
+
+def should_sample() -> bool:
+    rate = settings.plan_sample_rate
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+async def capture_plan(
+    session: AsyncSession,
+    statement: Any,
+    params: dict[str, Any] | None = None,
+    *,
+    kind: str,
+    k: int,
+    query_id: str = "",
+) -> PlanReport | None:
+    """
+    Run `statement` under EXPLAIN ANALYZE in the caller's transaction and record the report.
+    Diagnostics never fail the search: errors are logged and None is returned.
+    """
+    try:
+        # savepoint, so a failed EXPLAIN doesn't abort the caller's transaction
+        async with session.begin_nested():
+            result = await session.execute(Explain(statement), params or {})
+            plan = result.scalar_one()
+        report = analyze_plan(plan, kind=kind, k=k, query_id=query_id)
+    except Exception:
+        logger.exception("EXPLAIN capture failed for %s query %s", kind, query_id)
+        return None
+
+    _recent.append(report)
+    observability.record_plan(kind, report.flags)
+    if report.flags:
+        logger.warning(
+            "Plan regression for %s query %s: %s (indexes=%s, scanned=%s, returned=%s)",
+            kind,
+            query_id,
+            ",".join(report.flags),
+            report.indexes,
+            report.rows_scanned,
+            report.rows_returned,
+        )
+    return report
+
+
+def recent_reports() -> list[PlanReport]:
+    return list(_recent)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from rag_service.db import DatabaseManager
+    from rag_service.eval.benchmark import RecordedEmbedding, load_queries
+    from rag_service.pipeline.retrieval import bm25_search, vectors_search
+    from rag_service.providers.fake import FakeQueryEmbedding
+
+    settings.plan_sample_rate = 1.0
+    queries = load_queries(args.queries)[: args.limit]
+    embedding_model = (
+        RecordedEmbedding(args.embeddings)
+        if args.embeddings
+        else FakeQueryEmbedding(dim=settings.embedding_dim)
+    )
+    factory = DatabaseManager.get_session_factory()
+    try:
+        async with factory() as session:
+            await vectors_search(
+                queries=queries,
+                source=args.source,
+                embedding_model=embedding_model,
+                ef_search_values=[args.ef_search],
+                k=args.k,
+                session=session,
+            )
+        async with factory() as session:
+            await bm25_search(queries=queries, k=args.k, session=session, source=args.source)
+    finally:
+        await DatabaseManager.close_engine()
+
+    reports = recent_reports()
+    for r in reports:
+        status = "ok" if r.healthy else ",".join(r.flags)
+        print(
+            f"{r.kind:6} {r.query_id:24} {status:28} idx={','.join(r.indexes) or '-'} "
+            f"scanned={r.rows_scanned} returned={r.rows_returned} "
+            f"hit={r.shared_hit_blocks} read={r.shared_read_blocks} exec={r.execution_ms:.1f}ms"
+        )
+    if args.json:
+        print(json.dumps([asdict(r) for r in reports], indent=2))
+    n_bad = sum(not r.healthy for r in reports)
+    print(f"{len(reports) - n_bad}/{len(reports)} plans healthy")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the retrieval queries")
+    parser.add_argument("--source", default="mantine_docs")
+    parser.add_argument("--queries", default="evaluation/queries_merged.jsonl")
+    parser.add_argument(
+        "--embeddings", default=None, help="Recorded query embeddings (.npz); else a hash embedder"
+    )
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, default=40)
+    parser.add_argument("--json", action="store_true")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
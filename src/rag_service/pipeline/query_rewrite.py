@@ -0,0 +1,296 @@
+"""
+Query understanding: LLM rewrites of a question, fanned out as extra retrieval legs.
+
+`multi_query_search` starts retrieval for the original question right away (speculatively)
+while the rewrite strategies run concurrently on the LLM. Rewrites not back within the
+latency budget are cancelled. The ones that made it are embedded in one batch, searched
+concurrently (a session per leg) and fused with the original's hits by weighted RRF. With no
+rewrites in time, the result is simply the original query's hits.
+
+Rewrites are cached per normalized question (in-process LRU with a TTL), and concurrent
+requests for the same question share one set of LLM calls.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from rag_service import deadline
+from rag_service.models import HitBatch, QueryItem
+from rag_service.observability import record_cache, stage
+from rag_service.pipeline.retrieval import (
+    embed_queries,
+    embed_query,
+    hybrid_search,
+    rrf_fuse_many,
+)
+
+logger = logging.getLogger(__name__)
+
+REWRITE_SYSTEM_PROMPT = (
+    "You rewrite user questions for searching the Mantine React documentation. "
+    'Return ONLY valid JSON of the form {"queries": ["..."]}. No prose, no markdown.'
+)
+
+REWRITE_STRATEGIES = {
+    "docs": (
+        "Rewrite the question as {n} technical search quer(y/ies) using the wording of the "
+        "Mantine documentation (component, prop and hook names). Keep it natural language, "
+        "not a keyword list."
+    ),
+    "decompose": (
+        "If the question asks about several things, split it into at most {n} "
+        "self-contained sub-questions. Otherwise return an empty list."
+    ),
+    "hypothetical": (
+        "Write {n} short sentence(s) as they might appear in the Mantine documentation "
+        "answering the question."
+    ),
+}
+
+REWRITE_PROMPT = """{instruction}
+
+Question: '''{query}'''
+"""
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower().rstrip("?.! ")
+
+
+def parse_rewrites(raw: str) -> list[str]:
+    """Queries from the LLM's JSON ({"queries": [...]} or a bare list); [] if malformed."""
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        return []
+    if isinstance(data, dict):
+        data = data.get("queries", [])
+    if not isinstance(data, list):
+        return []
+    return [q.strip() for q in data if isinstance(q, str) and q.strip()]
+
+
+class QueryRewriter:
+    def __init__(
+        self,
+        llm: Any,
+        *,
+        strategies: Sequence[str] = ("docs", "decompose"),
+        per_strategy: int = 2,
+        max_rewrites: int = 3,
+        timeout_s: float = 1.5,
+        cache_size: int = 1024,
+        cache_ttl_s: float = 3600.0,
+    ) -> None:
+        unknown = set(strategies) - set(REWRITE_STRATEGIES)
+        if unknown:
+            raise ValueError(f"Unknown rewrite strategies: {sorted(unknown)}")
+        self.llm = llm
+        self.strategies = tuple(strategies)
+        self.per_strategy = per_strategy
+        self.max_rewrites = max_rewrites
+        self.timeout_s = timeout_s
+        self.cache_size = cache_size
+        self.cache_ttl_s = cache_ttl_s
+        self._cache: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def _cache_get(self, key: str) -> list[str] | None:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored_at, rewrites = entry
+        if time.monotonic() - stored_at > self.cache_ttl_s:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return rewrites
+
+    def _cache_put(self, key: str, rewrites: list[str]) -> None:
+        self._cache[key] = (time.monotonic(), rewrites)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def rewrite(self, query: str, *, timeout_s: float | None = None) -> list[str]:
+        """Up to `max_rewrites` rewrites of `query`, whatever arrived within the budget."""
+        key = normalize_query(query)
+        cached = self._cache_get(key)
+        if cached is not None:
+            record_cache("query_rewrite", 1)
+            return cached
+        record_cache("query_rewrite", 0, 1)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate(query, key, timeout_s or self.timeout_s))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shielded: one caller giving up must not cancel the calls others are waiting on
+        return await asyncio.shield(task)
+
+    async def _generate(self, query: str, key: str, timeout_s: float) -> list[str]:
+        with stage("query_rewrite"):
+            tasks = [asyncio.create_task(self._one(s, query)) for s in self.strategies]
+            done, pending = await asyncio.wait(tasks, timeout=timeout_s)
+            for t in pending:
+                t.cancel()
+
+        rewrites: list[str] = []
+        seen = {key}
+        failed = False
+        for t in tasks:
+            if t not in done:
+                continue
+            if t.exception() is not None:
+                failed = True
+                logger.warning("Query rewrite failed: %r", t.exception())
+                continue
+            for q in t.result():
+                norm = normalize_query(q)
+                if norm not in seen:
+                    seen.add(norm)
+                    rewrites.append(q)
+        rewrites = rewrites[: self.max_rewrites]
+
+        if pending:
+            logger.info(
+                "Cancelled %d of %d rewrites after %.2fs", len(pending), len(tasks), timeout_s
+            )
+        elif not failed:
+            # partial results are not cached, so the next request can still get them all
+            self._cache_put(key, rewrites)
+        return rewrites
+
+    async def _one(self, strategy: str, query: str) -> list[str]:
+        instruction = REWRITE_STRATEGIES[strategy].format(n=self.per_strategy)
+        raw = await self.llm.generate_text(
+            prompt=REWRITE_PROMPT.format(instruction=instruction, query=query),
+            system_prompt=REWRITE_SYSTEM_PROMPT,
+            max_tokens=300,
+            temperature=0.0,
+            response_mime_type="application/json",
+        )
+        return parse_rewrites(raw)[: self.per_strategy]
+
+
+@dataclass
+class MultiQueryResult:
+    hits: HitBatch  # fused, for the original question
+    rewrites: list[str]  # the rewrites that were searched
+    timings_ms: dict[str, float] = field(default_factory=dict)
+
+
+async def _search_leg(
+    session_factory: Callable[[], AsyncSession],
+    query: QueryItem,
+    embedding: list[float],
+    **kwargs: Any,
+) -> HitBatch:
+    async with session_factory() as session:
+        return await hybrid_search(
+            queries=[query], session=session, query_embeddings={query.id: embedding}, **kwargs
+        )
+
+
+async def multi_query_search(
+    *,
+    query: str,
+    source: str,
+    embedding_model: Any,
+    rewriter: QueryRewriter,
+    session_factory: Callable[[], AsyncSession],
+    k: int = 10,
+    ef_search: int = 40,
+    rrf_k: int = 60,
+    rewrite_weight: float = 0.5,  # relative to 1.0 for the original question
+    timeout_s: float | None = None,
+    embedding: list[float] | None = None,
+) -> MultiQueryResult:
+    t0 = time.perf_counter()
+    search_kwargs = dict(
+        source=source,
+        embedding_model=embedding_model,
+        ef_search_values=[ef_search],
+        k=k,
+        rrf_k=rrf_k,
+    )
+    # Rewrites never get more than the request has left
+    timeout_s = deadline.remaining(timeout_s or rewriter.timeout_s, stage="query_rewrite")
+    tasks: list[asyncio.Task] = []
+    try:
+        rewrite_task = asyncio.create_task(rewriter.rewrite(query, timeout_s=timeout_s))
+        tasks.append(rewrite_task)
+
+        if embedding is None:
+            embedding = await embed_query(embedding_model, query)
+        original = QueryItem(id="q", category="", difficulty=0, text=query)
+        original_task = asyncio.create_task(
+            _search_leg(session_factory, original, embedding, **search_kwargs)
+        )
+        tasks.append(original_task)
+
+        try:
+            rewrites = await rewrite_task
+        except Exception:
+            logger.exception("Query rewriting failed; searching the original query only")
+            rewrites = []
+        t_rewrite = time.perf_counter()
+
+        variants = [
+            QueryItem(id=f"q{i}", category="", difficulty=0, text=text)
+            for i, text in enumerate(rewrites, start=1)
+        ]
+        try:
+            embeds = await embed_queries(embedding_model, [v.text for v in variants])
+            leg_tasks = [
+                asyncio.create_task(_search_leg(session_factory, v, e, **search_kwargs))
+                for v, e in zip(variants, embeds)
+            ]
+            tasks.extend(leg_tasks)
+            variant_hits = await asyncio.gather(*leg_tasks, return_exceptions=True)
+        except Exception:
+            logger.exception("Rewrite legs failed; using the original query's hits")
+            variant_hits = []
+        original_hits = await original_task
+    finally:
+        # On errors, timeouts or client disconnects, don't leave searches holding connections
+        pending = [t for t in tasks if not t.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    legs, searched = [original_hits], []
+    for v, hits in zip(variants, variant_hits):
+        if isinstance(hits, BaseException):
+            logger.warning("Rewrite leg %r failed: %r", v.text, hits)
+            continue
+        legs.append(hits)
+        searched.append(v.text)
+
+    with stage("fusion"):
+        fused = (
+            rrf_fuse_many(legs, [1.0] + [rewrite_weight] * (len(legs) - 1), rrf_k=rrf_k)
+            if len(legs) > 1
+            else original_hits
+        )
+    t_end = time.perf_counter()
+    return MultiQueryResult(
+        hits=fused,
+        rewrites=searched,
+        timings_ms={
+            "rewrite": (t_rewrite - t0) * 1000,
+            "total": (t_end - t0) * 1000,
+        },
+    )
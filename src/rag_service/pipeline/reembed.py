@@ -0,0 +1,387 @@
+"""
+Online re-embedding of `chunks` to a new embedding model and/or dimension.
+
+Instead of `ALTER COLUMN embedding TYPE vector(N)` plus a blocking HNSW rebuild, the new
+vectors are built next to the old ones while search keeps serving:
+
+1. add-column   `chunks.embedding_next vector(N)` (nullable, metadata-only change);
+                N is at most 2000, the HNSW limit for `vector`
+2. backfill     embed stored chunk text in throttled batches into `embedding_next`
+3. build-index  `CREATE INDEX CONCURRENTLY` an HNSW index on `embedding_next` per partition
+4. (optional)   point reads at the new column with EMBEDDING_READ_COLUMN=embedding_next
+                (query embeddings must then come from the new model)
+5. swap         first proves `embedding_next` has no NULLs with a NOT VALID check plus
+                VALIDATE CONSTRAINT (no blocking lock; pause ingestion from here), then one
+                transaction renames columns/indexes, sets documents.embedding_model, and
+                re-types the other vector columns (answer cache, ingestion checkpoints),
+                emptying them, if the dimension changed
+
+After the swap the old vectors remain in `embedding_prev` until `drop-previous`. Update
+`EMBEDDING_DIM` / `settings.embedding_dim` to the new dimension (and add a migration for
+the vector columns, as for the 768 -> 1536 change) and reset EMBEDDING_READ_COLUMN when
+deploying the swapped schema.
+
+CLI:
+    python -m rag_service.pipeline.reembed add-column --dim 768
+    python -m rag_service.pipeline.reembed backfill --model gemini-embedding-001 --dim 768
+    python -m rag_service.pipeline.reembed build-index
+    python -m rag_service.pipeline.reembed swap --model gemini-embedding-001
+    python -m rag_service.pipeline.reembed drop-previous
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from rag_service.pipeline.index_maintenance import (
+    apply_maintenance_settings,
+    list_chunk_partitions,
+    search_index_names,
+)
+from rag_service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SHADOW_COLUMN = "embedding_next"
+PREVIOUS_COLUMN = "embedding_prev"
+NOT_NULL_CHECK = f"chunks_{SHADOW_COLUMN}_not_null"
+
+# pgvector cannot build an HNSW index on `vector` columns wider than this
+HNSW_MAX_DIM = 2000
+
+# Other columns holding embeddings of the live model; their rows are disposable
+DEPENDENT_VECTOR_COLUMNS = (
+    ("answer_cache", "query_embedding"),
+    ("ingestion_checkpoints", "embedding"),
+)
+
+
+def shadow_index_name(table: str) -> str:
+    return f"{search_index_names(table)[0]}_next"
+
+
+def previous_index_name(table: str) -> str:
+    return f"{search_index_names(table)[0]}_prev"
+
+
+def _vector_literal(embedding: list[float]) -> str:
+    return "[" + ",".join(repr(float(x)) for x in embedding) + "]"
+
+
+async def add_shadow_column(session: AsyncSession, dim: int) -> None:
+    if not 0 < dim <= HNSW_MAX_DIM:
+        raise ValueError(f"dim must be between 1 and {HNSW_MAX_DIM} (HNSW limit), got {dim}")
+    await session.execute(
+        text(f"ALTER TABLE chunks ADD COLUMN IF NOT EXISTS {SHADOW_COLUMN} vector({int(dim)})")
+    )
+
+
+async def _vector_dim(conn: AsyncConnection | AsyncSession, table: str, column: str) -> int:
+    """Declared dimension of a pgvector column (pgvector stores it as the typmod)."""
+    result = await conn.execute(
+        text(
+            "SELECT atttypmod FROM pg_attribute "
+            "WHERE attrelid = to_regclass(:t) AND attname = :c AND NOT attisdropped"
+        ),
+        {"t": table, "c": column},
+    )
+    return result.scalar_one()
+
+
+async def count_pending(session: AsyncSession, source: str | None = None) -> int:
+    where = f"{SHADOW_COLUMN} IS NULL" + (" AND source = :source" if source else "")
+    result = await session.execute(
+        text(f"SELECT count(*) FROM chunks WHERE {where}"), {"source": source}
+    )
+    return result.scalar_one()
+
+
+async def backfill(
+    session_factory,
+    embedding_model: Any,
+    *,
+    batch_size: int = 200,
+    pause_s: float = 0.0,
+    source: str | None = None,
+) -> int:
+    """
+    Embed stored chunk text into `embedding_next` for rows that don't have it yet.
+
+    Walks rows in id order (keyset pagination) and commits every batch, so it can be
+    stopped and restarted at any point. Throughput is bounded by the embedding model's own
+    rate limiter plus an optional `pause_s` between batches. Returns rows updated.
+    """
+    last_id: uuid.UUID | None = None
+    n_done = 0
+
+    while True:
+        async with session_factory() as session:
+            rows = (
+                await session.execute(
+                    text(
+                        f"""
+                        SELECT id, source, content
+                        FROM chunks
+                        WHERE {SHADOW_COLUMN} IS NULL
+                          AND (CAST(:last_id AS uuid) IS NULL OR id > :last_id)
+                          AND (CAST(:source AS text) IS NULL OR source = :source)
+                        ORDER BY id
+                        LIMIT :lim
+                        """
+                    ),
+                    {"lim": batch_size, "last_id": last_id, "source": source},
+                )
+            ).all()
+        if not rows:
+            break
+
+        t0 = time.perf_counter()
+        embeddings = await embedding_model.aget_text_embedding_batch([r[2] for r in rows])
+
+        async with session_factory() as session:
+            async with session.begin():
+                await session.execute(
+                    text(
+                        f"UPDATE chunks SET {SHADOW_COLUMN} = CAST(:emb AS vector) "
+                        f"WHERE id = :id AND source = :source"
+                    ),
+                    [
+                        {"id": r[0], "source": r[1], "emb": _vector_literal(emb)}
+                        for r, emb in zip(rows, embeddings)
+                    ],
+                )
+
+        n_done += len(rows)
+        last_id = rows[-1][0]
+        logger.info("Backfilled %s rows (%.1fs for last batch)", n_done, time.perf_counter() - t0)
+        if pause_s:
+            await asyncio.sleep(pause_s)
+
+    return n_done
+
+
+async def build_shadow_indexes(
+    engine: AsyncEngine,
+    *,
+    m: int | None = None,
+    ef_construction: int | None = None,
+) -> list[str]:
+    """CREATE INDEX CONCURRENTLY on `embedding_next` for every partition (autocommit)."""
+    m = m or settings.hnsw_m
+    ef_construction = ef_construction or settings.hnsw_ef_construction
+
+    built = []
+    conn = await engine.connect()
+    try:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await apply_maintenance_settings(conn, is_local=False)
+        for table in await list_chunk_partitions(conn):
+            name = shadow_index_name(table)
+            t0 = time.perf_counter()
+            await conn.execute(
+                text(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} "
+                    f"USING hnsw ({SHADOW_COLUMN} vector_cosine_ops) "
+                    f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+                )
+            )
+            logger.info("Built %s in %.1fs", name, time.perf_counter() - t0)
+            built.append(name)
+    finally:
+        await conn.close()
+    return built
+
+
+async def validate_shadow_column(engine: AsyncEngine) -> None:
+    """
+    Prove that no row lacks `embedding_next` without blocking search or ingestion.
+
+    Adds `CHECK (embedding_next IS NOT NULL) NOT VALID` (brief lock, no scan) and then
+    VALIDATE CONSTRAINT, which scans under SHARE UPDATE EXCLUSIVE. The check rejects new
+    rows without `embedding_next` from here on, so pause ingestion first; it is dropped
+    again if validation fails.
+    """
+    conn = await engine.connect()
+    try:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        exists: bool = (
+            await conn.execute(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM pg_constraint "
+                    "WHERE conrelid = 'chunks'::regclass AND conname = :n)"
+                ),
+                {"n": NOT_NULL_CHECK},
+            )
+        ).scalar_one()
+        if not exists:
+            await conn.execute(
+                text(
+                    f"ALTER TABLE chunks ADD CONSTRAINT {NOT_NULL_CHECK} "
+                    f"CHECK ({SHADOW_COLUMN} IS NOT NULL) NOT VALID"
+                )
+            )
+        t0 = time.perf_counter()
+        try:
+            await conn.execute(text(f"ALTER TABLE chunks VALIDATE CONSTRAINT {NOT_NULL_CHECK}"))
+        except DBAPIError as exc:
+            await conn.execute(text(f"ALTER TABLE chunks DROP CONSTRAINT {NOT_NULL_CHECK}"))
+            raise RuntimeError(f"Some chunks have no {SHADOW_COLUMN}; run backfill first") from exc
+        logger.info("Validated %s in %.1fs", NOT_NULL_CHECK, time.perf_counter() - t0)
+    finally:
+        await conn.close()
+
+
+async def swap(session: AsyncSession, *, model_name: str) -> None:
+    """
+    Atomically make `embedding_next` the live `embedding` column (caller's transaction).
+
+    Requires the validated NOT NULL check from `validate_shadow_column()`, which lets
+    SET NOT NULL skip its table scan, so the ACCESS EXCLUSIVE lock only covers catalog
+    changes. Vector columns of other tables are emptied and re-typed if the dimension
+    changes.
+    """
+    await session.execute(text("LOCK TABLE chunks IN ACCESS EXCLUSIVE MODE"))
+    validated = (
+        await session.execute(
+            text(
+                "SELECT convalidated FROM pg_constraint "
+                "WHERE conrelid = 'chunks'::regclass AND conname = :n"
+            ),
+            {"n": NOT_NULL_CHECK},
+        )
+    ).scalar_one_or_none()
+    if not validated:
+        raise RuntimeError(
+            f"{NOT_NULL_CHECK} is missing or not validated; call validate_shadow_column() first"
+        )
+    dim = await _vector_dim(session, "chunks", SHADOW_COLUMN)
+
+    tables = await list_chunk_partitions(session)
+    for table in tables:
+        exists = (
+            await session.execute(
+                text("SELECT to_regclass(:n) IS NOT NULL"), {"n": shadow_index_name(table)}
+            )
+        ).scalar_one()
+        if not exists:
+            raise RuntimeError(f"Missing {shadow_index_name(table)}; run build-index first")
+
+    await session.execute(text(f"ALTER TABLE chunks DROP COLUMN IF EXISTS {PREVIOUS_COLUMN}"))
+    await session.execute(text(f"ALTER TABLE chunks RENAME COLUMN embedding TO {PREVIOUS_COLUMN}"))
+    await session.execute(text(f"ALTER TABLE chunks ALTER COLUMN {PREVIOUS_COLUMN} DROP NOT NULL"))
+    await session.execute(text(f"ALTER TABLE chunks RENAME COLUMN {SHADOW_COLUMN} TO embedding"))
+    await session.execute(text("ALTER TABLE chunks ALTER COLUMN embedding SET NOT NULL"))
+    await session.execute(text(f"ALTER TABLE chunks DROP CONSTRAINT {NOT_NULL_CHECK}"))
+
+    for table in tables:
+        live = search_index_names(table)[0]
+        await session.execute(
+            text(f"ALTER INDEX IF EXISTS {live} RENAME TO {previous_index_name(table)}")
+        )
+        await session.execute(text(f"ALTER INDEX {shadow_index_name(table)} RENAME TO {live}"))
+
+    for table, column in DEPENDENT_VECTOR_COLUMNS:
+        if await _vector_dim(session, table, column) != dim:
+            await session.execute(text(f"DELETE FROM {table}"))
+            await session.execute(
+                text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE vector({int(dim)})")
+            )
+            logger.info("Emptied %s and re-typed %s as vector(%s)", table, column, dim)
+
+    await session.execute(
+        text("UPDATE documents SET embedding_model = :model"), {"model": model_name}
+    )
+    logger.info("Swapped %s into embedding for %s partitions", SHADOW_COLUMN, len(tables))
+
+
+async def drop_previous(session: AsyncSession) -> None:
+    """Drop the pre-swap vectors (and their indexes) once the new model is confirmed."""
+    await session.execute(text(f"ALTER TABLE chunks DROP COLUMN IF EXISTS {PREVIOUS_COLUMN}"))
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from rag_service.db import DatabaseManager
+
+    factory = DatabaseManager.get_session_factory()
+    try:
+        if args.command == "add-column":
+            async with factory() as session:
+                async with session.begin():
+                    await add_shadow_column(session, args.dim)
+        elif args.command == "backfill":
+            from rag_service.providers.gemini import make_embedding_model
+
+            model = make_embedding_model(
+                args.model,
+                dim=args.dim,
+                requests_per_minute=args.rpm,
+                tokens_per_minute=args.tpm,
+            )
+            n = await backfill(
+                factory,
+                model,
+                batch_size=args.batch_size,
+                pause_s=args.pause_s,
+                source=args.source,
+            )
+            print(f"Backfilled {n} chunks")
+        elif args.command == "build-index":
+            for name in await build_shadow_indexes(DatabaseManager.get_engine()):
+                print(name)
+        elif args.command == "swap":
+            await validate_shadow_column(DatabaseManager.get_engine())
+            async with factory() as session:
+                async with session.begin():
+                    await swap(session, model_name=args.model)
+        elif args.command == "drop-previous":
+            async with factory() as session:
+                async with session.begin():
+                    await drop_previous(session)
+        else:  # status
+            async with factory() as session:
+                print(f"pending={await count_pending(session, args.source)}")
+    finally:
+        await DatabaseManager.close_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Online re-embedding of chunks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_add = sub.add_parser("add-column", help="Add the shadow embedding column")
+    p_add.add_argument("--dim", type=int, required=True)
+
+    p_backfill = sub.add_parser("backfill", help="Embed stored chunk text into the shadow column")
+    p_backfill.add_argument("--model", required=True)
+    p_backfill.add_argument("--dim", type=int, required=True)
+    p_backfill.add_argument("--source")
+    p_backfill.add_argument("--batch-size", type=int, default=200)
+    p_backfill.add_argument("--pause-s", type=float, default=0.0)
+    p_backfill.add_argument("--rpm", type=float, default=None)
+    p_backfill.add_argument("--tpm", type=float, default=None)
+
+    sub.add_parser("build-index", help="CREATE INDEX CONCURRENTLY on the shadow column")
+
+    p_swap = sub.add_parser("swap", help="Atomically switch to the new embeddings")
+    p_swap.add_argument("--model", required=True)
+
+    sub.add_parser("drop-previous", help="Drop the pre-swap embeddings")
+
+    p_status = sub.add_parser("status", help="Rows still missing a new embedding")
+    p_status.add_argument("--source")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
-from sqlalchemy import select, text
-from ..models import QueryItem, RetrievalHit, KeywordSearchHit, Document, Chunk
+from __future__ import annotations
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import literal_column, select, text
+from ..models import QueryItem, Chunk, HitBatch, HitBatchBuilder, MetadataFilter
+from .. import deadline
+from ..observability import stage
+from . import plan_diagnostics
+from ..settings import settings
 from sqlalchemy.ext.asyncio import AsyncSession
-import pandas as pd
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Sequence
+import numpy as np
 import asyncio
 
+if TYPE_CHECKING:  # pandas is only used by the frame-based calculate_rrf_rank
+    import pandas as pd
+
 
 async def vectors_search(
     *,
@@ -13,92 +25,232 @@ async def vectors_search(
     ef_search_values: list[int],
     k: int = 15,
     session: AsyncSession,
-) -> list[RetrievalHit]:
-    query_embeds = {q.id: embedding_model.get_query_embedding(q.text) for q in queries}
+    embedding_column: str | None = None,
+    query_embeddings: dict[str, list[float]] | None = None,
+    filters: Sequence[MetadataFilter] = (),
+) -> HitBatch:
+    # `query_embeddings`: vectors the caller already has, by query id
+    query_embeds = dict(query_embeddings or {})
+    missing = [q for q in queries if q.id not in query_embeds]
+    embeds = await asyncio.gather(*(embed_query(embedding_model, q.text) for q in missing))
+    query_embeds.update({q.id: e for q, e in zip(missing, embeds)})
+    embedding_col = _embedding_column(embedding_column or settings.embedding_read_column)
+    filter_sql, filter_params = metadata_filter_sql(filters, "chunks")
 
-    hits: list[RetrievalHit] = []
+    hits = HitBatchBuilder(queries, score_name="dist")
 
     for ef in ef_search_values:
-        run_name = f"hnsw_ef{ef}_k{k}"
+        run = hits.run(f"hnsw_ef{ef}_k{k}", ef)
 
-        for q in queries:
+        for qi, q in enumerate(queries):
             q_emb = query_embeds[q.id]
-            dist = Chunk.embedding.cosine_distance(q_emb).label("dist")
+            dist = embedding_col.cosine_distance(q_emb).label("dist")
 
+            # Filtering on the partition key prunes the scan to the source's partition,
+            # so only that partition's HNSW graph is walked.
             stmt = (
                 select(Chunk.id.label("chunk_id"), Chunk.content.label("chunk_text"), dist)
-                .join(Document, Document.id == Chunk.document_id)
-                .where(Document.source == source)  # or .where(Chunk.document_id == doc_id)
+                .where(Chunk.source == source)
                 .order_by(dist)
                 .limit(k)
             )
+            if filters:
+                stmt = stmt.where(text(filter_sql).bindparams(**filter_params))
 
-            async with session.begin():  # needed for SET LOCAL
-                await session.execute(
-                    text(f"SET LOCAL hnsw.ef_search = {ef}"),
-                )
-                rows = (await session.execute(stmt)).mappings().all()
-
-            for rank, r in enumerate(rows, start=1):
-                hits.append(
-                    RetrievalHit(
-                        query_id=q.id,
-                        query_text=q.text,
-                        run_name=run_name,
-                        param_value=ef,
-                        rank=rank,
-                        dist=float(r["dist"]),
-                        chunk_id=str(r["chunk_id"]),
-                        chunk_text=r["chunk_text"],
+            async with _transaction(session):  # needed for SET LOCAL
+                with stage("vector_query"):
+                    await session.execute(
+                        text(f"SET LOCAL hnsw.ef_search = {ef}"),
+                    )
+                    await deadline.apply_statement_timeout(session, stage="vector_query")
+                    if filters:
+                        # Keep walking the graph until k rows pass the filters, instead of
+                        # filtering the ef_search nearest and returning fewer than k
+                        await session.execute(
+                            text("SELECT set_config('hnsw.iterative_scan', :mode, true)"),
+                            {"mode": settings.hnsw_iterative_scan},
+                        )
+                    rows = (await session.execute(stmt)).mappings().all()
+                # Outside the stage, so EXPLAIN ANALYZE doesn't count as query latency; still
+                # in the transaction, so the SET LOCAL settings apply to the captured plan
+                if plan_diagnostics.should_sample():
+                    await plan_diagnostics.capture_plan(
+                        session, stmt, kind="vector", k=k, query_id=q.id
                     )
-                )
 
-    return hits
+            hits.extend(qi, run, rows, "dist")
 
+    return hits.build()
+
+
+async def embed_query(embedding_model, text: str) -> list[float]:
+    """Embed without blocking the event loop (async client if the model has one)."""
+    aget = getattr(embedding_model, "aget_query_embedding", None)
+    with stage("embed_query"):
+        if aget is not None:
+            return await deadline.bounded(aget(text), "embed_query")
+        return await deadline.bounded(
+            asyncio.to_thread(embedding_model.get_query_embedding, text), "embed_query"
+        )
+
+
+async def embed_queries(embedding_model, texts: Sequence[str]) -> list[list[float]]:
+    """Embed several queries, in one request when the model supports query batches."""
+    if not texts:
+        return []
+    abatch = getattr(embedding_model, "aget_query_embedding_batch", None)
+    if abatch is None:
+        return list(await asyncio.gather(*(embed_query(embedding_model, t) for t in texts)))
+    with stage("embed_query"):
+        return await deadline.bounded(abatch(list(texts)), "embed_query")
 
-async def bm25_search(
-    *,
-    queries: list[QueryItem],
-    k: int = 15,
-    session: AsyncSession,
-    source: str,
-) -> list[KeywordSearchHit]:
-    hits: list[KeywordSearchHit] = []
 
-    sql = text(
-        """
+@asynccontextmanager
+async def _transaction(session: AsyncSession):
+    """Join the caller's transaction if one is open, otherwise run in a new one."""
+    if session.in_transaction():
+        yield
+    else:
+        async with session.begin():
+            yield
+
+
+def _embedding_column(name: str):
+    """
+    The live `embedding` column, or the shadow column of an online re-embed
+    (see pipeline.reembed). Query embeddings must come from the matching model.
+    """
+    if name == "embedding":
+        return Chunk.embedding
+    if name == "embedding_next":
+        return literal_column("chunks.embedding_next", Vector())
+    raise ValueError(f"Unknown embedding column: {name}")
+
+
+def metadata_filter_sql(
+    filters: Sequence[MetadataFilter], alias: str
+) -> tuple[str, dict[str, object]]:
+    """
+    AND of `filters` over the generated metadata columns of `alias` as a SQL fragment
+    ("TRUE" without filters) and its bind parameters.
+    """
+    clauses, params = [], {}
+    for i, f in enumerate(filters):
+        col, name = f"{alias}.{f.field}", f"mf{i}"
+        if f.op == "eq":
+            clauses.append(f"{col} = :{name}")
+            params[name] = f.value
+        elif f.op == "in":
+            clauses.append(f"{col} = ANY(CAST(:{name} AS text[]))")
+            params[name] = list(f.value)
+        else:  # prefix
+            escaped = f.value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append(f"{col} LIKE :{name}")
+            params[name] = escaped + "%"
+    return " AND ".join(clauses) or "TRUE", params
+
+
+_BM25_SQL = """
+    SELECT
+        c.id AS chunk_id,
+        c.content AS chunk_text,
+        pdb.score(c.id) AS score
+    FROM chunks AS c
+    WHERE c.source = :source
+      AND c.content ||| :q
+      AND {filters}
+    ORDER BY score DESC
+    LIMIT :lim
+"""
+
+# One round trip for many queries: each LATERAL subquery is a top-k ParadeDB scan of its
+# own (ORDER BY score LIMIT is handled inside the index scan), and the source predicate is
+# answered by the index's `source` field rather than by filtering the matches afterwards.
+# The same holds for metadata filters (untokenized fields of the index too).
+_BM25_BATCH_SQL = """
+    SELECT
+        q.ord AS query_ord,
+        h.chunk_id,
+        h.chunk_text,
+        h.score
+    FROM unnest(CAST(:queries AS text[])) WITH ORDINALITY AS q(text, ord)
+    CROSS JOIN LATERAL (
         SELECT
             c.id AS chunk_id,
             c.content AS chunk_text,
             pdb.score(c.id) AS score
         FROM chunks AS c
-        JOIN documents AS d ON d.id = c.document_id
-        WHERE d.source = :source
-          AND c.content ||| :q
+        WHERE c.source = :source
+          AND c.content ||| q.text
+          AND {filters}
         ORDER BY score DESC
         LIMIT :lim
+    ) AS h
+    ORDER BY q.ord, h.score DESC
+"""
+
+
+async def bm25_search(
+    *,
+    queries: list[QueryItem],
+    k: int = 15,
+    session: AsyncSession,
+    source: str,
+    batch_size: int | None = None,
+    filters: Sequence[MetadataFilter] = (),
+) -> HitBatch:
     """
-    )
+    Queries are scored `batch_size` at a time in one statement (BM25_BATCH_SIZE by
+    default); 1 runs one statement per query.
+    """
+    batch_size = batch_size or settings.bm25_batch_size
+    filter_sql, filter_params = metadata_filter_sql(filters, "c")
+    hits = HitBatchBuilder(queries, score_name="score")
+    run = hits.run("bm25", k)
 
-    for q in queries:
-        kw_res = await session.execute(sql, {"q": q.text, "lim": k, "source": source})
-        rows = kw_res.mappings().all()
-
-        for rank, r in enumerate(rows, start=1):
-            hits.append(
-                KeywordSearchHit(
-                    query_id=q.id,
-                    query_text=q.text,
-                    run_name="bm25",
-                    param_value=k,
-                    rank=rank,
-                    score=float(r["score"]),
-                    chunk_id=str(r["chunk_id"]),
-                    chunk_text=r["chunk_text"],
+    if batch_size <= 1 or len(queries) == 1:
+        sql = text(_BM25_SQL.format(filters=filter_sql))
+        for qi, q in enumerate(queries):
+            params = {"q": q.text, "lim": k, "source": source, **filter_params}
+            await deadline.apply_statement_timeout(session, stage="bm25_query")
+            with stage("bm25_query"):
+                kw_res = await session.execute(sql, params)
+            hits.extend(qi, run, kw_res.mappings().all(), "score")
+            if plan_diagnostics.should_sample():
+                await plan_diagnostics.capture_plan(
+                    session, sql, params, kind="bm25", k=k, query_id=q.id
                 )
+        return hits.build()
+
+    sql = text(_BM25_BATCH_SQL.format(filters=filter_sql))
+
+    for start in range(0, len(queries), batch_size):
+        group = queries[start : start + batch_size]
+        params = {
+            "queries": [q.text for q in group],
+            "lim": k,
+            "source": source,
+            **filter_params,
+        }
+        await deadline.apply_statement_timeout(session, stage="bm25_query")
+        with stage("bm25_query"):
+            rows = (await session.execute(sql, params)).mappings().all()
+        by_query: dict[int, list] = {}
+        for r in rows:
+            by_query.setdefault(int(r["query_ord"]), []).append(r)
+        for offset in range(len(group)):
+            hits.extend(start + offset, run, by_query.get(offset + 1, []), "score")
+        if plan_diagnostics.should_sample():
+            await plan_diagnostics.capture_plan(
+                session,
+                sql,
+                params,
+                kind="bm25",
+                k=k * len(group),  # rows expected from the whole batch
+                query_id=",".join(q.id for q in group),
             )
 
-    return hits
+    return hits.build()
 
 
 async def hybrid_search(
@@ -112,7 +264,9 @@ async def hybrid_search(
     a: float = 0.5,
     b: float = 0.5,
     session: AsyncSession,
-) -> pd.DataFrame:
+    query_embeddings: dict[str, list[float]] | None = None,
+    filters: Sequence[MetadataFilter] = (),
+) -> HitBatch:
 
     vector_hits = await vectors_search(
         queries=queries,
@@ -121,26 +275,103 @@ async def hybrid_search(
         ef_search_values=ef_search_values,
         k=k,
         session=session,
+        query_embeddings=query_embeddings,
+        filters=filters,
     )
     keyword_hits = await bm25_search(
         queries=queries,
         k=k,
         session=session,
         source=source,
+        filters=filters,
     )
 
-    vector_df = pd.DataFrame([hit.model_dump() for hit in vector_hits])
-    keyword_df = pd.DataFrame([hit.model_dump() for hit in keyword_hits])
+    with stage("fusion"):
+        return rrf_fuse(vector_hits, keyword_hits, rrf_k=rrf_k, a=a, b=b)
 
-    hybrid_search_results = calculate_rrf_rank(
-        vector_df=vector_df,
-        keyword_df=keyword_df,
-        rrf_k=rrf_k,
-        a=a,
-        b=b,
-    )
 
-    return hybrid_search_results
+def rrf_fuse(
+    vector_hits: HitBatch,
+    keyword_hits: HitBatch,
+    *,
+    rrf_k: int = 60,
+    a: float = 0.5,
+    b: float = 0.5,
+) -> HitBatch:
+    """
+    Reciprocal Rank Fusion over two HitBatches for the same queries, computed on the
+    index arrays (same scores as `calculate_rrf_rank`). Ranks are 1-based per query.
+    """
+    if vector_hits.query_ids != keyword_hits.query_ids:
+        raise ValueError("Both legs must be run over the same queries")
+    return rrf_fuse_many([vector_hits, keyword_hits], [a, b], rrf_k=rrf_k)
+
+
+def rrf_fuse_many(
+    legs: Sequence[HitBatch],
+    weights: Sequence[float] | None = None,
+    *,
+    rrf_k: int = 60,
+) -> HitBatch:
+    """
+    Weighted RRF over any number of legs. Query i of every leg is fused into query i of the
+    first leg, so the legs may be run over different texts of the same questions (e.g. query
+    rewrites). Weights default to 1 per leg.
+    """
+    if not legs:
+        raise ValueError("Nothing to fuse")
+    weights = [1.0] * len(legs) if weights is None else list(weights)
+    if len(weights) != len(legs):
+        raise ValueError("One weight per leg")
+    n_queries = len(legs[0].query_ids)
+    if any(len(leg.query_ids) != n_queries for leg in legs):
+        raise ValueError("All legs must have the same number of queries")
+
+    # Merge every leg's chunk table into one
+    chunk_ids: list[str] = []
+    chunk_texts: list[str] = []
+    index: dict[str, int] = {}
+    qs, cs, contribs = [], [], []
+    for leg, weight in zip(legs, weights):
+        remap = np.empty(len(leg.chunk_ids), dtype=np.int64)
+        for j, chunk_id in enumerate(leg.chunk_ids):
+            i = index.get(chunk_id)
+            if i is None:
+                i = index[chunk_id] = len(chunk_ids)
+                chunk_ids.append(chunk_id)
+                chunk_texts.append(leg.chunk_texts[j])
+            remap[j] = i
+        qs.append(leg.query_idx.astype(np.int64))
+        cs.append(remap[leg.chunk_idx])
+        contribs.append(weight / (rrf_k + leg.rank.astype(np.float64)))
+
+    n_chunks = max(len(chunk_ids), 1)
+    q = np.concatenate(qs)
+    chunk_codes = np.concatenate(cs).astype(np.int64)
+    contrib = np.concatenate(contribs)
+
+    keys, inverse = np.unique(q * n_chunks + chunk_codes, return_inverse=True)
+    fused = np.bincount(inverse, weights=contrib, minlength=len(keys))
+    fq, fc = keys // n_chunks, keys % n_chunks
+
+    order = np.lexsort((-fused, fq))
+    fq, fc, fused = fq[order], fc[order], fused[order]
+    starts = np.flatnonzero(np.r_[True, fq[1:] != fq[:-1]]) if len(fq) else np.array([], int)
+    rank = np.arange(len(fq)) - np.repeat(starts, np.diff(np.r_[starts, len(fq)])) + 1
+
+    return HitBatch(
+        query_ids=legs[0].query_ids,
+        query_texts=legs[0].query_texts,
+        runs=[(f"rrf_k{rrf_k}", int(rrf_k))],
+        chunk_ids=chunk_ids,
+        chunk_texts=chunk_texts,
+        query_idx=fq.astype(np.int32),
+        run_idx=np.zeros(len(fq), dtype=np.int32),
+        chunk_idx=fc.astype(np.int32),
+        rank=rank.astype(np.int32),
+        score=fused,
+        score_name="score",
+    )
 
 
 def calculate_rrf_rank(
@@ -162,6 +393,7 @@ def calculate_rrf_rank(
     Returns:
         np.ndarray of shape (n_queries, n_docs) re-ranked using combined RRF scores
     """
+    import pandas as pd
 
     v = vector_df.copy()
     k = keyword_df.copy()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Sequence
+
+from .rate_limit import estimate_tokens
+
+
+def pack_batches(
+    texts: Sequence[str],
+    *,
+    max_batch_tokens: int,
+    max_batch_size: int,
+    estimate: Callable[[str], int] = estimate_tokens,
+) -> list[list[int]]:
+    """
+    Group texts into request batches bounded by both an estimated token budget and an
+    item count. Returns batches of indices into `texts`.
+
+    Texts are visited longest-first so similarly sized texts share a batch: long chunks
+    stay under the per-request token limit, and short ones fill batches up to the item
+    limit instead of leaving capacity unused. A single text above the budget gets its
+    own batch (the provider truncates it).
+    """
+    if max_batch_size <= 0 or max_batch_tokens <= 0:
+        raise ValueError("max_batch_size and max_batch_tokens must be positive")
+
+    sizes = [estimate(t) for t in texts]
+    order = sorted(range(len(texts)), key=lambda i: sizes[i], reverse=True)
+
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for i in order:
+        if current and (
+            len(current) >= max_batch_size or current_tokens + sizes[i] > max_batch_tokens
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += sizes[i]
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def unpack_results(
+    batches: Sequence[Sequence[int]], results: Sequence[Sequence[list[float]]], n: int
+) -> list[list[float]]:
+    """Scatter per-batch results back into the original text order."""
+    out: list[list[float] | None] = [None] * n
+    for idx, batch_result in zip(batches, results):
+        if len(idx) != len(batch_result):
+            raise RuntimeError(
+                f"Provider returned {len(batch_result)} embeddings for a batch of {len(idx)}"
+            )
+        for i, emb in zip(idx, batch_result):
+            out[i] = emb
+    return out  # type: ignore[return-value]
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+
+from .rate_limit import estimate_tokens
+
+
+class FakeRateLimitError(Exception):
+    """Mimics the provider's 429 / RESOURCE_EXHAUSTED error."""
+
+    code = 429
+    status = "RESOURCE_EXHAUSTED"
+
+
+def hash_embedding(text: str, dim: int) -> list[float]:
+    """Deterministic unit vector derived from the text (same text -> same vector)."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+class _FakeQuota:
+    """RPM/TPM/concurrency quotas over a sliding window, like the provider enforces them."""
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        max_concurrency: int | None = None,
+        window_s: float = 60.0,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.window_s = window_s
+
+        self._calls: deque[tuple[float, int]] = deque()
+        self._in_flight = 0
+        self.n_requests = 0
+        self.n_throttled = 0
+        self.max_in_flight = 0
+
+    def _check_quota(self, n_tokens: int) -> None:
+        now = time.monotonic()
+        while self._calls and now - self._calls[0][0] > self.window_s:
+            self._calls.popleft()
+
+        used_requests = len(self._calls)
+        used_tokens = sum(t for _, t in self._calls)
+        rpm, tpm = self.requests_per_minute, self.tokens_per_minute
+        over = (
+            (rpm is not None and used_requests + 1 > rpm)
+            or (tpm is not None and used_tokens + n_tokens > tpm)
+            or (self.max_concurrency is not None and self._in_flight >= self.max_concurrency)
+        )
+        if over:
+            self.n_throttled += 1
+            raise FakeRateLimitError("quota exceeded")
+        self._calls.append((now, n_tokens))
+
+
+class FakeEmbeddingProvider(_FakeQuota):
+    """
+    Local stand-in for the embedding API that enforces RPM/TPM quotas over a sliding
+    one-minute window and raises `FakeRateLimitError` when they are exceeded.
+    """
+
+    def __init__(
+        self,
+        *,
+        dim: int = 1536,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        max_concurrency: int | None = None,
+        latency_s: float = 0.0,
+        window_s: float = 60.0,
+    ) -> None:
+        super().__init__(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_concurrency=max_concurrency,
+            window_s=window_s,
+        )
+        self.dim = dim
+        self.latency_s = latency_s
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        self._check_quota(sum(estimate_tokens(t) for t in texts))
+        self.n_requests += 1
+        self._in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            if self.latency_s:
+                await asyncio.sleep(self.latency_s)
+            return [hash_embedding(t, self.dim) for t in texts]
+        finally:
+            self._in_flight -= 1
+
+
+class FakeQueryEmbedding:
+    """
+    Deterministic, network-free stand-in for the query side of an embedding model.
+
+    `latency_s` simulates the API call: the async path awaits it, while the sync path blocks
+    the calling thread like the real client does.
+    """
+
+    def __init__(self, *, dim: int = 1536, latency_s: float = 0.0) -> None:
+        self.dim = dim
+        self.latency_s = latency_s
+        self.model_name = f"fake-hash-{dim}"
+
+    def get_query_embedding(self, query: str) -> list[float]:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return hash_embedding(query, self.dim)
+
+    async def aget_query_embedding(self, query: str) -> list[float]:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return hash_embedding(query, self.dim)
+
+    async def aget_query_embedding_batch(self, queries: list[str]) -> list[list[float]]:
+        """One simulated request for the whole batch."""
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return [hash_embedding(q, self.dim) for q in queries]
+
+
+class FakeGenAIClient(_FakeQuota):
+    """
+    Network-free stand-in for `google.genai.Client` text generation
+    (`client.aio.models.generate_content`), for exercising `GeminiTextLLM` under load.
+
+    Latency is lognormal around `latency_s` (`latency_sigma` > 0 gives it a tail to hedge
+    against). Requests over the quotas, plus a random `throttle_rate` fraction, fail with
+    `FakeRateLimitError`. JSON requests get `{"queries": []}`; other requests get a short
+    echo of the prompt.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency_s: float = 0.2,
+        latency_sigma: float = 0.0,
+        throttle_rate: float = 0.0,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        max_concurrency: int | None = None,
+        seed: int | None = None,
+    ) -> None:
+        super().__init__(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_concurrency=max_concurrency,
+        )
+        self.latency_s = latency_s
+        self.latency_sigma = latency_sigma
+        self.throttle_rate = throttle_rate
+        self._rng = random.Random(seed)
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self.generate_content))
+
+    def _latency(self) -> float:
+        if self.latency_sigma <= 0:
+            return self.latency_s
+        return self.latency_s * self._rng.lognormvariate(0.0, self.latency_sigma)
+
+    async def generate_content(self, *, model: str, contents: str, config: Any = None) -> Any:
+        max_output = getattr(config, "max_output_tokens", None) or 0
+        self._check_quota(estimate_tokens(contents) + max_output)
+        if self.throttle_rate and self._rng.random() < self.throttle_rate:
+            self.n_throttled += 1
+            raise FakeRateLimitError("injected 429")
+
+        self.n_requests += 1
+        self._in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            await asyncio.sleep(self._latency())
+        finally:
+            self._in_flight -= 1
+
+        if getattr(config, "response_mime_type", None) == "application/json":
+            return SimpleNamespace(text=json.dumps({"queries": []}))
+        return SimpleNamespace(text=f"[{model}] {contents[-200:]}")
@@ -4,56 +4,238 @@ from pydantic import BaseModel
 from dotenv import load_dotenv
 from google.genai import types
 from google import genai
+from collections import deque
+from functools import lru_cache
+from typing import Any
 import asyncio
 import os
 import time
 
-load_dotenv()
+from ..observability import record_embedding_batch, record_llm_event, stage
+from .batching import pack_batches, unpack_results
+from .rate_limit import RateLimiter, estimate_tokens
 
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-EMBEDDING_DIM = os.getenv("EMBEDDING_DIM") or "1536"
+@lru_cache(maxsize=1)
+def _load_env() -> None:
+    # Read .env when a client is first built rather than as an import side effect
+    load_dotenv()
 
 
 class RateLimitedGeminiEmbedding(GoogleGenAIEmbedding):
+    """
+    Gemini embeddings with RPM/TPM token buckets, several batches in flight at once,
+    AIMD concurrency on 429s and jittered exponential-backoff retries.
+
+    Batches are packed by estimated tokens (up to `max_batch_tokens`) as well as by
+    count (`embed_batch_size`), so short chunks share fuller requests.
+    """
+
     model_config = ConfigDict(arbitrary_types_allowed=True, extra="allow")
 
-    def __init__(self, *args, sleep_s=1.0, **kwargs):
+    def __init__(
+        self,
+        *args,
+        sleep_s=0.0,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        max_batch_tokens: int = 20_000,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
-        self.sleep_s = sleep_s
+        self.max_batch_tokens = max_batch_tokens
+        self.sleep_s = sleep_s  # optional fixed pacing per batch, on top of the limiter
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_concurrency=max_concurrency,
+            max_retries=max_retries,
+        )
+
+    async def _aembed_batch(self, batch: list[str]) -> list[list[float]]:
+        if self.sleep_s:
+            await asyncio.sleep(self.sleep_s)
+        n_tokens = sum(estimate_tokens(t) for t in batch)
+        record_embedding_batch("text", len(batch), n_tokens)
+        with stage("embed_batch"):
+            return await self.rate_limiter.run(
+                lambda: self._aget_text_embeddings(batch), n_tokens=n_tokens
+            )
 
     async def aget_text_embedding_batch(self, texts, show_progress=True, **kwargs):
-        embeddings = []
-        for i in range(0, len(texts), self.embed_batch_size):
-            batch = texts[i : i + self.embed_batch_size]
-            await asyncio.sleep(self.sleep_s)  # throttle per batch
-            embeddings.extend(await self._aget_text_embeddings(batch))
-        return embeddings
+        batches = pack_batches(
+            texts,
+            max_batch_tokens=self.max_batch_tokens,
+            max_batch_size=self.embed_batch_size,
+        )
+        # The limiter bounds how many of these actually run concurrently.
+        results = await asyncio.gather(
+            *(self._aembed_batch([texts[i] for i in idx]) for idx in batches)
+        )
+        return unpack_results(batches, results, len(texts))
+
+    async def aget_query_embedding_batch(self, queries: list[str]) -> list[list[float]]:
+        """Several query embeddings (RETRIEVAL_QUERY task type) in one limited request."""
+        n_tokens = sum(estimate_tokens(q) for q in queries)
+        record_embedding_batch("query", len(queries), n_tokens)
+        with stage("embed_batch"):
+            return await self.rate_limiter.run(
+                lambda: self._aembed_texts(queries, task_type="RETRIEVAL_QUERY"),
+                n_tokens=n_tokens,
+            )
+
+
+def make_embedding_model(
+    model_name: str = "gemini-embedding-001",
+    dim: int | None = None,
+    **kwargs,
+) -> RateLimitedGeminiEmbedding:
+    """RateLimitedGeminiEmbedding with the repo defaults (API key and dimension from env)."""
+    _load_env()
+    kwargs.setdefault("embed_batch_size", 99)
+    return RateLimitedGeminiEmbedding(
+        model_name=model_name,
+        api_key=os.getenv("GEMINI_API_KEY"),
+        embedding_config=types.EmbedContentConfig(
+            output_dimensionality=int(dim or os.getenv("EMBEDDING_DIM") or "1536")
+        ),
+        **kwargs,
+    )
 
 
 class GeminiTextLLM:
+    """
+    Gemini text generation for many concurrent callers.
+
+    Calls go through a `RateLimiter` (RPM/TPM token buckets, an adaptive concurrency cap,
+    jittered backoff retries on 429 / 5xx / timeouts). Each attempt has its own timeout
+    (`timeout_s`) and `generate_text(deadline_s=...)` bounds the whole call, retries
+    included. With `hedge=True`, a call still running after the p95 of recent latencies
+    gets a duplicate request. The first to succeed is used and the other is cancelled.
+    The hedge clock starts once the first attempt holds a concurrency slot, no hedge is
+    sent while other calls are queued for one, and at most `hedge_budget` of recent calls
+    are hedged.
+
+    `client` replaces the genai client, e.g. with `providers.fake.FakeGenAIClient`.
+    """
+
     def __init__(
         self,
         *,
         model: str,
         api_key: str | None = None,
-        min_interval_s: float = 0.0,  # 👈 add this
+        min_interval_s: float = 0.0,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_concurrency: int = 16,
+        max_retries: int = 4,
+        timeout_s: float = 30.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        hedge_budget: float = 0.05,
+        client: Any | None = None,
     ):
         self.model = model
-        self.client = genai.Client(api_key=api_key) if api_key else genai.Client()
-        self.min_interval_s = float(min_interval_s)
-        self._last_call_ts = 0.0
-        self._throttle_lock = asyncio.Lock()  # avoids race if concurrent calls
-
-    async def _throttle(self):
-        if self.min_interval_s <= 0:
-            return
-        async with self._throttle_lock:
-            now = time.monotonic()
-            wait = (self._last_call_ts + self.min_interval_s) - now
-            if wait > 0:
-                await asyncio.sleep(wait)
-            self._last_call_ts = time.monotonic()
+        if client is None:
+            _load_env()
+            client = genai.Client(api_key=api_key) if api_key else genai.Client()
+        self.client = client
+        self.timeout_s = timeout_s
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_budget = hedge_budget
+        self.n_hedged = 0
+        self._latencies: deque[float] = deque(maxlen=200)
+        self._recent_hedges: deque[bool] = deque(maxlen=200)
+
+        # min_interval_s (older callers) is an RPM limit without bursts
+        burst = None
+        if min_interval_s > 0 and requests_per_minute is None:
+            requests_per_minute, burst = 60.0 / min_interval_s, 1.0
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_concurrency=max_concurrency,
+            max_retries=max_retries,
+            request_burst=burst,
+        )
+
+    def hedge_delay(self) -> float | None:
+        """Seconds after which a duplicate request is sent, or None (not enough history)."""
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+
+    def _may_hedge(self) -> bool:
+        # A hedge that has to queue for a slot only adds load, and the budget keeps
+        # hedges near the tail they are meant for
+        if self.rate_limiter.saturated:
+            return False
+        n_hedged = sum(self._recent_hedges)
+        return n_hedged + 1 <= self.hedge_budget * (len(self._recent_hedges) + 1)
+
+    async def _call_once(
+        self, contents: str, cfg: Any, started: asyncio.Event | None = None
+    ) -> str:
+        if started is not None:
+            started.set()
+        t0 = time.monotonic()
+        with stage("llm_call"):
+            resp = await asyncio.wait_for(
+                self.client.aio.models.generate_content(
+                    model=self.model, contents=contents, config=cfg
+                ),
+                self.timeout_s,
+            )
+        self._latencies.append(time.monotonic() - t0)
+        return (resp.text or "").strip()
+
+    async def _limited(
+        self, contents: str, cfg: Any, n_tokens: int, started: asyncio.Event | None = None
+    ) -> str:
+        return await self.rate_limiter.run(
+            lambda: self._call_once(contents, cfg, started), n_tokens=n_tokens
+        )
+
+    async def _hedged(self, contents: str, cfg: Any, n_tokens: int) -> str:
+        delay = self.hedge_delay()
+        if delay is None:
+            self._recent_hedges.append(False)
+            return await self._limited(contents, cfg, n_tokens)
+
+        started = asyncio.Event()
+        first = asyncio.create_task(self._limited(contents, cfg, n_tokens, started))
+        pending: set[asyncio.Task] = {first}
+        try:
+            # Time spent queued for a slot doesn't count towards the hedge delay
+            slot = asyncio.create_task(started.wait())
+            try:
+                await asyncio.wait({first, slot}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                slot.cancel()
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            hedge = not done and self._may_hedge()
+            self._recent_hedges.append(hedge)
+            if hedge:
+                self.n_hedged += 1
+                record_llm_event("hedged")
+                pending.add(asyncio.create_task(self._limited(contents, cfg, n_tokens)))
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error  # type: ignore[misc]
+        finally:
+            for task in pending:
+                task.cancel()
 
     async def generate_text(
         self,
@@ -66,9 +248,8 @@ class GeminiTextLLM:
         n: int = 1,
         stop: list[str] | None = None,
         response_mime_type: str | None = None,
+        deadline_s: float | None = None,
     ) -> str:
-        await self._throttle()
-
         cfg = types.GenerateContentConfig(
             system_instruction=system_prompt,
             max_output_tokens=max_tokens,
@@ -78,10 +259,11 @@ class GeminiTextLLM:
             stop_sequences=stop or None,
             response_mime_type=response_mime_type,
         )
+        # TPM budget: prompt estimate plus the most the response can use
+        n_tokens = estimate_tokens(prompt + (system_prompt or "")) + max_tokens
 
-        resp = await self.client.aio.models.generate_content(
-            model=self.model,
-            contents=prompt,
-            config=cfg,
-        )
-        return (resp.text or "").strip()
+        try:
+            return await asyncio.wait_for(self._hedged(prompt, cfg, n_tokens), deadline_s)
+        except asyncio.TimeoutError:
+            record_llm_event("deadline_exceeded")
+            raise
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Rough chars-per-token ratio for English prose / markdown. Only used for budgeting.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for TPM budgeting (no tokenizer round-trip)."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """True for provider throttling responses (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if code == 429:
+        return True
+    status = str(getattr(exc, "status", "") or "")
+    return status == "RESOURCE_EXHAUSTED"
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Throttling, server-side errors and timeouts are worth retrying."""
+    if is_rate_limit_error(exc):
+        return True
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at `per_minute / 60` tokens per second.
+
+    `acquire(n)` waits until `n` tokens are available. Requests larger than the bucket
+    capacity are clamped so they can still go through (after draining the bucket).
+    """
+
+    def __init__(self, per_minute: float, *, capacity: float | None = None) -> None:
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the provider reports we are over quota."""
+        self._refill()
+        self._tokens = 0.0
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit: +`increase` per `limit` successes, x`decrease` on throttling.
+
+    Several in-flight requests usually get throttled together, so decreases are applied
+    at most once per `cooldown_s`.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        *,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        cooldown_s: float = 1.0,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown_s = cooldown_s
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._waiting = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        """Callers blocked in `acquire` for a slot."""
+        return self._waiting
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            self._waiting += 1
+            try:
+                await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+
+    async def release(self) -> None:
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self) -> None:
+        self._limit = min(float(self.max_limit), self._limit + self.increase / self._limit)
+
+    def on_throttle(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown_s:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.min_limit), self._limit * self.decrease)
+        logger.info("Throttled by provider; concurrency limit -> %s", self.limit)
+
+
+class RateLimiter:
+    """
+    Combines RPM/TPM token buckets, an adaptive concurrency limit and jittered
+    exponential-backoff retries around a single provider call.
+    """
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_concurrency: int = 4,
+        min_concurrency: int = 1,
+        initial_concurrency: int | None = None,
+        max_retries: int = 6,
+        backoff_initial_s: float = 1.0,
+        backoff_max_s: float = 60.0,
+        request_burst: float | None = None,
+    ) -> None:
+        # request_burst caps the RPM bucket (default: a minute's worth of requests)
+        self.requests = (
+            TokenBucket(requests_per_minute, capacity=request_burst)
+            if requests_per_minute
+            else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        # Start below the cap so AIMD can grow towards it as well as back off from it
+        if initial_concurrency is None:
+            initial_concurrency = max(min_concurrency, max_concurrency // 2)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial=initial_concurrency,
+            min_limit=min_concurrency,
+            max_limit=max_concurrency,
+        )
+        self.max_retries = max_retries
+        self.backoff_initial_s = backoff_initial_s
+        self.backoff_max_s = backoff_max_s
+
+    @property
+    def saturated(self) -> bool:
+        """True when a new call would have to wait for a concurrency slot."""
+        return self.concurrency.waiting > 0 or self.concurrency.in_flight >= self.concurrency.limit
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], n_tokens: int) -> T:
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(n_tokens)
+
+        await self.concurrency.acquire()
+        try:
+            result = await fn()
+        except BaseException as exc:
+            if is_rate_limit_error(exc):
+                self.concurrency.on_throttle()
+                if self.requests is not None:
+                    self.requests.drain()
+            raise
+        finally:
+            await self.concurrency.release()
+
+        self.concurrency.on_success()
+        return result
+
+    async def run(self, fn: Callable[[], Awaitable[T]], *, n_tokens: int = 1) -> T:
+        """Run `fn` under the limits, retrying transient errors with jittered backoff."""
+        retrying = AsyncRetrying(
+            retry=retry_if_exception(is_transient_error),
+            wait=wait_random_exponential(multiplier=self.backoff_initial_s, max=self.backoff_max_s),
+            stop=stop_after_attempt(self.max_retries),
+            reraise=True,
+        )
+        async for attempt in retrying:
+            with attempt:
+                return await self._attempt(fn, n_tokens)
+        raise RuntimeError("unreachable")  # pragma: no cover
@@ -0,0 +1,218 @@
+"""
+Cold-start warmup, run in the background from the API's lifespan.
+
+After a deploy or a DB restart the first requests pay for connecting, asyncpg's per-connection
+type introspection and prepared statements, the embedder's imports and client, and index
+pages read from disk. `run_warmup` does all of that up front:
+
+  1. pool       open the pool's `pool_size` connections and resolve the pgvector type on each
+  2. prewarm    `pg_prewarm` every chunks partition's heap, HNSW and BM25 index
+  3. embedder   build the query embedder (imports google.genai / llama_index)
+  4. queries    a few synthetic hybrid searches per source, spread over the pool
+
+A failing step is logged and recorded; it does not stop the others. `/ready` answers 503
+until the warmup is finished and reports its duration and the buffer-cache residency of the
+search indexes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from rag_service import observability
+from rag_service.pipeline.index_maintenance import (
+    buffer_residency,
+    list_chunk_partitions,
+    search_index_names,
+)
+from rag_service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupReport:
+    started_at: float = field(default_factory=time.monotonic)
+    duration_s: float | None = None  # None while running
+    steps_ms: dict[str, float] = field(default_factory=dict)
+    connections: int = 0
+    prewarmed_blocks: dict[str, int] = field(default_factory=dict)
+    residency: dict[str, float] = field(default_factory=dict)  # relation -> cached fraction
+    queries: int = 0
+    errors: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def done(self) -> bool:
+        return self.duration_s is not None
+
+
+_report: WarmupReport | None = None
+
+
+def status() -> dict[str, Any]:
+    """Readiness for /ready: ready once warmup has finished (or when it is disabled)."""
+    if _report is None:
+        return {"ready": not settings.warmup_enabled, "warmup": None}
+    return {
+        "ready": _report.done,
+        "warmup": {
+            "duration_s": _report.duration_s,
+            "steps_ms": _report.steps_ms,
+            "connections": _report.connections,
+            "queries": _report.queries,
+            "residency": _report.residency,
+            "errors": _report.errors,
+        },
+    }
+
+
+@asynccontextmanager
+async def _step(report: WarmupReport, name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as exc:
+        logger.warning("Warmup step %s failed: %r", name, exc)
+        report.errors[name] = repr(exc)
+    finally:
+        report.steps_ms[name] = (time.perf_counter() - t0) * 1000
+
+
+async def open_pool(engine: AsyncEngine, size: int | None = None) -> int:
+    """
+    Check out `size` connections at once (default: the pool size) so they are all created,
+    and resolve the `vector` type on each (asyncpg introspects it once per connection).
+    """
+    size = size or getattr(engine.pool, "size", lambda: 1)()
+    results = await asyncio.gather(
+        *(engine.connect().start() for _ in range(size)), return_exceptions=True
+    )
+    conns: list[AsyncConnection] = [c for c in results if not isinstance(c, BaseException)]
+    try:
+        for conn in conns:
+            await conn.execute(text("SELECT CAST('[0]' AS vector)"))
+            await conn.rollback()
+    finally:
+        for conn in conns:
+            await conn.close()
+    failed = [r for r in results if isinstance(r, BaseException)]
+    if failed:
+        raise failed[0]
+    return len(conns)
+
+
+async def prewarm(engine: AsyncEngine, tables: list[str] | None = None) -> dict[str, int]:
+    """`pg_prewarm` each chunks partition's heap and search indexes; blocks read per relation."""
+    blocks: dict[str, int] = {}
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        installed = await conn.scalar(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_prewarm'")
+        )
+        if not installed:
+            raise RuntimeError("pg_prewarm extension is not installed")
+        tables = tables if tables is not None else await list_chunk_partitions(conn)
+        for table in tables:
+            for rel in (*search_index_names(table), table):
+                blocks[rel] = int(
+                    await conn.scalar(
+                        text("SELECT pg_prewarm(CAST(:rel AS regclass))"), {"rel": rel}
+                    )
+                )
+    return blocks
+
+
+async def synthetic_queries(
+    engine: AsyncEngine,
+    session_factory: Callable[[], AsyncSession],
+    embedding_model: Any,
+    queries: list[str],
+    *,
+    concurrency: int,
+) -> int:
+    """Run `queries` as hybrid searches against every source, `concurrency` at a time."""
+    from rag_service.models import QueryItem
+    from rag_service.pipeline.retrieval import hybrid_search
+
+    async with engine.connect() as conn:
+        sources = list(
+            (
+                await conn.execute(
+                    text("SELECT DISTINCT source FROM documents WHERE source IS NOT NULL")
+                )
+            ).scalars()
+        )
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(source: str, i: int, query: str) -> None:
+        async with sem, session_factory() as session:
+            await hybrid_search(
+                queries=[QueryItem(id=f"warmup{i}", category="", difficulty=0, text=query)],
+                source=source,
+                embedding_model=embedding_model,
+                ef_search_values=[40],
+                k=10,
+                session=session,
+            )
+
+    await asyncio.gather(*(one(s, i, q) for s in sources for i, q in enumerate(queries)))
+    return len(sources) * len(queries)
+
+
+async def run_warmup(
+    engine: AsyncEngine,
+    session_factory: Callable[[], AsyncSession],
+    *,
+    embedding_model_factory: Callable[[], Any] | None = None,
+) -> WarmupReport:
+    global _report
+    report = _report = WarmupReport()
+    t0 = time.perf_counter()
+    pool_size = getattr(engine.pool, "size", lambda: 1)()
+
+    async with _step(report, "pool"):
+        report.connections = await open_pool(engine, pool_size)
+
+    if settings.warmup_prewarm:
+        async with _step(report, "prewarm"):
+            report.prewarmed_blocks = await prewarm(engine)
+
+    embedding_model = None
+    if embedding_model_factory is not None:
+        async with _step(report, "embedder"):
+            # import + client construction are blocking; keep /health responsive
+            embedding_model = await asyncio.to_thread(embedding_model_factory)
+
+    if embedding_model is not None and settings.warmup_queries:
+        async with _step(report, "queries"):
+            report.queries = await synthetic_queries(
+                engine,
+                session_factory,
+                embedding_model,
+                settings.warmup_queries,
+                concurrency=pool_size,
+            )
+
+    async with _step(report, "residency"):
+        async with engine.connect() as conn:
+            report.residency = {r.name: r.cached_fraction for r in await buffer_residency(conn)}
+
+    report.duration_s = time.perf_counter() - t0
+    observability.record_warmup(report.duration_s, report.residency)
+    logger.info(
+        "Warmup finished in %.2fs (%d connections, %d queries, errors=%s)",
+        report.duration_s,
+        report.connections,
+        report.queries,
+        sorted(report.errors) or "none",
+    )
+    return report
@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import pytest
+
+from rag_service.providers.fake import FakeGenAIClient, FakeRateLimitError
+
+pytest.importorskip("google.genai")
+pytest.importorskip("llama_index.embeddings.google_genai")
+
+from rag_service.providers.gemini import GeminiTextLLM  # noqa: E402
+
+
+class ScriptedClient(FakeGenAIClient):
+    """FakeGenAIClient whose next requests take the queued latencies or raise a 429."""
+
+    def __init__(self, *, latency_s: float = 0.01) -> None:
+        super().__init__(latency_s=latency_s)
+        self.script: list[float | None] = []  # None: throttle the request
+        self.n_cancelled = 0
+
+    def _latency(self) -> float:
+        return self.script.pop(0) if self.script else self.latency_s
+
+    async def generate_content(self, *, model, contents, config=None):
+        if self.script and self.script[0] is None:
+            self.script.pop(0)
+            self.n_throttled += 1
+            raise FakeRateLimitError("scripted 429")
+        try:
+            return await super().generate_content(model=model, contents=contents, config=config)
+        except asyncio.CancelledError:
+            self.n_cancelled += 1
+            raise
+
+
+def _llm(client: ScriptedClient, **kwargs) -> GeminiTextLLM:
+    llm = GeminiTextLLM(model="fake", client=client, max_concurrency=8, **kwargs)
+    llm.rate_limiter.backoff_initial_s = 0.01
+    return llm
+
+
+def test_throttled_call_is_retried():
+    client = ScriptedClient()
+    client.script = [None, None]
+    llm = _llm(client)
+
+    text = asyncio.run(llm.generate_text(prompt="button sizes"))
+
+    assert text.endswith("button sizes")
+    assert client.n_throttled == 2
+    assert client.n_requests == 1
+
+
+def test_deadline_bounds_the_whole_call():
+    client = ScriptedClient()
+    client.script = [1.0]
+    llm = _llm(client)
+
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        asyncio.run(llm.generate_text(prompt="slow", deadline_s=0.05))
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_slow_call_loses_to_its_hedge():
+    client = ScriptedClient()
+    llm = _llm(client, hedge=True)
+
+    async def main() -> tuple[str, float]:
+        for i in range(llm.hedge_min_samples):
+            await llm.generate_text(prompt=f"warm-up {i}")
+        client.script = [1.0, 0.01]
+        t0 = time.monotonic()
+        text = await llm.generate_text(prompt="modal focus trap")
+        await asyncio.sleep(0)  # let the cancelled first request unwind
+        return text, time.monotonic() - t0
+
+    text, elapsed = asyncio.run(main())
+
+    assert text.endswith("modal focus trap")
+    assert elapsed < 0.5
+    assert llm.n_hedged == 1
+    assert client.n_cancelled == 1
+
+
+def test_hedges_stay_within_budget():
+    client = ScriptedClient()
+    # Hedge anything slower than the fastest call seen, so only the budget limits hedges
+    llm = _llm(client, hedge=True, hedge_quantile=0.0)
+
+    async def main() -> None:
+        for i in range(llm.hedge_min_samples):
+            await llm.generate_text(prompt=f"warm-up {i}")
+        client.script = [0.05] * 200
+        for i in range(40):
+            await llm.generate_text(prompt=f"slow {i}")
+
+    asyncio.run(main())
+
+    assert 1 <= llm.n_hedged <= 0.05 * (llm.hedge_min_samples + 40) + 1
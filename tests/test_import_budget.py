@@ -0,0 +1,31 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from rag_service.eval import import_budget
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+@pytest.fixture(autouse=True)
+def _src_on_subprocess_path(monkeypatch):
+    # the profiles are taken in fresh interpreters, which don't see pytest's pythonpath
+    monkeypatch.setenv(
+        "PYTHONPATH", os.pathsep.join(filter(None, [str(SRC), os.getenv("PYTHONPATH")]))
+    )
+
+
+def test_serving_imports_stay_light():
+    budget_ms = os.getenv("IMPORT_BUDGET_MS")
+    profile, failures = import_budget.check(
+        ("rag_service.main",),
+        budget_ms=float(budget_ms) if budget_ms else None,
+        budget_ratio=float(os.getenv("IMPORT_BUDGET_RATIO", import_budget.DEFAULT_BUDGET_RATIO)),
+        repeat=2,
+    )
+
+    assert "rag_service.main" in profile.records
+    for name in import_budget.SERVING_FORBIDDEN:
+        assert profile.imported(name) is None, f"{name} loaded: {failures}"
+    assert not failures, failures
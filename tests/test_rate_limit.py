@@ -0,0 +1,48 @@
+import asyncio
+
+from rag_service.providers.fake import FakeEmbeddingProvider
+from rag_service.providers.rate_limit import RateLimiter
+
+
+def _embed_all(limiter: RateLimiter, provider: FakeEmbeddingProvider, n: int):
+    limits: list[int] = []
+
+    async def one(i: int) -> list[list[float]]:
+        async def call() -> list[list[float]]:
+            limits.append(limiter.concurrency.limit)
+            return await provider.embed([f"text {i}"])
+
+        return await limiter.run(call)
+
+    async def main() -> list[list[list[float]]]:
+        return await asyncio.gather(*(one(i) for i in range(n)))
+
+    return asyncio.run(main()), limits
+
+
+def test_throttles_are_retried_and_shrink_the_limit():
+    provider = FakeEmbeddingProvider(dim=8, max_concurrency=2, latency_s=0.02)
+    limiter = RateLimiter(
+        max_concurrency=8, initial_concurrency=6, max_retries=10, backoff_initial_s=0.01
+    )
+
+    results, limits = _embed_all(limiter, provider, 24)
+
+    assert len(results) == 24 and all(len(r) == 1 for r in results)
+    assert provider.n_throttled > 0
+    assert provider.n_requests == 24
+    assert min(limits) < 6
+    assert provider.max_in_flight <= 8
+
+
+def test_limit_grows_towards_the_cap_without_throttling():
+    provider = FakeEmbeddingProvider(dim=8, latency_s=0.005)
+    limiter = RateLimiter(max_concurrency=8, min_concurrency=1)
+    start = limiter.concurrency.limit
+
+    _embed_all(limiter, provider, 80)
+
+    assert start == 4
+    assert provider.n_throttled == 0
+    assert start < limiter.concurrency.limit <= 8
+    assert provider.max_in_flight <= 8
@@ -0,0 +1,42 @@
+import pytest
+
+from rag_service.models import HitBatchBuilder, QueryItem
+from rag_service.pipeline.retrieval import calculate_rrf_rank, rrf_fuse
+
+QUERIES = [
+    QueryItem(id="q1", category="", difficulty=0, text="button sizes"),
+    QueryItem(id="q2", category="", difficulty=0, text="modal focus trap"),
+]
+VECTOR = {"q1": ["a", "b", "c", "d"], "q2": ["e", "f", "a"]}
+KEYWORD = {"q1": ["c", "a", "x"], "q2": ["f", "g", "h", "e"]}
+
+
+def _batch(ranked: dict[str, list[str]], score_name: str):
+    builder = HitBatchBuilder(QUERIES, score_name)
+    run = builder.run("leg", 0)
+    for qi, q in enumerate(QUERIES):
+        for rank, chunk_id in enumerate(ranked[q.id], start=1):
+            builder.add(qi, run, rank, chunk_id, f"text of {chunk_id}", 1.0 / rank)
+    return builder.build()
+
+
+@pytest.mark.parametrize("a, b", [(0.5, 0.5), (0.7, 0.3)])
+def test_rrf_fuse_matches_calculate_rrf_rank(a, b):
+    vector, keyword = _batch(VECTOR, "dist"), _batch(KEYWORD, "score")
+
+    expected = calculate_rrf_rank(vector.to_frame(), keyword.to_frame(), rrf_k=60, a=a, b=b)
+    expected = expected.astype({"query_id": str, "chunk_id": str})
+    fused = rrf_fuse(vector, keyword, rrf_k=60, a=a, b=b).to_frame()
+    fused = fused.astype({"query_id": str, "chunk_id": str})
+
+    want = {(r.query_id, r.chunk_id): r.score for r in expected.itertuples()}
+    got = {(r.query_id, r.chunk_id): r.score for r in fused.itertuples()}
+    assert got.keys() == want.keys()
+    for key, score in want.items():
+        assert got[key] == pytest.approx(score)
+
+    # Ranks follow the fused scores within each query (ties may order either way)
+    for _, group in fused.groupby("query_id"):
+        ordered = group.sort_values("rank")
+        assert list(ordered["rank"]) == list(range(1, len(group) + 1))
+        assert ordered["score"].is_monotonic_decreasing